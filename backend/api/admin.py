@@ -2,15 +2,42 @@
 Admin configuration for API models.
 """
 from django.contrib import admin
-from .models import CSVUpload, Equipment, DataSummary
+from django.db.models import F
+from .dashboard_cache import bump_data_version
+from .models import CSVUpload, Equipment, DataSummary, UploadSession
 
 
 @admin.register(CSVUpload)
 class CSVUploadAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'uploaded_at', 'processed', 'total_records']
-    list_filter = ['processed', 'uploaded_at']
+    list_display = [
+        'filename', 'user', 'uploaded_at', 'status', 'total_records',
+        'rows_per_sec', 'ingest_seconds', 'peak_rss_bytes'
+    ]
+    list_filter = ['status', 'uploaded_at']
     search_fields = ['filename']
-    readonly_fields = ['uploaded_at']
+    readonly_fields = [
+        'uploaded_at', 'rows_processed', 'heartbeat_at', 'error_message',
+        'ingest_seconds', 'rows_per_sec', 'peak_rss_bytes', 'stage_timings'
+    ]
+    # Slowest ingestions first, so throughput outliers stand out
+    ordering = [F('rows_per_sec').asc(nulls_last=True)]
+    
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'user' in form.changed_data:
+            # The equipment moves with the upload to its new user
+            obj.equipment.update(owner=obj.user)
+            bump_data_version(form.initial.get('user'), obj.user_id)
+    
+    # Deleting uploads deletes their equipment, so the owners' dashboards change
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_data_version(obj.user_id)
+    
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
+        super().delete_queryset(request, queryset)
+        bump_data_version(*user_ids)
 
 
 @admin.register(Equipment)
@@ -43,6 +70,21 @@ class EquipmentAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def save_model(self, request, obj, form, change):
+        # Manual edits no longer match the ingested values, so the next sync rewrites the row
+        obj.fingerprint = ''
+        super().save_model(request, obj, form, change)
+        bump_data_version(obj.owner_id)
+    
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_data_version(obj.owner_id)
+    
+    def delete_queryset(self, request, queryset):
+        user_ids = set(queryset.values_list('owner_id', flat=True))
+        super().delete_queryset(request, queryset)
+        bump_data_version(*user_ids)
 
 
 @admin.register(DataSummary)
@@ -53,3 +95,9 @@ class DataSummaryAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['created_at', 'updated_at']
 
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'total_chunks', 'total_size', 'csv_upload', 'created_at']
+    search_fields = ['filename']
+    readonly_fields = ['created_at', 'updated_at']
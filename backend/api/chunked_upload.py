@@ -0,0 +1,138 @@
+"""
+Disk storage for resumable chunked uploads.
+
+Each UploadSession owns a directory under MEDIA_ROOT/CHUNKED_UPLOAD_DIR.
+Chunks are written to a temporary name and renamed once their checksum
+matches, so the set of `<index>.part` files is always the set of chunks
+received intact and a client can resume by asking which are missing.
+"""
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import BinaryIO, List
+from django.conf import settings
+from django.core.files import File
+from .models import UploadSession
+
+# Bytes read from the request body or a chunk file at a time
+CHUNK_READ_SIZE = 1024 * 1024
+
+
+class AssembledFile(File):
+    """
+    A finished chunked upload on local disk.
+    FileSystemStorage moves files that expose temporary_file_path instead of copying them.
+    """
+    
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def session_dir(session: UploadSession) -> Path:
+    """Return the directory holding a session's chunks."""
+    return Path(settings.MEDIA_ROOT) / settings.CHUNKED_UPLOAD_DIR / str(session.id)
+
+
+def chunk_path(session: UploadSession, index: int) -> Path:
+    """Return the path of a received chunk."""
+    return session_dir(session) / f'{index}.part'
+
+
+def received_chunks(session: UploadSession) -> List[int]:
+    """Return the sorted indices of chunks received so far."""
+    directory = session_dir(session)
+    if not directory.exists():
+        return []
+    return sorted(int(path.stem) for path in directory.glob('*.part'))
+
+
+def write_chunk(session: UploadSession, index: int, stream: BinaryIO,
+                expected_sha256: str) -> tuple[bool, int, str]:
+    """
+    Store one chunk if its SHA-256 checksum matches.
+    
+    Args:
+        session: UploadSession the chunk belongs to
+        index: Zero-based chunk number
+        stream: Readable request body
+        expected_sha256: Hex digest sent by the client
+    
+    Returns:
+        Tuple of (success, bytes_written, error_message)
+    """
+    directory = session_dir(session)
+    directory.mkdir(parents=True, exist_ok=True)
+    temp_path = directory / f'{index}.part.tmp'
+    digest = hashlib.sha256()
+    size = 0
+    
+    with open(temp_path, 'wb') as chunk_file:
+        while True:
+            data = stream.read(CHUNK_READ_SIZE)
+            if not data:
+                break
+            size += len(data)
+            if size > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+                chunk_file.close()
+                temp_path.unlink(missing_ok=True)
+                return False, 0, f"Chunk exceeds {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes."
+            digest.update(data)
+            chunk_file.write(data)
+    
+    if digest.hexdigest() != expected_sha256.lower():
+        temp_path.unlink(missing_ok=True)
+        return False, 0, "Chunk checksum mismatch, please resend this chunk."
+    
+    os.replace(temp_path, chunk_path(session, index))
+    return True, size, ""
+
+
+def assemble_chunks(session: UploadSession, expected_sha256: str = '') -> tuple[bool, Path, str, str]:
+    """
+    Concatenate all chunks of a session into a single file.
+    
+    Args:
+        session: UploadSession with every chunk received
+        expected_sha256: Optional hex digest of the complete file
+    
+    Returns:
+        Tuple of (success, assembled_path, sha256_hexdigest, error_message)
+    """
+    missing = sorted(set(range(session.total_chunks)) - set(received_chunks(session)))
+    if missing:
+        return False, Path(), '', f"Missing chunks: {', '.join(map(str, missing))}"
+    
+    assembled_path = session_dir(session) / 'assembled'
+    digest = hashlib.sha256()
+    
+    with open(assembled_path, 'wb') as assembled:
+        for index in range(session.total_chunks):
+            with open(chunk_path(session, index), 'rb') as chunk_file:
+                while True:
+                    data = chunk_file.read(CHUNK_READ_SIZE)
+                    if not data:
+                        break
+                    digest.update(data)
+                    assembled.write(data)
+    
+    size = assembled_path.stat().st_size
+    if size != session.total_size:
+        assembled_path.unlink()
+        return False, Path(), '', f"Assembled file is {size} bytes, expected {session.total_size}."
+    
+    content_hash = digest.hexdigest()
+    if expected_sha256 and content_hash != expected_sha256.lower():
+        assembled_path.unlink()
+        return False, Path(), '', "File checksum mismatch."
+    
+    # Chunks are no longer needed once the assembled file is verified
+    for index in range(session.total_chunks):
+        chunk_path(session, index).unlink(missing_ok=True)
+    
+    return True, assembled_path, content_hash, ""
+
+
+def discard_session_files(session: UploadSession) -> None:
+    """Remove everything stored on disk for a session."""
+    shutil.rmtree(session_dir(session), ignore_errors=True)
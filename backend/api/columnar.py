@@ -0,0 +1,97 @@
+"""
+Reading Parquet and Arrow IPC uploads.
+
+Columnar files carry their own types, so they skip CSV text parsing and
+are read in record batches straight into DataFrames with typed columns.
+The DataFrames then go through the same column mapping and cleaning as
+CSV chunks. pyarrow is imported lazily so that it is only loaded by
+processes that actually read these formats.
+"""
+import os
+from typing import Iterator, List
+import pandas as pd
+
+# File name suffixes of columnar uploads
+PARQUET_SUFFIXES = ('.parquet',)
+ARROW_FILE_SUFFIXES = ('.arrow', '.feather')
+ARROW_STREAM_SUFFIXES = ('.arrows',)
+COLUMNAR_SUFFIXES = PARQUET_SUFFIXES + ARROW_FILE_SUFFIXES + ARROW_STREAM_SUFFIXES
+
+
+def is_columnar(name: str) -> bool:
+    """Return True if a file name denotes a Parquet or Arrow IPC upload."""
+    return os.path.splitext(name)[1].lower() in COLUMNAR_SUFFIXES
+
+
+def _data_columns(schema) -> List[str]:
+    """Return the schema's column names without stored pandas index columns."""
+    index_columns = set()
+    if schema.pandas_metadata:
+        index_columns = {
+            column for column in schema.pandas_metadata.get('index_columns', [])
+            if isinstance(column, str)
+        }
+    return [name for name in schema.names if name not in index_columns]
+
+
+def read_columnar_columns(file_path: str) -> List[str]:
+    """
+    Return the column names of a Parquet or Arrow IPC file from its schema alone.
+    
+    Args:
+        file_path: Path to the file
+    
+    Returns:
+        List of column names
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        return _data_columns(pq.read_schema(file_path))
+    with pa.memory_map(file_path) as source:
+        if suffix in ARROW_FILE_SUFFIXES:
+            return _data_columns(pa.ipc.open_file(source).schema)
+        return _data_columns(pa.ipc.open_stream(source).schema)
+
+
+def iter_columnar_frames(file_path: str, batch_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield a Parquet or Arrow IPC file as DataFrames of about batch_size rows.
+    
+    Only data columns are read, stored pandas index columns are skipped.
+    Arrow IPC files are memory-mapped, so batches are not copied before
+    conversion.
+    
+    Args:
+        file_path: Path to the file
+        batch_size: Maximum rows per DataFrame
+    
+    Yields:
+        DataFrames with the file's column types
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in PARQUET_SUFFIXES:
+        parquet_file = pq.ParquetFile(file_path)
+        columns = _data_columns(parquet_file.schema_arrow)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    
+    with pa.memory_map(file_path) as source:
+        if suffix in ARROW_FILE_SUFFIXES:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            reader = pa.ipc.open_stream(source)
+            batches = iter(reader)
+        columns = _data_columns(reader.schema)
+        for batch in batches:
+            batch = batch.select(columns)
+            # Slicing is zero-copy, it only bounds the rows converted at once
+            for offset in range(0, batch.num_rows, batch_size):
+                yield batch.slice(offset, batch_size).to_pandas()
@@ -0,0 +1,229 @@
+"""
+Streaming decompression of compressed CSV uploads.
+
+Compressed uploads are stored as received and decompressed on the fly
+while they are parsed, so no expanded copy is ever written to disk. Every
+read is counted, and a stream stops with DecompressionLimitError once it
+expands beyond the allowed size or compression ratio, which guards
+against compression bombs.
+"""
+import bz2
+import gzip
+import io
+import lzma
+import os
+import zipfile
+import zlib
+from contextlib import contextmanager
+from typing import BinaryIO, Callable, Iterator, List, Union
+
+# File name suffixes accepted for CSV uploads
+CSV_UPLOAD_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.zip')
+
+# Single-file compression formats by suffix
+COMPRESSED_OPENERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+}
+
+# Incremental decompressors by suffix, for the beginning of a file that has not fully arrived
+HEAD_DECOMPRESSORS = {
+    '.gz': lambda: zlib.decompressobj(zlib.MAX_WBITS | 16),
+    '.bz2': bz2.BZ2Decompressor,
+    '.xz': lzma.LZMADecompressor,
+}
+
+# Decompressed bytes read before the compression ratio is enforced, so
+# that small, highly repetitive files are not mistaken for bombs
+RATIO_CHECK_FLOOR = 1024 * 1024
+
+
+class DecompressionLimitError(ValueError):
+    """Raised when a compressed upload expands beyond the allowed limits."""
+
+
+def is_csv_upload_name(name: str) -> bool:
+    """Return True if a file name has an accepted CSV upload suffix."""
+    return name.lower().endswith(CSV_UPLOAD_SUFFIXES)
+
+
+def is_compressed(name: str) -> bool:
+    """Return True if a file name denotes a compressed upload."""
+    suffix = os.path.splitext(name)[1].lower()
+    return suffix in COMPRESSED_OPENERS or suffix == '.zip'
+
+
+class LimitedReader(io.RawIOBase):
+    """
+    Read-only stream that counts decompressed bytes and enforces limits.
+    
+    Args:
+        stream: Decompressing file object to read from
+        compressed_size: Size of the compressed data in bytes
+        max_size: Maximum number of decompressed bytes
+        max_ratio: Maximum decompressed/compressed size ratio
+        on_close: Callables run when the reader is closed
+    """
+    
+    def __init__(self, stream: BinaryIO, compressed_size: int, max_size: int,
+                 max_ratio: float, on_close: List[Callable[[], None]] = None):
+        super().__init__()
+        self.stream = stream
+        self.compressed_size = max(compressed_size, 1)
+        self.max_size = max_size
+        self.max_ratio = max_ratio
+        self.bytes_read = 0
+        self.on_close = on_close or [stream.close]
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_read += size
+        
+        if self.bytes_read > self.max_size:
+            raise DecompressionLimitError(
+                f"Decompressed file exceeds the maximum size of {self.max_size:,} bytes."
+            )
+        if (self.bytes_read > RATIO_CHECK_FLOOR
+                and self.bytes_read > self.compressed_size * self.max_ratio):
+            raise DecompressionLimitError(
+                f"File expands more than {self.max_ratio:g}x when decompressed, "
+                "it looks like a compression bomb."
+            )
+        return size
+    
+    def close(self):
+        if not self.closed:
+            for callback in self.on_close:
+                callback()
+        super().close()
+
+
+def csv_members(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """Return the CSV files of an archive, skipping directories and macOS metadata."""
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and info.filename.lower().endswith('.csv')
+        and not info.filename.startswith('__MACOSX/')
+    ]
+
+
+def list_csv_members(file_path: str) -> List[str]:
+    """Return the names of the CSV files in a ZIP archive, in archive order."""
+    with zipfile.ZipFile(file_path) as archive:
+        return [info.filename for info in csv_members(archive)]
+
+
+def _open_member(archive: zipfile.ZipFile, member: zipfile.ZipInfo,
+                 max_size: int, max_ratio: float) -> LimitedReader:
+    """Open one member of an open archive; closing the reader closes the archive."""
+    try:
+        # The declared size can be forged, so LimitedReader still counts every byte
+        if member.file_size > max_size:
+            raise DecompressionLimitError(
+                f"Decompressed file exceeds the maximum size of {max_size:,} bytes."
+            )
+        stream = archive.open(member)
+    except Exception:
+        archive.close()
+        raise
+    
+    return LimitedReader(
+        stream, member.compress_size, max_size, max_ratio,
+        on_close=[stream.close, archive.close]
+    )
+
+
+def _open_zip_member(file_path: str, max_size: int, max_ratio: float) -> LimitedReader:
+    """Open the single CSV file inside a ZIP archive."""
+    archive = zipfile.ZipFile(file_path)
+    members = csv_members(archive)
+    if len(members) != 1:
+        archive.close()
+        raise ValueError(f"ZIP archive must contain exactly one CSV file, found {len(members)}.")
+    return _open_member(archive, members[0], max_size, max_ratio)
+
+
+def open_zip_member(file_path: str, member_name: str, max_size: int, max_ratio: float) -> BinaryIO:
+    """
+    Open a named CSV file of a ZIP archive as a buffered stream of decompressed bytes.
+    
+    Args:
+        file_path: Path to the .zip file
+        member_name: Name of the file inside the archive
+        max_size: Maximum number of decompressed bytes
+        max_ratio: Maximum decompressed/compressed size ratio
+    
+    Returns:
+        Binary file object; reads raise DecompressionLimitError past the limits
+    """
+    archive = zipfile.ZipFile(file_path)
+    try:
+        member = archive.getinfo(member_name)
+    except KeyError:
+        archive.close()
+        raise
+    return io.BufferedReader(_open_member(archive, member, max_size, max_ratio))
+
+
+def open_decompressed(file_path: str, max_size: int, max_ratio: float) -> BinaryIO:
+    """
+    Open a compressed CSV file as a buffered stream of decompressed bytes.
+    
+    Args:
+        file_path: Path to a .gz, .bz2, .xz or .zip file
+        max_size: Maximum number of decompressed bytes
+        max_ratio: Maximum decompressed/compressed size ratio
+    
+    Returns:
+        Binary file object; reads raise DecompressionLimitError past the limits
+    """
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix == '.zip':
+        reader = _open_zip_member(file_path, max_size, max_ratio)
+    else:
+        stream = COMPRESSED_OPENERS[suffix](file_path, 'rb')
+        reader = LimitedReader(stream, os.path.getsize(file_path), max_size, max_ratio)
+    return io.BufferedReader(reader)
+
+
+@contextmanager
+def open_csv_source(file_path: str, max_size: int, max_ratio: float) -> Iterator[Union[str, BinaryIO]]:
+    """
+    Yield something pandas can read a CSV from: the path itself for plain
+    files, or a decompressing stream for compressed ones.
+    """
+    if not is_compressed(file_path):
+        yield file_path
+        return
+    
+    source = open_decompressed(file_path, max_size, max_ratio)
+    try:
+        yield source
+    finally:
+        source.close()
+
+
+def decompress_head(data: bytes, name: str, max_size: int) -> bytes:
+    """
+    Decompress the beginning of a .gz, .bz2 or .xz file.
+    
+    The data does not need to hold the whole file, so a preview can read the
+    first rows of a compressed upload from its first bytes.
+    
+    Args:
+        data: First bytes of the compressed file
+        name: File name, for its suffix
+        max_size: Maximum number of decompressed bytes returned
+    
+    Returns:
+        Up to max_size decompressed bytes
+    """
+    suffix = os.path.splitext(name)[1].lower()
+    return HEAD_DECOMPRESSORS[suffix]().decompress(data, max_size)
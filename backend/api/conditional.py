@@ -0,0 +1,59 @@
+"""
+Conditional GET for read endpoints, with ETags derived from data versions.
+
+A response's ETag is a digest of the user, the request path and query
+parameters, the negotiated media type and the user's data version (see
+api.dashboard_cache). The version moves whenever the user's uploads or
+equipment change, so a request whose If-None-Match holds the current ETag
+is answered with 304 Not Modified after the version lookup alone, before
+the view evaluates a queryset or serializes anything. Responses are marked
+private and no-cache, so browsers revalidate them instead of reusing them.
+"""
+import hashlib
+from functools import wraps
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+from .dashboard_cache import request_data_version
+
+
+def request_etag(request, version: int) -> str:
+    """Return the strong ETag of a GET request's response at a data version."""
+    params = sorted(request.query_params.lists())
+    identity = f"{request.user.pk}:{request.path}:{params}:{request.accepted_media_type}:{version}"
+    return quote_etag(hashlib.sha256(identity.encode()).hexdigest()[:32])
+
+
+def etag_matches(request, etag: str) -> bool:
+    """Return True if the request's If-None-Match header lists etag or '*'."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # If-None-Match compares weakly, so W/ variants of the ETag match too
+    return '*' in etags or etag in [tag.removeprefix('W/') for tag in etags]
+
+
+def conditional_per_user(view):
+    """
+    Answer GET requests with 304 Not Modified while the user's data version is unchanged.
+    
+    Apply it to function-based API views below @api_view and
+    @permission_classes, or to ViewSet actions through method_decorator,
+    so it only sees authenticated requests. Successful responses get the
+    ETag; other responses are returned untouched.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag = request_etag(request, request_data_version(request))
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
@@ -0,0 +1,211 @@
+"""
+Interchangeable CSV parser backends.
+
+Every backend reads a plain CSV file into DataFrames of at most chunk_size
+rows that clean_columns turns into the same records:
+
+- 'c': pandas' C parser, the general-purpose default
+- 'mmap': the C parser reading a memory-mapped file, for large files
+- 'pyarrow': pyarrow's multi-threaded CSV reader, when pyarrow is installed
+- 'stdlib': the standard library csv module, for tiny files where
+  pandas' per-call setup costs more than the parsing itself
+
+Backends only differ in speed, so they must agree on what they hand to
+cleaning: standard text and date columns are always read as text, the
+same cells count as missing, and only the literal spellings of True and
+False are read as booleans. The conformance test in api/tests.py holds
+every backend to the C parser's output. Like api.parsing, this module
+does not depend on Django.
+"""
+import csv
+import importlib.util
+import math
+import re
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+import pandas as pd
+from .parsing import text_columns
+
+# Cells read as missing, pandas' default na_values
+MISSING_VALUES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# Cells read as booleans, when a whole column consists of them
+TRUE_VALUES = ('True', 'TRUE', 'true')
+FALSE_VALUES = ('False', 'FALSE', 'false')
+
+# Cells the csv module backend reads as numbers; pandas reads them as numbers too
+NUMBER_PATTERN = re.compile(r'^[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$')
+
+# Never matches, so pyarrow leaves timestamp-like text as text like pandas does
+NO_TIMESTAMP_FORMAT = '%Y-%m-%d%%'
+
+ENGINE_C = 'c'
+ENGINE_MMAP = 'mmap'
+ENGINE_PYARROW = 'pyarrow'
+ENGINE_STDLIB = 'stdlib'
+
+
+def _iter_pandas_frames(file_path: str, chunk_size: int, columns: List[str],
+                        memory_map: bool = False) -> Iterator[pd.DataFrame]:
+    """Yield a CSV file through pandas' C parser, chunk_size rows at a time."""
+    dtypes = {name: str for name in text_columns(columns)}
+    with pd.read_csv(file_path, chunksize=chunk_size, dtype=dtypes, memory_map=memory_map) as reader:
+        yield from reader
+
+
+def _iter_mmap_frames(file_path: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+    """Yield a CSV file through pandas' C parser reading a memory-mapped file."""
+    return _iter_pandas_frames(file_path, chunk_size, columns, memory_map=True)
+
+
+def _iter_pyarrow_frames(file_path: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+    """
+    Yield a CSV file read by pyarrow's multi-threaded reader, chunk_size rows at a time.
+    
+    Column types are inferred from the whole file, so the file is read into
+    one Arrow table (about the size of the file) and converted to pandas a
+    slice at a time. pyarrow rejects rows with fewer fields than the header,
+    which pandas pads; such files are read with the C parser instead.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    
+    try:
+        table = pa_csv.read_csv(
+            file_path,
+            read_options=pa_csv.ReadOptions(column_names=columns, skip_rows=1),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types={name: pa.string() for name in text_columns(columns)},
+                null_values=sorted(MISSING_VALUES),
+                strings_can_be_null=True,
+                true_values=list(TRUE_VALUES),
+                false_values=list(FALSE_VALUES),
+                timestamp_parsers=[NO_TIMESTAMP_FORMAT],
+            ),
+        )
+    except pa.ArrowInvalid:
+        yield from _iter_pandas_frames(file_path, chunk_size, columns)
+        return
+    # Slicing is zero-copy, it only bounds the rows converted at once
+    for offset in range(0, max(table.num_rows, 1), chunk_size):
+        yield table.slice(offset, chunk_size).to_pandas()
+
+
+def _infer_type(values: List[Optional[str]]) -> list:
+    """
+    Convert a column's cells the way pandas infers column types: to floats
+    if every present cell is a plain decimal number, to booleans if every
+    present cell spells True or False, otherwise they stay text.
+    """
+    present = [value for value in values if value is not None]
+    if not present:
+        return values
+    if all(NUMBER_PATTERN.match(value) for value in present):
+        return [math.nan if value is None else float(value) for value in values]
+    if all(value in TRUE_VALUES or value in FALSE_VALUES for value in present):
+        return [None if value is None else value in TRUE_VALUES for value in values]
+    return values
+
+
+def _iter_stdlib_frames(file_path: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+    """
+    Yield a CSV file read with the standard library csv module, chunk_size rows at a time.
+    
+    Column types are inferred per chunk, like the C parser does: numbers,
+    booleans, or text.
+    """
+    text = set(text_columns(columns))
+    width = len(columns)
+    with open(file_path, newline='', encoding='utf-8') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)
+        
+        def data_rows():
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) > width:
+                    raise ValueError(f"Expected {width} fields in line {reader.line_num}, saw {len(row)}")
+                # Short rows are padded with missing cells like pandas does
+                yield row + [''] * (width - len(row))
+        
+        rows = data_rows()
+        first = True
+        while True:
+            batch = list(islice(rows, chunk_size))
+            # A file without data rows still yields one empty frame, like pandas
+            if not batch and not first:
+                break
+            first = False
+            data = {position: [] for position in range(width)}
+            for position, values in enumerate(zip(*batch)):
+                values = [None if value in MISSING_VALUES else value for value in values]
+                data[position] = values if columns[position] in text else _infer_type(values)
+            frame = pd.DataFrame(data)
+            frame.columns = columns
+            yield frame
+
+
+# Backends by name
+ENGINES: Dict[str, Callable[[str, int, List[str]], Iterator[pd.DataFrame]]] = {
+    ENGINE_C: _iter_pandas_frames,
+    ENGINE_MMAP: _iter_mmap_frames,
+    ENGINE_PYARROW: _iter_pyarrow_frames,
+    ENGINE_STDLIB: _iter_stdlib_frames,
+}
+
+
+def available_engines() -> List[str]:
+    """Return the names of the backends usable in this environment."""
+    return [
+        name for name in ENGINES
+        if name != ENGINE_PYARROW or importlib.util.find_spec('pyarrow') is not None
+    ]
+
+
+def select_engine(file_size: int, stdlib_max_size: int, pyarrow_min_size: int, mmap_min_size: int) -> str:
+    """
+    Pick the fastest backend for a plain CSV file of file_size bytes.
+    
+    Small files go to the csv module, mid-sized files to pyarrow when it is
+    installed (it holds the whole file in memory), large files to the
+    memory-mapped C parser, and everything else to the C parser.
+    
+    Args:
+        file_size: Size of the file in bytes
+        stdlib_max_size: Files below this size are read with the csv module
+        pyarrow_min_size: Files from this size up to mmap_min_size are read with pyarrow
+        mmap_min_size: Files from this size are memory-mapped
+    
+    Returns:
+        Backend name
+    """
+    if file_size < stdlib_max_size:
+        return ENGINE_STDLIB
+    if file_size >= mmap_min_size:
+        return ENGINE_MMAP
+    if file_size >= pyarrow_min_size and ENGINE_PYARROW in available_engines():
+        return ENGINE_PYARROW
+    return ENGINE_C
+
+
+def iter_csv_frames(file_path: str, chunk_size: int, columns: List[str], engine: str) -> Iterator[pd.DataFrame]:
+    """
+    Yield a plain CSV file as DataFrames of at most chunk_size rows.
+    
+    Args:
+        file_path: Path to an uncompressed CSV file
+        chunk_size: Maximum rows per DataFrame
+        columns: Column names of the header row, as pandas reads them
+        engine: Backend name, one of ENGINES
+    
+    Yields:
+        DataFrames with the file's columns
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV parser engine '{engine}'. Available engines: {', '.join(ENGINES)}")
+    return ENGINES[engine](file_path, chunk_size, columns)
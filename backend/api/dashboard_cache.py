@@ -0,0 +1,144 @@
+"""
+Caching of dashboard and chart responses.
+
+Every user has a data version (DataVersion) that is bumped whenever their
+uploads or equipment change: an upload stored, ingested or failed, pruned
+or deleted uploads, equipment created, edited or deleted through the API
+or the admin, and equipment taken over by another user's upload.
+Responses are cached in Django's cache framework under the user, the
+endpoint, its query parameters and the data version, so a change makes the
+entries cached before it unreachable instead of having to find and delete
+them; they expire on their own. The version is read before the response is
+computed, so an entry is never stored under a version newer than its data.
+
+The cache backend is configured with CACHE_BACKEND: the per-process
+local-memory cache, a file-based cache shared by the processes of a host,
+or Redis shared by all hosts. As the version lives in the database, even
+per-process caches never serve stale entries. Hit and miss counters are
+kept per process.
+"""
+import threading
+from collections import Counter
+from functools import wraps
+from typing import Any, Dict, Iterable
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework.response import Response
+from .models import DataVersion
+
+_stats_lock = threading.Lock()
+_hits = Counter()
+_misses = Counter()
+
+
+def get_data_version(user_id) -> int:
+    """Return the data version of a user, 0 while their data never changed."""
+    version = DataVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first()
+    return version or 0
+
+
+def request_data_version(request) -> int:
+    """Return the data version of the request's user, looked up once per request."""
+    if getattr(request, '_data_version', None) is None:
+        request._data_version = get_data_version(request.user.pk)
+    return request._data_version
+
+
+def bump_data_version(*user_ids) -> None:
+    """
+    Increase the data version of the given users; None entries are ignored.
+    Call it once the change is saved, or inside the transaction saving it.
+    """
+    for user_id in {user_id for user_id in user_ids if user_id is not None}:
+        if DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1):
+            continue
+        _, created = DataVersion.objects.get_or_create(user_id=user_id, defaults={'version': 1})
+        if not created:
+            # Created concurrently in the meantime
+            DataVersion.objects.filter(user_id=user_id).update(version=F('version') + 1)
+
+
+def bump_all_data_versions() -> None:
+    """Increase the data version of every user, e.g. after all data was deleted."""
+    DataVersion.objects.update(version=F('version') + 1)
+    missing = User.objects.filter(data_version__isnull=True).values_list('pk', flat=True)
+    DataVersion.objects.bulk_create(
+        [DataVersion(user_id=user_id, version=1) for user_id in missing], ignore_conflicts=True
+    )
+
+
+def cache_key(user_id, endpoint: str, params: Iterable, version: int) -> str:
+    """Return the cache key of an endpoint's response for a user, its parameters and data version."""
+    return f"dashboard:{user_id}:{endpoint}:{'&'.join(str(value) for value in params)}:v{version}"
+
+
+def record_lookup(endpoint: str, hit: bool) -> None:
+    """Count a cache hit or miss of an endpoint."""
+    with _stats_lock:
+        (_hits if hit else _misses)[endpoint] += 1
+
+
+def cache_stats() -> Dict[str, Any]:
+    """
+    Return the hit and miss counters of this process.
+    
+    Returns:
+        Dictionary with the cache backend, total hits, misses and hit_rate
+        (None before the first lookup), and the counters per endpoint
+    """
+    with _stats_lock:
+        endpoints = {
+            endpoint: {'hits': _hits[endpoint], 'misses': _misses[endpoint]}
+            for endpoint in sorted(_hits.keys() | _misses.keys())
+        }
+    hits = sum(counts['hits'] for counts in endpoints.values())
+    misses = sum(counts['misses'] for counts in endpoints.values())
+    return {
+        'backend': settings.CACHES['default']['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'endpoints': endpoints,
+    }
+
+
+def reset_cache_stats() -> None:
+    """Reset the hit and miss counters of this process."""
+    with _stats_lock:
+        _hits.clear()
+        _misses.clear()
+
+
+def cached_per_user(endpoint: str, params: Iterable[str] = ()):
+    """
+    Cache a function-based API view's successful responses per user and data version.
+    
+    Apply it below @api_view and @permission_classes, so it only sees
+    authenticated requests.
+    
+    Args:
+        endpoint: Name of the endpoint in cache keys and counters
+        params: Query parameters the response depends on
+    """
+    params = tuple(params)
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            user_id = request.user.pk
+            values = [request.query_params.get(name, '') for name in params]
+            key = cache_key(user_id, endpoint, values, request_data_version(request))
+            data = cache.get(key)
+            if data is not None:
+                record_lookup(endpoint, hit=True)
+                return Response(data)
+            
+            record_lookup(endpoint, hit=False)
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, settings.DASHBOARD_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Background ingestion jobs for CSV uploads.
+
+Jobs run on a local thread pool inside the web process, no outside broker
+is needed. The CSVUpload row is the job record: its status, rows_processed
+and error_message fields are what the job status endpoint reports.
+
+Pruning of old uploads runs as a retention task on its own single thread,
+so deleting large uploads never delays an upload response.
+
+SQLite allows a single writer at a time, and an ingestion commits one
+write transaction per batch of rows. There, ingestions and pruning runs
+of this process take turns (see database_writes), so concurrent jobs and
+the sheets of a workbook queue up instead of failing with "database is
+locked" between each other's batches.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+from django.conf import settings
+from django.db import connection, connections, transaction
+from .dashboard_cache import bump_data_version
+from .metrics import IngestionMetrics
+from .models import CSVUpload
+from .utils import delete_upload_file, ingest_csv_upload, prune_old_uploads
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_retention_executor = None
+
+# Held while writing to a database that allows one writer at a time
+_single_writer_lock = threading.Lock()
+
+# Users with a retention run queued but not started yet
+_pending_prunes = set()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared ingestion worker pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.INGESTION_WORKERS,
+                thread_name_prefix='ingestion'
+            )
+        return _executor
+
+
+def get_retention_executor() -> ThreadPoolExecutor:
+    """Return the single retention thread, creating it on first use."""
+    global _retention_executor
+    with _executor_lock:
+        if _retention_executor is None:
+            _retention_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retention')
+        return _retention_executor
+
+
+def database_writes():
+    """
+    Return a context manager to hold while ingesting or pruning: a lock
+    shared by this process where the database allows a single writer, a
+    no-op elsewhere.
+    """
+    if connection.vendor == 'sqlite':
+        return _single_writer_lock
+    return nullcontext()
+
+
+def run_ingestion_job(job_id: int, metrics: IngestionMetrics = None) -> Optional[Dict[str, Any]]:
+    """
+    Ingest a stored upload and schedule pruning of the user's old uploads.
+    
+    Args:
+        job_id: ID of the pending CSVUpload
+        metrics: Optional IngestionMetrics the ingestion stages are added to
+    
+    Returns:
+        Ingestion result (created_count, updated_count, unchanged_count,
+        summary) on success, None otherwise
+    """
+    try:
+        csv_upload = CSVUpload.objects.get(pk=job_id)
+    except CSVUpload.DoesNotExist:
+        return None
+    
+    try:
+        with database_writes():
+            success, result, _ = ingest_csv_upload(csv_upload, metrics=metrics)
+        if success:
+            schedule_pruning(csv_upload.user, csv_upload)
+            return result
+        delete_upload_file(csv_upload)
+    except Exception as e:
+        logger.exception("Ingestion job %s failed", job_id)
+        CSVUpload.objects.filter(pk=job_id).update(
+            status=CSVUpload.STATUS_FAILED,
+            error_message=f"Error processing CSV file: {str(e)}"
+        )
+        bump_data_version(csv_upload.user_id)
+    return None
+
+
+def _run_in_worker(job_id: int, metrics: IngestionMetrics = None) -> Optional[Dict[str, Any]]:
+    """Run a job on a pool thread and release that thread's DB connections."""
+    try:
+        return run_ingestion_job(job_id, metrics)
+    finally:
+        connections.close_all()
+
+
+def record_pruning_time(upload_id: int, seconds: float) -> None:
+    """Add the time of a retention run to the stage timings of the upload that queued it."""
+    csv_upload = CSVUpload.objects.filter(pk=upload_id).only('user', 'stage_timings').first()
+    if csv_upload is None:
+        return
+    csv_upload.stage_timings['prune'] = {'seconds': round(seconds, 4)}
+    csv_upload.save(update_fields=['stage_timings'])
+    bump_data_version(csv_upload.user_id)
+
+
+def _run_pruning(user_id: int, upload_id: int = None) -> None:
+    """Prune a user's old uploads on the retention thread."""
+    with _executor_lock:
+        # Uploads finishing from now on need another run
+        _pending_prunes.discard(user_id)
+    try:
+        started = time.perf_counter()
+        with database_writes():
+            prune_old_uploads(user_id)
+        if upload_id is not None:
+            record_pruning_time(upload_id, time.perf_counter() - started)
+    except Exception:
+        logger.exception("Pruning uploads of user %s failed", user_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_pruning(user, csv_upload: CSVUpload = None) -> None:
+    """
+    Queue pruning of a user's old uploads once the current transaction commits.
+    
+    A run that is queued but has not started yet covers every upload
+    finished before it starts, so uploads finishing together cost one run.
+    Its time is recorded as the prune stage of the upload that queued it.
+    
+    Args:
+        user: User whose uploads should be pruned
+        csv_upload: Optional upload whose completion triggered the pruning
+    """
+    if user is None:
+        return
+    user_id = user.pk
+    
+    def submit():
+        with _executor_lock:
+            if user_id in _pending_prunes:
+                return
+            _pending_prunes.add(user_id)
+        if csv_upload is None:
+            get_retention_executor().submit(_run_pruning, user_id)
+        else:
+            get_retention_executor().submit(_run_pruning, user_id, csv_upload.pk)
+    
+    transaction.on_commit(submit)
+
+
+def submit_ingestion(csv_upload: CSVUpload, metrics: IngestionMetrics = None) -> Future:
+    """
+    Queue a stored upload for background ingestion.
+    
+    Args:
+        csv_upload: CSVUpload instance in pending state
+        metrics: Optional IngestionMetrics with the stages timed before queueing
+    
+    Returns:
+        Future for the running job
+    """
+    return get_executor().submit(_run_in_worker, csv_upload.pk, metrics)
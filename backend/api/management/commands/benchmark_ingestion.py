@@ -0,0 +1,125 @@
+"""
+Benchmark the ingestion pipeline on synthetic data.
+
+    python manage.py benchmark_ingestion --rows 1000 --rows 100000 --output results.json
+
+For each row count a synthetic CSV is generated and run through
+parse_csv_file, save_equipment_from_csv and calculate_summary_statistics.
+Each stage reports its time, rows per second and the peak resident memory
+reached while it ran. Everything written to the database is rolled back.
+"""
+import json
+import os
+import platform
+import tempfile
+import time
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from api.metrics import peak_rss_bytes, reset_peak_rss, rows_per_second
+from api.models import CSVUpload
+from api.synthetic import write_equipment_csv
+from api.utils import calculate_summary_statistics, parse_csv_file, save_equipment_from_csv
+
+
+class Command(BaseCommand):
+    help = 'Benchmark CSV parsing, saving and summary statistics on synthetic data and print JSON results.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append',
+                            help='Rows per run; repeat for several runs (default: 1000)')
+        parser.add_argument('--dynamic-columns', type=int, default=5,
+                            help='Number of extra parameter columns (default: 5)')
+        parser.add_argument('--null-rate', type=float, default=0.05,
+                            help='Share of empty cells in optional columns (default: 0.05)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+    
+    def handle(self, *args, **options):
+        row_counts = sorted(options['rows'] or [1000])
+        if row_counts[0] < 1:
+            raise CommandError('--rows must be at least 1.')
+        if not 0 <= options['null_rate'] < 1:
+            raise CommandError('--null-rate must be at least 0 and below 1.')
+        
+        peak_resettable = reset_peak_rss()
+        results = {
+            'environment': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'platform': platform.platform(),
+                'database': connection.vendor,
+                # Without a reset, a stage's peak includes the earlier stages
+                'per_stage_peak_rss': peak_resettable,
+            },
+            'parameters': {
+                'dynamic_columns': options['dynamic_columns'],
+                'null_rate': options['null_rate'],
+                'seed': options['seed'],
+            },
+            'runs': [],
+        }
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for rows in row_counts:
+                file_path = os.path.join(tmp_dir, f'equipment_{rows}.csv')
+                file_size = write_equipment_csv(
+                    file_path, rows,
+                    dynamic_columns=options['dynamic_columns'],
+                    null_rate=options['null_rate'],
+                    seed=options['seed'],
+                )
+                run = self.run_benchmark(file_path, rows)
+                run['file_size_bytes'] = file_size
+                results['runs'].append(run)
+                os.remove(file_path)
+        
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+        self.stdout.write(output)
+    
+    def run_benchmark(self, file_path: str, rows: int) -> dict:
+        """Run the three ingestion stages on one file and return their measurements."""
+        stages = {}
+        
+        def measure(name, func, *args, **kwargs):
+            reset_peak_rss()
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - started
+            stages[name] = {
+                'seconds': round(seconds, 4),
+                'rows_per_sec': rows_per_second(rows, seconds),
+                'peak_rss_bytes': peak_rss_bytes(),
+            }
+            return result
+        
+        with transaction.atomic():
+            success, data_list, error = measure('parse', parse_csv_file, file_path)
+            if not success:
+                raise CommandError(f'Parsing the generated file failed: {error}')
+            
+            csv_upload = CSVUpload.objects.create(
+                filename=os.path.basename(file_path),
+                total_records=len(data_list),
+                status=CSVUpload.STATUS_PROCESSING,
+            )
+            created, updated, unchanged = measure('save', save_equipment_from_csv, csv_upload, data_list)
+            del data_list
+            measure('summary', calculate_summary_statistics, csv_upload)
+            transaction.set_rollback(True)
+        
+        total_seconds = sum(stage['seconds'] for stage in stages.values())
+        return {
+            'rows': rows,
+            'saved_rows': created + updated + unchanged,
+            'stages': stages,
+            'total_seconds': round(total_seconds, 4),
+            'rows_per_sec': rows_per_second(rows, total_seconds),
+            'peak_rss_bytes': max(
+                (stage['peak_rss_bytes'] for stage in stages.values() if stage['peak_rss_bytes'] is not None),
+                default=None
+            ),
+        }
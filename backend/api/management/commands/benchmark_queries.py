@@ -0,0 +1,175 @@
+"""
+Benchmark the user-scoped equipment queries on synthetic data.
+
+    python manage.py benchmark_queries --rows 1000000 --users 10 --repeat 5 --output queries.json
+
+Synthetic equipment rows are split evenly between --users users, one
+upload each. Every query the API runs for one user is then timed two ways: the
+old scoping through the user's uploads (csv_upload__in a subquery) and the
+denormalized owner column. Each variant reports its median and fastest
+latency and the database's query plan for every statement it ran.
+Everything written to the database is rolled back.
+"""
+import json
+import platform
+import statistics
+import time
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from api.models import CSVUpload, Equipment
+from api.synthetic import GENERATE_CHUNK_SIZE, generate_chunk
+from api.utils import DASHBOARD_METRICS, aggregate_equipment_metrics, flowrate_chart
+
+# Rows saved per INSERT
+INSERT_BATCH_SIZE = 5000
+
+
+def legacy_scope(user):
+    """Return a user's equipment the way it was scoped before the owner column."""
+    return Equipment.objects.filter(csv_upload__in=CSVUpload.objects.filter(user=user))
+
+
+def owner_scope(user):
+    """Return a user's equipment by the owner column."""
+    return Equipment.objects.filter(owner=user)
+
+
+def equipment_page(queryset):
+    """The first page of the equipment list, with the paginator's count."""
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    return queryset.count(), list(queryset.order_by('equipment_id')[:page_size])
+
+
+# Queries by name, each run on a user's scoped equipment
+WORKLOADS = {
+    'equipment_list': equipment_page,
+    'equipment_by_status': lambda queryset: equipment_page(queryset.filter(status='Maintenance')),
+    'equipment_types': lambda queryset: list(
+        queryset.order_by('equipment_type').values_list('equipment_type', flat=True).distinct()
+    ),
+    'dashboard_summary': lambda queryset: aggregate_equipment_metrics(queryset, DASHBOARD_METRICS),
+    'type_distribution': lambda queryset: list(
+        queryset.values('equipment_type').annotate(count=Count('id')).order_by()
+    ),
+    'flowrate_chart': flowrate_chart,
+}
+
+SCOPES = {'legacy': legacy_scope, 'owner': owner_scope}
+
+
+def explain(sql: str) -> list:
+    """Return the query plan of an executed statement, one line per step."""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        # SQLite puts the step's description last, after its position in the plan tree
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark user-scoped equipment queries with and without the owner column and print JSON results.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Equipment rows in total (default: 100000)')
+        parser.add_argument('--users', type=int, default=10,
+                            help='Users the rows are spread over (default: 10)')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (default: 5)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+    
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['users'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows, --users and --repeat must be at least 1.')
+        
+        results = {
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'database': connection.vendor,
+            },
+            'parameters': {
+                'rows': options['rows'],
+                'users': options['users'],
+                'repeat': options['repeat'],
+                'seed': options['seed'],
+            },
+        }
+        
+        with transaction.atomic():
+            started = time.perf_counter()
+            users = self.populate(options['rows'], options['users'], options['seed'])
+            results['load_seconds'] = round(time.perf_counter() - started, 4)
+            results['queries'] = {
+                name: self.run_workload(workload, users[0], options['repeat'])
+                for name, workload in WORKLOADS.items()
+            }
+            transaction.set_rollback(True)
+        
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output + '\n')
+        self.stdout.write(output)
+    
+    def populate(self, rows: int, user_count: int, seed: int) -> list:
+        """Insert synthetic equipment spread over new users and return the users."""
+        users = [User.objects.create(username=f'benchmark-{number}') for number in range(user_count)]
+        uploads = [
+            CSVUpload.objects.create(user=user, filename='benchmark.csv', status=CSVUpload.STATUS_COMPLETED)
+            for user in users
+        ]
+        rng = np.random.default_rng(seed)
+        for start in range(0, rows, GENERATE_CHUNK_SIZE):
+            frame = generate_chunk(rng, start, min(GENERATE_CHUNK_SIZE, rows - start), dynamic_columns=0)
+            frame = frame.astype(object).where(frame.notna(), None)
+            equipment = []
+            for offset, row in enumerate(frame.itertuples(index=False, name=None)):
+                record = dict(zip(frame.columns, row))
+                # Each user's rows are contiguous, as an ingested upload's are
+                upload = uploads[(start + offset) * user_count // rows]
+                equipment.append(Equipment(
+                    csv_upload=upload,
+                    owner_id=upload.user_id,
+                    equipment_id=record['Equipment ID'],
+                    equipment_name=record['Equipment Name'] or record['Equipment ID'],
+                    equipment_type=record['Type'],
+                    manufacturer=record['Manufacturer'],
+                    flowrate=record['Flowrate'],
+                    pressure=record['Pressure'],
+                    temperature=record['Temperature'],
+                    location=record['Location'],
+                    status=record['Status'] or 'Active',
+                ))
+            Equipment.objects.bulk_create(equipment, batch_size=INSERT_BATCH_SIZE)
+        
+        # Fresh statistics, as a production database would have
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return users
+    
+    def run_workload(self, workload, user, repeat: int) -> dict:
+        """Time one query with every scope and collect the plans of its statements."""
+        measurements = {}
+        for scope_name, scope in SCOPES.items():
+            # With DEBUG the loaded rows' INSERTs fill the bounded query log
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                workload(scope(user))
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                workload(scope(user))
+                timings.append((time.perf_counter() - started) * 1000)
+            measurements[scope_name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'min_ms': round(min(timings), 3),
+                'plans': [explain(query['sql']) for query in queries.captured_queries],
+            }
+        owner_ms = measurements['owner']['median_ms']
+        measurements['speedup'] = round(measurements['legacy']['median_ms'] / owner_ms, 2) if owner_ms else None
+        return measurements
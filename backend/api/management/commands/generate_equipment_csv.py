@@ -0,0 +1,34 @@
+"""
+Write a synthetic equipment CSV file.
+
+    python manage.py generate_equipment_csv data.csv --rows 1000000 --dynamic-columns 10 --null-rate 0.05
+"""
+from django.core.management.base import BaseCommand, CommandError
+from api.synthetic import write_equipment_csv
+
+
+class Command(BaseCommand):
+    help = 'Write a synthetic equipment CSV file for benchmarks and load tests.'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Output file path')
+        parser.add_argument('--rows', type=int, default=1000, help='Number of data rows (default: 1000)')
+        parser.add_argument('--dynamic-columns', type=int, default=5,
+                            help='Number of extra parameter columns (default: 5)')
+        parser.add_argument('--null-rate', type=float, default=0.05,
+                            help='Share of empty cells in optional columns (default: 0.05)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+    
+    def handle(self, *args, **options):
+        if options['rows'] < 0 or options['dynamic_columns'] < 0:
+            raise CommandError('--rows and --dynamic-columns must not be negative.')
+        if not 0 <= options['null_rate'] < 1:
+            raise CommandError('--null-rate must be at least 0 and below 1.')
+        
+        size = write_equipment_csv(
+            options['path'], options['rows'],
+            dynamic_columns=options['dynamic_columns'],
+            null_rate=options['null_rate'],
+            seed=options['seed'],
+        )
+        self.stdout.write(f"Wrote {options['rows']} rows ({size} bytes) to {options['path']}")
@@ -0,0 +1,172 @@
+"""
+Timing and memory instrumentation of the ingestion pipeline.
+
+Ingestion streams a file through reading, column mapping, record
+conversion and upserting chunk by chunk, so the stages interleave rather
+than run one after the other. IngestionMetrics keeps a stack of the stages
+in progress and charges elapsed time to the innermost one only: the time
+saving spends pulling the next records is counted as reading, mapping or
+conversion, not as upserting. Resident memory is sampled whenever a stage
+ends. Only depends on the standard library.
+
+Memory is measured per process, not per ingestion: with INGESTION_WORKERS
+above 1, jobs running at the same time share the process, so each job's
+peak includes the memory of the others. On Windows, where the resource
+module does not exist, memory is not measured at all and reads as None.
+"""
+import mmap
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+# Pipeline stages in pipeline order
+STAGES = ('store', 'read', 'map', 'convert', 'upsert', 'summary', 'prune')
+
+# Linux only: current and peak resident memory of the process
+STATM_PATH = '/proc/self/statm'
+STATUS_PATH = '/proc/self/status'
+# Linux only: writing '5' resets the peak resident memory (VmHWM)
+CLEAR_REFS_PATH = '/proc/self/clear_refs'
+
+PAGE_SIZE = mmap.PAGESIZE
+
+
+def max_rss_bytes() -> Optional[int]:
+    """Return the largest resident memory the process ever had, from getrusage; None without resource."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Return the resident memory of the process in bytes.
+    Where /proc is not available this is the process's lifetime peak
+    instead, and None where that is not available either.
+    """
+    try:
+        with open(STATM_PATH) as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return max_rss_bytes()
+
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the process's peak resident memory; return False where that is not possible.
+    The reset is process-wide, so only call it in a process that runs nothing
+    else, like the benchmark_ingestion command, never from ingestion jobs.
+    """
+    try:
+        with open(CLEAR_REFS_PATH, 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the peak resident memory of the process since the last reset, in bytes; None if unknown."""
+    try:
+        with open(STATUS_PATH) as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return max_rss_bytes()
+
+
+class IngestionMetrics:
+    """
+    Collects the time, row count and memory of each stage of one ingestion.
+    
+    Use one instance per upload, on one thread. Stages nest: entering a
+    stage pauses the enclosing one until it ends.
+    """
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = {}
+        self.rows = {}
+        self.peak_rss = 0
+        self._stack = []
+        self._mark = self.started
+    
+    def _charge(self) -> None:
+        """Charge the time since the last stage change to the innermost stage."""
+        now = time.perf_counter()
+        if self._stack:
+            name = self._stack[-1]
+            self.seconds[name] = self.seconds.get(name, 0.0) + now - self._mark
+        self._mark = now
+    
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time the enclosed code as stage name."""
+        self._charge()
+        self._stack.append(name)
+        try:
+            yield
+        finally:
+            self._charge()
+            self._stack.pop()
+            rss = current_rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+    
+    def add_seconds(self, name: str, seconds: float) -> None:
+        """Add time measured elsewhere, e.g. on another thread, to stage name."""
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+    
+    def add_rows(self, name: str, count: int) -> None:
+        """Count rows handled by stage name."""
+        self.rows[name] = self.rows.get(name, 0) + count
+    
+    def restart(self) -> None:
+        """
+        Restart the wall clock, keeping the time of the stages measured so far.
+        Used when a job starts, so time spent waiting in the queue is left out.
+        """
+        self.started = time.perf_counter() - sum(self.seconds.values())
+    
+    def elapsed(self) -> float:
+        """Return the wall-clock seconds since the metrics were created."""
+        return time.perf_counter() - self.started
+    
+    def stage_timings(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the measured stages in pipeline order.
+        
+        Returns:
+            Dictionary mapping stage names to {'seconds': ..., 'rows': ...};
+            'rows' is left out for stages that do not count rows
+        """
+        timings = {}
+        for name in sorted(self.seconds.keys() | self.rows.keys(), key=stage_order):
+            timing = {'seconds': round(self.seconds.get(name, 0.0), 4)}
+            if name in self.rows:
+                timing['rows'] = self.rows[name]
+            timings[name] = timing
+        return timings
+
+
+def stage_order(name: str) -> int:
+    """Sort key putting stage names in pipeline order, unknown ones last."""
+    return STAGES.index(name) if name in STAGES else len(STAGES)
+
+
+def rows_per_second(rows: int, seconds: Optional[float]) -> Optional[float]:
+    """Return the throughput of rows over seconds, None if nothing was timed."""
+    if not seconds:
+        return None
+    return round(rows / seconds, 1)
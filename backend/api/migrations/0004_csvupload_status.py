@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:34
+
+from django.db import migrations, models
+
+
+def processed_to_status(apps, schema_editor):
+    """Carry the old processed flag over to the lifecycle status."""
+    CSVUpload = apps.get_model('api', 'CSVUpload')
+    CSVUpload.objects.filter(processed=True).update(status='completed', rows_processed=models.F('total_records'))
+    CSVUpload.objects.filter(processed=False).update(status='failed')
+
+
+def status_to_processed(apps, schema_editor):
+    CSVUpload = apps.get_model('api', 'CSVUpload')
+    CSVUpload.objects.filter(status='completed').update(processed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_csvupload_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='error_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='rows_processed',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(processed_to_status, status_to_processed),
+        migrations.RemoveField(
+            model_name='csvupload',
+            name='processed',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the uploaded file; identical files share one stored blob', max_length=64),
+        ),
+    ]
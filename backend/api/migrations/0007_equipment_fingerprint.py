@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_csvupload_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', help_text='Fingerprint of the ingested values, empty after a manual edit', max_length=32),
+        ),
+    ]
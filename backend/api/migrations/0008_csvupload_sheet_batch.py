@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_equipment_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='batch_id',
+            field=models.UUIDField(blank=True, db_index=True, help_text='Shared by uploads submitted together, e.g. the sheets of one workbook', null=True),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='sheet_name',
+            field=models.CharField(blank=True, default='', help_text='Worksheet ingested by this upload, for Excel workbooks', max_length=255),
+        ),
+    ]
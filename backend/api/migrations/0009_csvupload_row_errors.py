@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_csvupload_sheet_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='rejected_records',
+            field=models.IntegerField(default=0, help_text='Rows left out because a value could not be stored'),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='row_errors',
+            field=models.JSONField(blank=True, default=list, help_text='Per-row errors of the rejected rows (row, column, value, message)'),
+        ),
+    ]
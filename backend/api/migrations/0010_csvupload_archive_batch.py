@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_csvupload_row_errors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='archive_batch',
+            field=models.BooleanField(default=False, help_text='ZIP archive of several CSV files ingested together into this upload'),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='member_results',
+            field=models.JSONField(blank=True, default=list, help_text='Per-file results of an archive batch (file, status, counts, error)'),
+        ),
+    ]
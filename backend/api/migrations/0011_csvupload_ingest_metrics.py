@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_csvupload_archive_batch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='ingest_seconds',
+            field=models.FloatField(blank=True, help_text='Wall-clock time of the ingestion', null=True),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='peak_rss_bytes',
+            field=models.BigIntegerField(blank=True, help_text='Largest resident memory of the ingesting process sampled during the ingestion', null=True),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='rows_per_sec',
+            field=models.FloatField(blank=True, help_text='Rows saved per second of ingestion', null=True),
+        ),
+        migrations.AddField(
+            model_name='csvupload',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, help_text='Seconds and rows per ingestion stage (store, read, map, convert, upsert, summary, prune)'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_csvupload_ingest_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='file_rows',
+            field=models.IntegerField(blank=True, help_text='Data rows of a CSV file, counted while it was received', null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_upload_users(apps, schema_editor):
+    """Set every equipment row's owner to its upload's user, in one UPDATE."""
+    CSVUpload = apps.get_model('api', 'CSVUpload')
+    Equipment = apps.get_model('api', 'Equipment')
+    Equipment.objects.filter(csv_upload__isnull=False).update(
+        owner=models.Subquery(CSVUpload.objects.filter(pk=models.OuterRef('csv_upload')).values('user')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0013_dataversion'),
+    ]
+    
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to=settings.AUTH_USER_MODEL),
+        ),
+        # Filled before the indexes are built, so they are built once
+        migrations.RunPython(copy_upload_users, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['owner', 'equipment_id'], name='equipment_owner_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['owner', 'equipment_type'], name='equipment_owner_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['owner', 'status', 'flowrate'], name='equipment_owner_flowrate_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_equipment_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last time the ingestion of this upload reported progress', null=True),
+        ),
+    ]
@@ -1,6 +1,7 @@
 """
 Models for chemical equipment data management.
 """
+import uuid
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.utils import timezone
@@ -11,6 +12,18 @@ class CSVUpload(models.Model):
     """
     Model to track CSV file uploads.
     """
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -20,9 +33,69 @@ class CSVUpload(models.Model):
     )
     file = models.FileField(upload_to='uploads/%Y/%m/%d/')
     filename = models.CharField(max_length=255)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the uploaded file; identical files share one stored blob"
+    )
+    sheet_name = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        help_text="Worksheet ingested by this upload, for Excel workbooks"
+    )
+    batch_id = models.UUIDField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Shared by uploads submitted together, e.g. the sheets of one workbook"
+    )
+    archive_batch = models.BooleanField(
+        default=False,
+        help_text="ZIP archive of several CSV files ingested together into this upload"
+    )
+    member_results = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Per-file results of an archive batch (file, status, counts, error)"
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
-    processed = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    file_rows = models.IntegerField(
+        null=True,
+        blank=True,
+        help_text="Data rows of a CSV file, counted while it was received"
+    )
     total_records = models.IntegerField(default=0)
+    rows_processed = models.IntegerField(default=0)
+    heartbeat_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Last time the ingestion of this upload reported progress"
+    )
+    rejected_records = models.IntegerField(
+        default=0,
+        help_text="Rows left out because a value could not be stored"
+    )
+    row_errors = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Per-row errors of the rejected rows (row, column, value, message)"
+    )
+    error_message = models.TextField(blank=True, default='')
+    stage_timings = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Seconds and rows per ingestion stage (store, read, map, convert, upsert, summary, prune)"
+    )
+    ingest_seconds = models.FloatField(null=True, blank=True, help_text="Wall-clock time of the ingestion")
+    rows_per_sec = models.FloatField(null=True, blank=True, help_text="Rows saved per second of ingestion")
+    peak_rss_bytes = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="Largest resident memory of the ingesting process sampled during the ingestion"
+    )
     
     class Meta:
         ordering = ['-uploaded_at']
@@ -30,7 +103,13 @@ class CSVUpload(models.Model):
         verbose_name_plural = 'CSV Uploads'
     
     def __str__(self):
-        return f"{self.filename} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
+        name = f"{self.filename} [{self.sheet_name}]" if self.sheet_name else self.filename
+        return f"{name} - {self.uploaded_at.strftime('%Y-%m-%d %H:%M')}"
+    
+    @property
+    def processed(self):
+        """Check if the upload has been fully ingested."""
+        return self.status == self.STATUS_COMPLETED
 
 
 class Equipment(models.Model):
@@ -67,6 +146,17 @@ class Equipment(models.Model):
         null=True,
         blank=True
     )
+    # The upload's user, copied so user-scoped queries filter without a join;
+    # indexed by the composite indexes below, which all start with it
+    owner = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='equipment',
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=False
+    )
     
     # Equipment identification
     equipment_id = models.CharField(max_length=100, unique=True)
@@ -123,6 +213,14 @@ class Equipment(models.Model):
         help_text="Store additional dynamic parameters from CSV (e.g., humidity, vibration, etc.)"
     )
     
+    # Hash of the values last written by CSV ingestion, used to skip unchanged rows
+    fingerprint = models.CharField(
+        max_length=32,
+        blank=True,
+        default='',
+        help_text="Fingerprint of the ingested values, empty after a manual edit"
+    )
+    
     class Meta:
         ordering = ['equipment_id']
         verbose_name = 'Equipment'
@@ -131,11 +229,25 @@ class Equipment(models.Model):
             models.Index(fields=['equipment_id']),
             models.Index(fields=['equipment_type']),
             models.Index(fields=['status']),
+            # A user's equipment list in equipment_id order, their types, and
+            # their active equipment by flowrate (status alone uses its prefix)
+            models.Index(fields=['owner', 'equipment_id'], name='equipment_owner_id_idx'),
+            models.Index(fields=['owner', 'equipment_type'], name='equipment_owner_type_idx'),
+            models.Index(fields=['owner', 'status', 'flowrate'], name='equipment_owner_flowrate_idx'),
         ]
     
     def __str__(self):
         return f"{self.equipment_id} - {self.equipment_name}"
     
+    def save(self, *args, **kwargs):
+        # Bulk ingestion sets owner itself; single saves take it from the upload, also when it changes
+        update_fields = kwargs.get('update_fields')
+        if self.csv_upload_id and (update_fields is None or {'csv_upload', 'csv_upload_id'} & set(update_fields)):
+            self.owner_id = self.csv_upload.user_id
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'owner'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_operational(self):
         """Check if equipment is operational."""
@@ -187,3 +299,57 @@ class DataSummary(models.Model):
     def __str__(self):
         return f"Summary for {self.csv_upload.filename}"
 
+
+
+class UploadSession(models.Model):
+    """
+    Model to track a resumable chunked upload.
+    Chunks are stored on disk until the session is finalized into a CSVUpload.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(help_text="Size of the complete file in bytes")
+    total_chunks = models.IntegerField(validators=[MinValueValidator(1)])
+    csv_upload = models.OneToOneField(
+        CSVUpload,
+        on_delete=models.SET_NULL,
+        related_name='upload_session',
+        null=True,
+        blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Upload Session'
+        verbose_name_plural = 'Upload Sessions'
+    
+    def __str__(self):
+        return f"{self.filename} ({self.total_chunks} chunks)"
+
+
+class DataVersion(models.Model):
+    """
+    Version of a user's equipment data, bumped whenever it changes.
+    Cached dashboard responses are keyed by it, see api.dashboard_cache.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version'
+    )
+    version = models.PositiveBigIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Data Version'
+        verbose_name_plural = 'Data Versions'
+    
+    def __str__(self):
+        return f"{self.user} v{self.version}"
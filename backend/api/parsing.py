@@ -0,0 +1,524 @@
+"""
+Column mapping and vectorised cleaning of equipment CSV data.
+
+This module only depends on pandas and api.compression, not on Django,
+so that parse workers started with the 'spawn' method can import it
+without configuring Django.
+"""
+from io import BytesIO
+from itertools import repeat
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional
+import numpy as np
+import pandas as pd
+from pandas.api.types import infer_dtype, is_float_dtype, is_numeric_dtype, is_object_dtype
+from pandas.errors import EmptyDataError
+from .compression import DecompressionLimitError, open_zip_member
+
+
+# Expected columns (flexible mapping)
+COLUMN_MAPPING = {
+    'equipment_id': ['equipment_id', 'id', 'equip_id', 'equipment_no', 'equipment_name'],
+    'equipment_name': ['equipment_name', 'name', 'equip_name', 'equipment_name'],
+    'equipment_type': ['equipment_type', 'type', 'equip_type'],
+    'manufacturer': ['manufacturer', 'make', 'vendor'],
+    'model_number': ['model_number', 'model', 'model_no'],
+    'serial_number': ['serial_number', 'serial', 'serial_no'],
+    'capacity': ['capacity', 'cap'],
+    'flowrate': ['flowrate', 'flow_rate', 'flow'],
+    'pressure': ['pressure', 'press'],
+    'temperature': ['temperature', 'temp'],
+    'location': ['location', 'loc', 'site'],
+    'status': ['status', 'state'],
+    'installation_date': ['installation_date', 'install_date', 'commissioned_date'],
+    'last_maintenance': ['last_maintenance', 'last_maint', 'maintenance_date'],
+    'notes': ['notes', 'remarks', 'comments'],
+}
+
+# Known standard columns that will be stored in model fields
+STANDARD_COLUMNS = list(COLUMN_MAPPING.keys())
+
+# Known numeric columns (will be stored in model fields)
+NUMERIC_COLUMNS = ['capacity', 'flowrate', 'pressure', 'temperature']
+
+DATE_COLUMNS = ['installation_date', 'last_maintenance']
+
+# Maximum lengths of text columns, matching the Equipment model fields
+TEXT_MAX_LENGTHS = {
+    'equipment_id': 100,
+    'equipment_name': 255,
+    'equipment_type': 50,
+    'manufacturer': 255,
+    'model_number': 100,
+    'serial_number': 100,
+    'location': 255,
+    'status': 20,
+}
+
+# Row number of the first data row; rows are numbered as in a spreadsheet, the header is row 1
+FIRST_DATA_ROW = 2
+
+# Characters of a rejected value kept in the error report
+ERROR_VALUE_LENGTH = 100
+
+# Values shown per column in an upload preview
+PREVIEW_SAMPLE_SIZE = 5
+
+# Bytes scanned at a time when looking for record boundaries
+BOUNDARY_SCAN_BLOCK_SIZE = 1024 * 1024
+
+
+class RowError(NamedTuple):
+    """A rejected value; row counts data rows from 0 until it is placed in the file."""
+    row: int
+    column: str
+    value: str
+    message: str
+
+
+class CleanedColumns(NamedTuple):
+    """
+    Cleaned values of the valid rows of a prepared DataFrame, split into
+    standard and dynamic columns, plus the errors of the rejected rows.
+    """
+    standard_keys: List[str]
+    standard_values: List[List[Any]]
+    dynamic_keys: List[str]
+    dynamic_values: List[List[Any]]
+    row_count: int
+    positions: List[int]
+    errors: List[RowError]
+    source_rows: int
+
+
+def prepare_dataframe(df: pd.DataFrame) -> tuple[bool, pd.DataFrame, str]:
+    """
+    Normalise column names, apply the column mapping and check required columns.
+    
+    Args:
+        df: DataFrame as read from the uploaded file
+    
+    Returns:
+        Tuple of (success, dataframe, error_message)
+    """
+    # Store original column names for better error messages
+    original_columns = df.columns.tolist()
+    
+    # Convert column names to lowercase and replace spaces with underscores
+    df.columns = df.columns.str.lower().str.replace(' ', '_').str.strip()
+    
+    # Map columns
+    mapped_columns = {}
+    for target_col, possible_names in COLUMN_MAPPING.items():
+        for name in possible_names:
+            if name in df.columns:
+                mapped_columns[name] = target_col
+                break
+    
+    # Rename columns
+    df.rename(columns=mapped_columns, inplace=True)
+    
+    # Handle case where Equipment Name is used for both ID and Name
+    if 'equipment_name' in df.columns and 'equipment_id' not in df.columns:
+        df['equipment_id'] = df['equipment_name']
+    elif 'equipment_id' in df.columns and 'equipment_name' not in df.columns:
+        df['equipment_name'] = df['equipment_id']
+    
+    error_msg = header_error(original_columns)
+    if error_msg:
+        return False, df, error_msg
+    
+    return True, df, ""
+
+
+def header_error(columns: List[Any]) -> str:
+    """
+    Check a header row for the required columns, before any data is read.
+    
+    Only Equipment Name/ID and Type are required; any of their names in
+    COLUMN_MAPPING will do.
+    
+    Args:
+        columns: Column names as they appear in the file
+    
+    Returns:
+        Error message, or '' if the required columns are present
+    """
+    names = {str(name).lower().replace(' ', '_').strip() for name in columns}
+    has_id = not names.isdisjoint(COLUMN_MAPPING['equipment_id'] + COLUMN_MAPPING['equipment_name'])
+    has_type = not names.isdisjoint(COLUMN_MAPPING['equipment_type'])
+    
+    if not has_id:
+        available_cols = ', '.join(map(str, columns))
+        return f"Missing required column: Equipment Name or Equipment ID. Available columns: {available_cols}"
+    
+    if not has_type:
+        available_cols = ', '.join(map(str, columns))
+        return f"Missing required column: Equipment Type. Available columns: {available_cols}"
+    
+    return ""
+
+
+def text_columns(columns: List[str]) -> List[str]:
+    """
+    Return the header names that column mapping turns into standard text or date columns.
+    
+    Every CSV reader reads these columns as text, so that values such as
+    serial numbers keep their spelling (00123, not 123.0).
+    """
+    normalised = {str(name).lower().replace(' ', '_').strip(): name for name in columns}
+    names = []
+    for target_col, possible_names in COLUMN_MAPPING.items():
+        if target_col in NUMERIC_COLUMNS:
+            continue
+        for name in possible_names:
+            if name in normalised:
+                names.append(normalised[name])
+                break
+    return names
+
+
+def preview_csv_head(data: bytes, nrows: int) -> Dict[str, Any]:
+    """
+    Describe how the first rows of a CSV file would be ingested.
+    
+    The header and at most nrows rows are read the way ingestion reads
+    them, and the column mapping is resolved, without cleaning the values.
+    
+    Args:
+        data: Beginning of a CSV file, ending with a complete row
+        nrows: Maximum number of data rows to read
+    
+    Returns:
+        Dictionary with 'columns' (the header), 'column_mapping' (file
+        column -> standard column), 'additional_params' (file column -> key
+        in additional_params), 'dtypes', 'samples' (first values present in
+        each column), 'rows' read and 'error' (missing required columns, ''
+        if none)
+    """
+    columns = pd.read_csv(BytesIO(data), nrows=0).columns.tolist()
+    dtypes = {name: str for name in text_columns(columns)}
+    df = pd.read_csv(BytesIO(data), nrows=nrows, dtype=dtypes)
+    
+    # Mapping renames columns in place, so positions still match the file's header
+    _, prepared, error_msg = prepare_dataframe(pd.DataFrame(columns=columns))
+    column_mapping, additional_params = {}, {}
+    for name, key in zip(columns, prepared.columns):
+        if key in STANDARD_COLUMNS:
+            column_mapping[name] = key
+        else:
+            additional_params[name] = key
+    
+    return {
+        'columns': columns,
+        'column_mapping': column_mapping,
+        'additional_params': additional_params,
+        'dtypes': {name: str(dtype) for name, dtype in df.dtypes.items()},
+        'samples': {name: df[name].dropna().head(PREVIEW_SAMPLE_SIZE).tolist() for name in columns},
+        'rows': len(df.index),
+        'error': error_msg,
+    }
+
+
+def _text_accessor(series: pd.Series):
+    """Return the .str accessor of an object column, converting columns without any text first."""
+    try:
+        return series.str
+    except AttributeError:
+        return series.astype(str).str
+
+
+def _is_blank(series: pd.Series) -> pd.Series:
+    """Return a mask of missing cells and text cells holding only whitespace."""
+    blank = series.isna()
+    if is_object_dtype(series):
+        blank |= _text_accessor(series).strip().eq('').fillna(False).astype(bool)
+    return blank
+
+
+def _typed_as_text(series: pd.Series) -> pd.Series:
+    """
+    Format a typed (non-text) column as strings. Integral floats lose their
+    '.0', as integer columns with missing values arrive as floats.
+    """
+    text = series.astype(str)
+    if is_float_dtype(series):
+        integral = np.isfinite(series) & (series % 1 == 0) & (series.abs() < 2 ** 53)
+        text[integral] = series[integral].astype('int64').astype(str)
+    return text
+
+
+def _mixed_as_text(series: pd.Series) -> pd.Series:
+    """
+    Convert the values of an object column that are not strings, e.g. the
+    numbers of an Excel column mixing them with text, to strings formatted
+    like typed columns. Missing values are left alone.
+    """
+    if infer_dtype(series, skipna=True) == 'string':
+        return series
+    others = series.notna() & ~series.map(lambda value: isinstance(value, str)).astype(bool)
+    values = series[others]
+    numbers = pd.to_numeric(values, errors='coerce')
+    converted = series.copy()
+    converted[others] = _typed_as_text(numbers).where(numbers.notna(), values.astype(str))
+    return converted
+
+
+def _clean_standard_column(col: str, series: pd.Series) -> tuple[pd.Series, List[tuple[pd.Series, str]]]:
+    """
+    Coerce a standard column to its model type, column-at-a-time.
+    Missing numeric/date values become None, missing text values become ''.
+    
+    Returns:
+        Tuple of (cleaned_series, checks) where checks are (invalid_mask, message)
+        pairs for values that cannot be stored
+    """
+    checks = []
+    if col in DATE_COLUMNS or col in NUMERIC_COLUMNS:
+        if col in DATE_COLUMNS:
+            converted = pd.to_datetime(series, errors='coerce')
+            message = 'Not a valid date'
+        else:
+            converted = pd.to_numeric(series, errors='coerce')
+            message = 'Not a number'
+        missing = converted.isna()
+        # Cells that held something but did not convert
+        checks.append((missing & ~_is_blank(series), message))
+        if col in NUMERIC_COLUMNS:
+            # Always floats, whether or not the chunk had blanks that made pandas infer them
+            converted = converted.astype(float)
+        return converted.astype(object).mask(missing, None), checks
+    
+    missing = series.isna()
+    if not is_object_dtype(series):
+        # Typed text columns (e.g. integer IDs) are stored as strings
+        series = _typed_as_text(series)
+    else:
+        series = _mixed_as_text(series)
+    cleaned = series.astype(object).mask(missing, '')
+    
+    if col == 'equipment_id':
+        checks.append((_is_blank(cleaned), 'Equipment ID is required'))
+    if col in TEXT_MAX_LENGTHS:
+        max_length = TEXT_MAX_LENGTHS[col]
+        lengths = _text_accessor(cleaned).len()
+        checks.append(((lengths > max_length).fillna(False).astype(bool), f'Longer than {max_length} characters'))
+    return cleaned, checks
+
+
+def _clean_dynamic_column(series: pd.Series) -> pd.Series:
+    """
+    Clean an additional (non-standard) column, column-at-a-time.
+    Numeric-looking values become floats, anything else falls back to str,
+    and missing or empty cells become None.
+    """
+    if is_numeric_dtype(series):
+        return series.astype(float).astype(object).mask(series.isna(), None)
+    
+    missing = series.isna() | (series == '')
+    # Float like typed numeric columns, also when every value is an integer or boolean
+    numeric = pd.to_numeric(series, errors='coerce').astype(float)
+    is_text = numeric.isna() & ~missing
+    
+    cleaned = numeric.astype(object)
+    cleaned[is_text] = series[is_text].astype(str)
+    return cleaned.mask(missing, None)
+
+
+def clean_columns(df: pd.DataFrame) -> CleanedColumns:
+    """
+    Clean and validate every column of a prepared DataFrame, column-at-a-time.
+    
+    Rows with a value that cannot be stored (a missing ID, text longer than
+    its model field, a number or date that does not parse) are left out and
+    reported as RowErrors instead. Validation is a handful of boolean masks
+    per column, so valid files cost no per-row Python work.
+    
+    Args:
+        df: DataFrame returned by prepare_dataframe
+    
+    Returns:
+        CleanedColumns holding plain Python value lists, cheap to pickle
+        between processes and to zip into records
+    """
+    standard_keys, standard_series = [], []
+    dynamic_keys, dynamic_series = [], []
+    invalid = np.zeros(len(df.index), dtype=bool)
+    errors = []
+    
+    for position, col in enumerate(df.columns):
+        series = df.iloc[:, position]
+        if col in STANDARD_COLUMNS:
+            cleaned, checks = _clean_standard_column(col, series)
+            standard_keys.append(col)
+            standard_series.append(cleaned)
+            for mask, message in checks:
+                rows = np.flatnonzero(mask.to_numpy())
+                if not len(rows):
+                    continue
+                invalid[rows] = True
+                values = series.to_numpy()[rows]
+                errors.extend(
+                    RowError(int(row), col, '' if pd.isna(value) else str(value)[:ERROR_VALUE_LENGTH], message)
+                    for row, value in zip(rows, values)
+                )
+        else:
+            dynamic_keys.append(col)
+            dynamic_series.append(_clean_dynamic_column(series))
+    
+    positions = np.flatnonzero(~invalid)
+    if errors:
+        # Errors are collected per column, report them in row order
+        errors.sort(key=lambda error: error.row)
+        standard_series = [series.iloc[positions] for series in standard_series]
+        dynamic_series = [series.iloc[positions] for series in dynamic_series]
+    
+    return CleanedColumns(
+        standard_keys, [series.tolist() for series in standard_series],
+        dynamic_keys, [series.tolist() for series in dynamic_series],
+        len(positions), positions.tolist(), errors, len(df.index)
+    )
+
+
+def zip_records(cleaned: CleanedColumns, first_row: int = FIRST_DATA_ROW) -> Iterator[Dict[str, Any]]:
+    """
+    Yield equipment records from cleaned columns.
+    
+    Standard columns become top-level keys, every other column is collected
+    into the 'additional_params' dictionary. 'row_number' is the record's
+    row in the file, counting from first_row for the first row of the chunk.
+    """
+    standard_rows = zip(*cleaned.standard_values) if cleaned.standard_values else repeat((), cleaned.row_count)
+    dynamic_rows = zip(*cleaned.dynamic_values) if cleaned.dynamic_values else repeat((), cleaned.row_count)
+    
+    for position, standard_row, dynamic_row in zip(cleaned.positions, standard_rows, dynamic_rows):
+        yield {
+            **dict(zip(cleaned.standard_keys, standard_row)),
+            'additional_params': dict(zip(cleaned.dynamic_keys, dynamic_row)),
+            'row_number': first_row + position,
+        }
+
+
+def find_record_boundaries(file_path: str, range_size: int) -> Iterator[tuple[int, int]]:
+    """
+    Split a CSV file into byte ranges that each hold whole records.
+    
+    Ranges are roughly range_size bytes and always end just after a line
+    break that is outside a quoted field, so quoted values spanning several
+    lines are never cut. The header row is not part of any range.
+    
+    Args:
+        file_path: Path to the CSV file
+        range_size: Approximate size of each range in bytes
+    
+    Yields:
+        Tuples of (start, end) byte offsets
+    """
+    in_quotes = False
+    range_start = None
+    target = 0  # The first boundary found is the end of the header row
+    offset = 0
+    
+    with open(file_path, 'rb') as csv_file:
+        while True:
+            block = csv_file.read(BOUNDARY_SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            
+            pos = 0
+            while True:
+                scan_from = target - offset
+                if scan_from >= len(block):
+                    in_quotes ^= bool(block.count(b'"', pos) & 1)
+                    break
+                scan_from = max(scan_from, pos)
+                in_quotes ^= bool(block.count(b'"', pos, scan_from) & 1)
+                
+                newline = block.find(b'\n', scan_from)
+                if newline == -1:
+                    in_quotes ^= bool(block.count(b'"', scan_from) & 1)
+                    # Keep looking for a line break from the start of the next block
+                    target = max(target, offset + len(block))
+                    break
+                
+                in_quotes ^= bool(block.count(b'"', scan_from, newline) & 1)
+                pos = newline + 1
+                if in_quotes:
+                    # Line break inside a quoted field, try the next one
+                    target = offset + pos
+                    continue
+                
+                boundary = offset + pos
+                if range_start is not None:
+                    yield range_start, boundary
+                range_start = boundary
+                target = boundary + range_size
+            
+            offset += len(block)
+    
+    if range_start is not None and offset > range_start:
+        yield range_start, offset
+
+
+def parse_csv_range(file_path: str, start: int, end: int, columns: List[str]) -> CleanedColumns:
+    """
+    Parse and clean one byte range of a CSV file.
+    
+    Runs in a parse worker process, so it only returns plain Python values.
+    
+    Args:
+        file_path: Path to the CSV file
+        start: Offset of the first byte of the range
+        end: Offset just past the last byte of the range
+        columns: Column names from the file's header row
+    
+    Returns:
+        CleanedColumns for the records in the range
+    """
+    with open(file_path, 'rb') as csv_file:
+        csv_file.seek(start)
+        data = csv_file.read(end - start)
+    
+    try:
+        df = pd.read_csv(BytesIO(data), header=None, names=columns,
+                         dtype={name: str for name in text_columns(columns)})
+    except EmptyDataError:
+        df = pd.DataFrame(columns=columns)
+    
+    _, df, _ = prepare_dataframe(df)
+    return clean_columns(df)
+
+
+def parse_archive_member(file_path: str, member_name: str, max_size: int,
+                         max_ratio: float) -> tuple[Optional[CleanedColumns], str]:
+    """
+    Parse, map and clean one CSV file of a ZIP archive.
+    
+    Runs in a parse worker process, so it only returns plain Python values.
+    Errors are returned rather than raised, so that one bad file does not
+    stop the other files of the archive.
+    
+    Args:
+        file_path: Path to the ZIP archive
+        member_name: Name of the CSV file inside the archive
+        max_size: Maximum number of decompressed bytes
+        max_ratio: Maximum decompressed/compressed size ratio
+    
+    Returns:
+        Tuple of (cleaned_columns, error_message); cleaned_columns is None on error
+    """
+    try:
+        with open_zip_member(file_path, member_name, max_size, max_ratio) as source:
+            columns = pd.read_csv(source, nrows=0).columns.tolist()
+        with open_zip_member(file_path, member_name, max_size, max_ratio) as source:
+            df = pd.read_csv(source, dtype={name: str for name in text_columns(columns)})
+    except DecompressionLimitError as e:
+        return None, str(e)
+    except EmptyDataError:
+        return None, "File is empty."
+    except Exception as e:
+        return None, f"Error parsing CSV file: {str(e)}"
+    
+    success, df, error_msg = prepare_dataframe(df)
+    if not success:
+        return None, error_msg
+    return clean_columns(df), ""
@@ -1,8 +1,22 @@
 """
 Serializers for API models and responses.
 """
+from django.conf import settings
 from rest_framework import serializers
-from .models import CSVUpload, Equipment, DataSummary
+from .columnar import is_columnar
+from .compression import is_csv_upload_name
+from .models import CSVUpload, Equipment, DataSummary, UploadSession
+from .workbook import is_workbook
+
+UPLOAD_NAME_ERROR = (
+    "Only CSV (.csv, .csv.gz, .csv.bz2, .csv.xz or .zip), Parquet (.parquet), "
+    "Arrow IPC (.arrow, .feather, .arrows) or Excel (.xlsx) files are allowed."
+)
+
+
+def is_supported_upload_name(name):
+    """Return True if an uploaded file name has a supported format."""
+    return is_csv_upload_name(name) or is_columnar(name) or is_workbook(name)
 
 
 class EquipmentSerializer(serializers.ModelSerializer):
@@ -68,19 +82,40 @@ class CSVUploadSerializer(serializers.ModelSerializer):
     Serializer for CSV upload tracking.
     """
     equipment_count = serializers.SerializerMethodField()
+    processed = serializers.ReadOnlyField()
     
     class Meta:
         model = CSVUpload
         fields = [
-            'id', 'file', 'filename', 'uploaded_at',
-            'processed', 'total_records', 'equipment_count'
+            'id', 'file', 'filename', 'sheet_name', 'batch_id', 'archive_batch', 'uploaded_at', 'status',
+            'processed', 'file_rows', 'total_records', 'rejected_records', 'equipment_count',
+            'ingest_seconds', 'rows_per_sec', 'peak_rss_bytes', 'stage_timings'
+        ]
+        read_only_fields = [
+            'id', 'sheet_name', 'batch_id', 'archive_batch', 'uploaded_at', 'status',
+            'file_rows', 'total_records', 'rejected_records', 'ingest_seconds', 'rows_per_sec', 'peak_rss_bytes', 'stage_timings'
         ]
-        read_only_fields = ['id', 'uploaded_at', 'processed', 'total_records']
     
     def get_equipment_count(self, obj):
         return obj.equipment.count()
 
 
+class IngestionJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for background ingestion job status.
+    """
+    job_id = serializers.IntegerField(source='id', read_only=True)
+    error = serializers.CharField(source='error_message', read_only=True)
+    
+    class Meta:
+        model = CSVUpload
+        fields = [
+            'job_id', 'filename', 'sheet_name', 'uploaded_at', 'status',
+            'file_rows', 'rows_processed', 'heartbeat_at', 'total_records', 'rejected_records', 'member_results', 'error',
+            'ingest_seconds', 'rows_per_sec', 'peak_rss_bytes', 'stage_timings'
+        ]
+
+
 class DataSummarySerializer(serializers.ModelSerializer):
     """
     Serializer for data summary statistics.
@@ -115,16 +150,66 @@ class FileUploadSerializer(serializers.Serializer):
         Validate uploaded file.
         """
         # Check file extension
-        if not value.name.endswith('.csv'):
-            raise serializers.ValidationError("Only CSV files are allowed.")
+        if not is_supported_upload_name(value.name):
+            raise serializers.ValidationError(UPLOAD_NAME_ERROR)
         
-        # Check file size (10MB limit)
-        if value.size > 10 * 1024 * 1024:
-            raise serializers.ValidationError("File size must not exceed 10MB.")
+        # Check file size (CSV_MAX_SIZE limit)
+        if value.size > settings.CSV_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File size must not exceed {settings.CSV_MAX_SIZE // (1024 * 1024)}MB."
+            )
         
         return value
 
 
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for resumable chunked upload sessions.
+    """
+    received_chunks = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = UploadSession
+        fields = [
+            'id', 'filename', 'total_size', 'total_chunks',
+            'received_chunks', 'csv_upload', 'created_at'
+        ]
+        read_only_fields = ['id', 'csv_upload', 'created_at']
+    
+    def get_received_chunks(self, obj):
+        from .chunked_upload import received_chunks
+        return received_chunks(obj)
+    
+    def validate_filename(self, value):
+        """
+        Validate the name of the file being uploaded.
+        """
+        if not is_supported_upload_name(value):
+            raise serializers.ValidationError(UPLOAD_NAME_ERROR)
+        return value
+    
+    def validate_total_size(self, value):
+        """
+        Validate the size of the complete file.
+        """
+        if value <= 0:
+            raise serializers.ValidationError("File must not be empty.")
+        if value > settings.CSV_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"File size must not exceed {settings.CSV_MAX_SIZE // (1024 * 1024)}MB."
+            )
+        return value
+    
+    def validate(self, attrs):
+        chunk_size = -(-attrs['total_size'] // attrs['total_chunks'])
+        if chunk_size > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+            raise serializers.ValidationError(
+                f"Chunks must not exceed {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE // (1024 * 1024)}MB, "
+                f"use at least {-(-attrs['total_size'] // settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE)} chunks."
+            )
+        return attrs
+
+
 class ChartDataSerializer(serializers.Serializer):
     """
     Serializer for chart data responses.
@@ -164,6 +249,15 @@ class SummaryCardsSerializer(serializers.Serializer):
     total_types = serializers.IntegerField()
 
 
+class DashboardBundleSerializer(serializers.Serializer):
+    """
+    Serializer for the dashboard's summary cards and charts in one response.
+    """
+    summary = SummaryCardsSerializer()
+    type_distribution = TypeDistributionSerializer()
+    flowrate_chart = FlowrateChartSerializer()
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for User model.
@@ -0,0 +1,105 @@
+"""
+Synthetic equipment data for benchmarks.
+
+Generates CSV files shaped like real plant exports: the standard columns
+with plausible values, a configurable number of dynamic parameter columns
+and a configurable share of empty cells. Rows are generated and written in
+vectorised chunks, so files of millions of rows need little memory. Only
+depends on numpy and pandas.
+"""
+import numpy as np
+import pandas as pd
+
+EQUIPMENT_TYPES = ['Pump', 'Valve', 'Tank', 'Reactor', 'Heat Exchanger', 'Compressor',
+                   'Separator', 'Mixer', 'Filter', 'Condenser']
+TYPE_WEIGHTS = [0.25, 0.2, 0.12, 0.06, 0.1, 0.08, 0.06, 0.05, 0.05, 0.03]
+
+STATUSES = ['Active', 'Inactive', 'Maintenance']
+STATUS_WEIGHTS = [0.7, 0.15, 0.15]
+
+MANUFACTURERS = ['Flowserve', 'Sulzer', 'Emerson', 'Alfa Laval', 'KSB', 'Grundfos', 'Atlas Copco']
+LOCATIONS = [f'Unit {unit} / Area {area}' for unit in range(1, 9) for area in 'ABCD']
+CATEGORIES = ['low', 'normal', 'high', 'critical']
+
+# Columns that never get empty cells, so every generated row is ingestible
+REQUIRED_COLUMNS = ['Equipment ID', 'Type']
+
+# Rows generated and written at a time
+GENERATE_CHUNK_SIZE = 100000
+
+
+def generate_chunk(rng: np.random.Generator, start: int, rows: int,
+                   dynamic_columns: int = 5, null_rate: float = 0.05) -> pd.DataFrame:
+    """
+    Generate rows start .. start + rows - 1 of a synthetic equipment table.
+    
+    Args:
+        rng: Random generator the values are drawn from
+        start: Index of the first row, used for unique equipment IDs
+        rows: Number of rows to generate
+        dynamic_columns: Number of extra parameter columns; every third one is categorical
+        null_rate: Share of empty cells in each optional column
+    
+    Returns:
+        DataFrame with CSV column names
+    """
+    index = np.arange(start, start + rows)
+    types = rng.choice(EQUIPMENT_TYPES, size=rows, p=TYPE_WEIGHTS)
+    installed = pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 8000, size=rows), unit='D')
+    maintained = installed + pd.to_timedelta(rng.integers(0, 3000, size=rows), unit='D')
+    
+    columns = {
+        'Equipment ID': pd.Series(index).map('EQ-{:08d}'.format),
+        'Equipment Name': pd.Series(types).str.cat(pd.Series(index).astype(str), sep='-'),
+        'Type': types,
+        'Manufacturer': rng.choice(MANUFACTURERS, size=rows),
+        'Model Number': pd.Series(rng.integers(100, 999, size=rows)).map('M-{}'.format),
+        'Serial Number': pd.Series(rng.integers(10 ** 7, 10 ** 8, size=rows)).astype(str),
+        'Capacity': np.round(rng.uniform(10, 5000, size=rows), 1),
+        'Flowrate': np.round(rng.gamma(4.0, 30.0, size=rows), 2),
+        'Pressure': np.round(rng.uniform(1, 40, size=rows), 2),
+        'Temperature': np.round(rng.normal(90, 35, size=rows), 1),
+        'Location': rng.choice(LOCATIONS, size=rows),
+        'Status': rng.choice(STATUSES, size=rows, p=STATUS_WEIGHTS),
+        'Installation Date': installed.strftime('%Y-%m-%d'),
+        'Last Maintenance': maintained.strftime('%Y-%m-%d'),
+        'Notes': rng.choice(['', 'Inspected', 'Seal replaced', 'Vibration monitored'], size=rows),
+    }
+    for number in range(1, dynamic_columns + 1):
+        name = f'Param {number:02d}'
+        if number % 3 == 0:
+            columns[name] = rng.choice(CATEGORIES, size=rows)
+        else:
+            columns[name] = np.round(rng.normal(50, 15, size=rows), 3)
+    
+    df = pd.DataFrame(columns)
+    if null_rate > 0:
+        for name in df.columns:
+            if name not in REQUIRED_COLUMNS:
+                df[name] = df[name].mask(rng.random(rows) < null_rate)
+    return df
+
+
+def write_equipment_csv(path: str, rows: int, dynamic_columns: int = 5,
+                        null_rate: float = 0.05, seed: int = 0) -> int:
+    """
+    Write a synthetic equipment CSV file.
+    
+    The same arguments always produce the same file.
+    
+    Args:
+        path: Output file path
+        rows: Number of data rows
+        dynamic_columns: Number of extra parameter columns
+        null_rate: Share of empty cells in each optional column
+        seed: Random seed
+    
+    Returns:
+        Size of the written file in bytes
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', newline='') as csv_file:
+        for start in range(0, max(rows, 1), GENERATE_CHUNK_SIZE):
+            chunk = generate_chunk(rng, start, min(GENERATE_CHUNK_SIZE, rows - start), dynamic_columns, null_rate)
+            chunk.to_csv(csv_file, index=False, header=start == 0)
+        return csv_file.tell()
@@ -1,11 +1,56 @@
 """
 Tests for API endpoints.
 """
-from django.test import TestCase
+import bz2
+import gzip
+import hashlib
+import importlib
+import lzma
+import os
+import tempfile
+import threading
+import time
+import json
+import sys
+import zipfile
+from datetime import timedelta
+from concurrent.futures import Future
+from io import BytesIO, StringIO
+from unittest import mock
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.move import file_move_safe
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.client import FakePayload
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from .models import Equipment, CSVUpload, DataSummary
+from . import jobs
+from .dashboard_cache import bump_data_version, cache_stats, get_data_version, reset_cache_stats
+from .csv_engines import ENGINE_C, available_engines, select_engine
+from .jobs import run_ingestion_job, schedule_pruning
+from .metrics import IngestionMetrics
+from .parsing import TEXT_MAX_LENGTHS, find_record_boundaries
+from .synthetic import REQUIRED_COLUMNS, write_equipment_csv
+from .upload_handlers import RecordCounter, incoming_dir
+from .utils import (
+    CSVParseError, RowErrorLog, aggregate_equipment_metrics, build_equipment_fields, calculate_summary_statistics,
+    ingest_csv_upload, parse_csv_file, prune_old_uploads, save_equipment_from_csv, store_upload, stream_csv_file,
+    user_equipment
+)
 
 
 class EquipmentAPITestCase(APITestCase):
@@ -114,6 +159,282 @@ class DashboardAPITestCase(APITestCase):
         self.assertIn('counts', response.data)
 
 
+class DashboardMetricsTestCase(APITestCase):
+    """
+    Test cases for the shared equipment metrics aggregation.
+    """
+    
+    def setUp(self):
+        """Set up two users' equipment and an authenticated client."""
+        self.user = User.objects.create_user(username='operator', password='secret123')
+        other = User.objects.create_user(username='other', password='secret123')
+        csv_upload = CSVUpload.objects.create(user=self.user, filename='plant.csv')
+        other_upload = CSVUpload.objects.create(user=other, filename='other.csv')
+        for i in range(12):
+            Equipment.objects.create(
+                csv_upload=csv_upload, equipment_id=f'EQ-{i:03d}', equipment_name=f'Unit {i}',
+                equipment_type=['Pump', 'Valve', 'Tank'][i % 3],
+                status=['Active', 'Inactive', 'Maintenance', 'Active'][i % 4],
+                flowrate=None if i % 5 == 0 else i * 10.0, pressure=2.0, temperature=50.0 + i
+            )
+        Equipment.objects.create(
+            csv_upload=other_upload, equipment_id='OTHER-1', equipment_name='Other',
+            equipment_type='Reactor', status='Active', flowrate=999.0
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+    
+    def test_dashboard_summary_is_one_query(self):
+        """Test that every dashboard card metric comes from a single SQL statement."""
+        # Plus the data version lookup of the response cache
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api:dashboard-summary'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_equipment'], 12)
+        self.assertEqual(response.data['active_equipment'], 6)
+        self.assertEqual(response.data['inactive_equipment'], 3)
+        self.assertEqual(response.data['maintenance_equipment'], 3)
+        self.assertEqual(response.data['total_types'], 3)
+        flowrates = [i * 10.0 for i in range(12) if i % 5]
+        self.assertAlmostEqual(response.data['avg_flowrate'], round(sum(flowrates) / len(flowrates), 2))
+        self.assertAlmostEqual(response.data['avg_temperature'], 55.5)
+    
+    def test_metrics_match_summary_statistics(self):
+        """Test that the dashboard and stored summaries aggregate the same way."""
+        csv_upload = CSVUpload.objects.get(user=self.user)
+        summary = calculate_summary_statistics(csv_upload)
+        
+        with self.assertNumQueries(1):
+            metrics = aggregate_equipment_metrics(user_equipment(self.user))
+        
+        for field in ['total_equipment', 'active_equipment', 'inactive_equipment', 'maintenance_equipment',
+                      'max_flowrate', 'min_flowrate']:
+            self.assertEqual(metrics[field], getattr(summary, field))
+        self.assertAlmostEqual(metrics['avg_flowrate'], summary.avg_flowrate)
+        self.assertEqual(metrics['total_types'], len(summary.type_distribution))
+    
+    def test_bundle_matches_separate_endpoints(self):
+        """Test that the bundle returns the three dashboard payloads from one scan plus the chart's top rows."""
+        csv_upload = CSVUpload.objects.get(user=self.user)
+        Equipment.objects.filter(equipment_id='EQ-000').update(equipment_type='Reactor')
+        for params in ({}, {'csv_upload': csv_upload.id}):
+            # Plus the data version lookup of the response cache
+            with self.assertNumQueries(3):
+                bundle = self.client.get(reverse('api:dashboard-bundle'), params)
+            
+            self.assertEqual(bundle.status_code, status.HTTP_200_OK)
+            self.assertEqual(bundle.data['summary'], self.client.get(reverse('api:dashboard-summary')).data)
+            self.assertEqual(
+                bundle.data['type_distribution'],
+                self.client.get(reverse('api:type-distribution'), params).data
+            )
+            self.assertEqual(
+                bundle.data['flowrate_chart'],
+                self.client.get(reverse('api:flowrate-chart'), params).data
+            )
+        
+        other_upload = CSVUpload.objects.exclude(user=self.user).get()
+        empty = self.client.get(reverse('api:dashboard-bundle'), {'csv_upload': other_upload.id})
+        self.assertEqual(empty.data['summary']['total_equipment'], 0)
+        self.assertIsNone(empty.data['summary']['avg_flowrate'])
+        self.assertEqual(empty.data['flowrate_chart']['equipment_ids'], [])
+    
+    def test_report_summary_is_one_query(self):
+        """Test that a report costs one query for its summary and one for its rows."""
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('api:generate-report'), {'type': 'Pump'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+
+class DashboardCacheTestCase(APITestCase):
+    """
+    Test cases for the versioned dashboard response cache.
+    """
+    
+    def setUp(self):
+        """Set up equipment and an authenticated client, with an empty cache."""
+        self.user = User.objects.create_user(username='operator', password='secret123')
+        self.csv_upload = CSVUpload.objects.create(
+            user=self.user, filename='plant.csv', status=CSVUpload.STATUS_COMPLETED
+        )
+        for i in range(4):
+            Equipment.objects.create(
+                csv_upload=self.csv_upload, equipment_id=f'EQ-{i:03d}', equipment_name=f'Unit {i}',
+                equipment_type='Pump', status='Active', flowrate=10.0 * i
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        reset_cache_stats()
+    
+    def test_repeated_request_is_served_from_cache(self):
+        """Test that a repeated request only looks up the data version, per query parameters."""
+        url = reverse('api:dashboard-bundle')
+        first = self.client.get(url)
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(second.data, first.data)
+        
+        filtered = self.client.get(url, {'csv_upload': self.csv_upload.id + 1})
+        self.assertEqual(filtered.data['summary']['total_equipment'], 0)
+        
+        stats = self.client.get(reverse('api:dashboard-cache-stats')).data
+        self.assertEqual(stats['endpoints']['bundle'], {'hits': 1, 'misses': 2})
+        self.assertEqual(stats['hit_rate'], round(1 / 3, 4))
+    
+    def test_equipment_edit_is_never_served_stale(self):
+        """Test that editing and deleting equipment invalidates the cached responses."""
+        url = reverse('api:dashboard-summary')
+        self.assertEqual(self.client.get(url).data['active_equipment'], 4)
+        equipment = Equipment.objects.get(equipment_id='EQ-000')
+        
+        self.client.patch(reverse('api:equipment-detail', args=[equipment.id]), {'status': 'Inactive'})
+        self.assertEqual(self.client.get(url).data['active_equipment'], 3)
+        
+        self.client.delete(reverse('api:equipment-detail', args=[equipment.id]))
+        self.assertEqual(self.client.get(url).data['total_equipment'], 3)
+        self.assertEqual(cache_stats()['hits'], 0)
+    
+    def test_upload_and_prune_bump_data_version(self):
+        """Test that ingesting and pruning uploads move the user's data version."""
+        chart_url = reverse('api:flowrate-chart')
+        self.assertEqual(len(self.client.get(chart_url).data['equipment_ids']), 4)
+        
+        csv_file = SimpleUploadedFile('more.csv', b'Equipment Name,Type,Flowrate\nPump-9,Pump,90\n')
+        with mock.patch('api.views.schedule_pruning'):
+            response = self.client.post(reverse('api:csv-upload-list'), {'file': csv_file}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        version = get_data_version(self.user.pk)
+        self.assertGreater(version, 0)
+        self.assertEqual(len(self.client.get(chart_url).data['equipment_ids']), 5)
+        
+        prune_old_uploads(self.user, keep=1)
+        self.assertEqual(get_data_version(self.user.pk), version + 1)
+        self.assertEqual(len(self.client.get(chart_url).data['equipment_ids']), 1)
+        
+        prune_old_uploads(self.user, keep=1)
+        self.assertEqual(get_data_version(self.user.pk), version + 1)
+    
+    
+    def test_rows_taken_over_by_another_user_invalidate_the_previous_owner(self):
+        """Test that another user's upload moving equipment away is not hidden by the cache."""
+        url = reverse('api:dashboard-summary')
+        self.assertEqual(self.client.get(url).data['total_equipment'], 4)
+        
+        other = User.objects.create_user(username='other', password='secret123')
+        other_upload = CSVUpload.objects.create(user=other, filename='other.csv')
+        save_equipment_from_csv(other_upload, [
+            {'equipment_id': 'EQ-000', 'equipment_name': 'Unit 0', 'equipment_type': 'Pump', 'status': 'Active'},
+            {'equipment_id': 'EQ-001', 'equipment_name': 'Moved', 'equipment_type': 'Pump', 'status': 'Active'},
+        ])
+        
+        self.assertEqual(self.client.get(url).data['total_equipment'], 2)
+        self.assertEqual(Equipment.objects.filter(owner=self.user).count(), 2)
+        self.assertEqual(cache_stats()['hits'], 0)
+
+
+class ConditionalGetTestCase(APITestCase):
+    """
+    Test cases for ETags and 304 responses on read endpoints.
+    """
+    
+    def setUp(self):
+        """Set up equipment and an authenticated client, with an empty cache."""
+        self.user = User.objects.create_user(username='operator', password='secret123')
+        self.csv_upload = CSVUpload.objects.create(
+            user=self.user, filename='plant.csv', status=CSVUpload.STATUS_COMPLETED
+        )
+        for i in range(3):
+            Equipment.objects.create(
+                csv_upload=self.csv_upload, equipment_id=f'EQ-{i:03d}', equipment_name=f'Unit {i}',
+                equipment_type=['Pump', 'Valve', 'Pump'][i], status='Active', flowrate=10.0 * i
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+    
+    def test_unchanged_data_is_not_modified(self):
+        """Test that a matching If-None-Match costs only the version lookup on every read endpoint."""
+        urls = [
+            reverse('api:equipment-list'),
+            reverse('api:equipment-detail', args=[Equipment.objects.first().id]),
+            reverse('api:equipment-types'),
+            reverse('api:csv-upload-list'),
+            reverse('api:dashboard-summary'),
+            reverse('api:flowrate-chart'),
+            reverse('api:type-distribution'),
+            reverse('api:dashboard-bundle'),
+        ]
+        for url in urls:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK, url)
+            self.assertRegex(first['ETag'], r'^"[0-9a-f]{32}"$')
+            self.assertIn('no-cache', first['Cache-Control'])
+            
+            with self.assertNumQueries(1):
+                second = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertEqual(second.content, b'')
+    
+    def test_etag_depends_on_parameters_and_data(self):
+        """Test that other parameters or changed data give another ETag and a full response."""
+        url = reverse('api:equipment-list')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'type': 'Pump'})['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='*').status_code, 304)
+        
+        equipment = Equipment.objects.get(equipment_id='EQ-001')
+        self.client.patch(reverse('api:equipment-detail', args=[equipment.id]), {'status': 'Inactive'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        other = User.objects.create_user(username='other', password='secret123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+    
+    def test_new_upload_changes_upload_list(self):
+        """Test that storing an upload changes the ETag of the upload list."""
+        url = reverse('api:csv-upload-list')
+        etag = self.client.get(url)['ETag']
+        store_upload(self.user, SimpleUploadedFile('more.csv', b'Type\nPump\n'), 'more.csv', 'abc')
+        
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+    
+    def test_rows_taken_over_by_another_user_change_the_etag(self):
+        """Test that the previous owner's ETags stop matching once another user's upload takes rows over."""
+        urls = [reverse('api:equipment-list'), reverse('api:equipment-types'), reverse('api:dashboard-bundle')]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        
+        other = User.objects.create_user(username='other', password='secret123')
+        other_upload = CSVUpload.objects.create(user=other, filename='other.csv')
+        save_equipment_from_csv(other_upload, [
+            {'equipment_id': 'EQ-001', 'equipment_name': 'Unit 1', 'equipment_type': 'Valve', 'status': 'Active'},
+        ])
+        
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertNotEqual(response['ETag'], etags[url])
+        self.assertEqual(self.client.get(urls[0]).data['count'], 2)
+        self.assertEqual(self.client.get(urls[1]).data['types'], ['Pump'])
+    
+    def test_missing_object_has_no_etag(self):
+        """Test that error responses are returned without an ETag."""
+        response = self.client.get(reverse('api:equipment-detail', args=[999999]))
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
+
+
 class HealthCheckTestCase(APITestCase):
     """
     Test case for health check endpoint.
@@ -127,3 +448,1434 @@ class HealthCheckTestCase(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['status'], 'healthy')
 
+
+class CSVParsingTestCase(TestCase):
+    """
+    Test cases for CSV parsing utilities.
+    """
+    
+    def write_csv(self, content):
+        """Write CSV content to a temporary file and return its path."""
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as csv_file:
+            csv_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+    
+    def test_standard_and_dynamic_columns_are_split(self):
+        """Test that unknown columns are collected into additional_params."""
+        path = self.write_csv(
+            'Equipment Name,Type,Flowrate,Humidity,Vibration,Notes\n'
+            'Pump-1,Pump,120,45.5,high,Primary\n'
+            'Valve-1,Valve,,unknown,,\n'
+        )
+        success, data_list, error_msg = parse_csv_file(path)
+        
+        self.assertTrue(success, error_msg)
+        self.assertEqual(len(data_list), 2)
+        self.assertEqual(data_list[0]['equipment_id'], 'Pump-1')
+        self.assertEqual(data_list[0]['flowrate'], 120.0)
+        self.assertEqual(data_list[0]['notes'], 'Primary')
+        self.assertEqual(data_list[0]['additional_params'], {'humidity': 45.5, 'vibration': 'high'})
+        self.assertIsNone(data_list[1]['flowrate'])
+        self.assertEqual(data_list[1]['notes'], '')
+        self.assertEqual(data_list[1]['additional_params'], {'humidity': 'unknown', 'vibration': None})
+    
+    def test_missing_numeric_dynamic_values_become_none(self):
+        """Test that empty cells in numeric extra columns are stored as None."""
+        path = self.write_csv('Equipment Name,Type,Humidity\nPump-1,Pump,40\nPump-2,Pump,\n')
+        success, data_list, error_msg = parse_csv_file(path)
+        
+        self.assertTrue(success, error_msg)
+        self.assertEqual(data_list[0]['additional_params'], {'humidity': 40.0})
+        self.assertEqual(data_list[1]['additional_params'], {'humidity': None})
+    
+    def test_streaming_matches_full_parse(self):
+        """Test that chunked streaming yields the same records as a full parse."""
+        rows = ''.join(f'Pump-{i},Pump,{i if i % 3 else ""},{"high" if i % 4 else 7}\n' for i in range(10))
+        path = self.write_csv('Equipment Name,Type,Flowrate,Vibration\n' + rows)
+        
+        success, data_list, error_msg = parse_csv_file(path)
+        stream_success, records, stream_error = stream_csv_file(path, chunk_size=3)
+        
+        self.assertTrue(success, error_msg)
+        self.assertTrue(stream_success, stream_error)
+        self.assertEqual(list(records), data_list)
+    
+    def test_record_boundaries_respect_quoted_line_breaks(self):
+        """Test that byte ranges never split a quoted multi-line field."""
+        content = 'Equipment Name,Type,Notes\n' + ''.join(
+            f'Pump-{i},Pump,"first line\nsecond, ""quoted"" line"\n' for i in range(20)
+        )
+        path = self.write_csv(content)
+        ranges = list(find_record_boundaries(path, range_size=10))
+        
+        self.assertEqual(ranges[0][0], len('Equipment Name,Type,Notes\n'))
+        self.assertEqual(ranges[-1][1], len(content.encode()))
+        self.assertEqual(len(ranges), 20)
+        with open(path, 'rb') as csv_file:
+            data = csv_file.read()
+        for start, end in ranges:
+            self.assertTrue(data[start:end].startswith(b'Pump-'))
+    
+    @override_settings(CSV_PARALLEL_THRESHOLD=0, CSV_PARALLEL_RANGE_SIZE=200)
+    def test_parallel_parse_matches_sequential(self):
+        """Test that parsing byte ranges in worker processes yields the same records."""
+        rows = ''.join(f'Pump-{i},Pump,{i},"note {i}\nmore",{"high" if i % 4 else 7}\n' for i in range(40))
+        path = self.write_csv('Equipment Name,Type,Flowrate,Notes,Vibration\n' + rows)
+        
+        _, sequential, _ = stream_csv_file(path, workers=1)
+        success, parallel, error_msg = stream_csv_file(path, workers=2)
+        
+        self.assertTrue(success, error_msg)
+        self.assertEqual(list(parallel), list(sequential))
+    
+    @override_settings(CSV_PARALLEL_THRESHOLD=0, CSV_PARALLEL_RANGE_SIZE=100)
+    def test_invalid_rows_are_reported_with_row_numbers(self):
+        """Test that invalid rows are left out and reported by their row in the file."""
+        rows = [f'Pump-{i},Pump,{i},2023-01-01,Active\n' for i in range(20)]
+        rows[3] = 'Pump-3,Pump,fast,2023-01-01,Active\n'
+        rows[8] = ',Pump,8,2023-01-01,Active\n'
+        rows[12] = 'Pump-12,Pump,12,someday,Active\n'
+        rows[17] = f'Pump-17,Pump,17,2023-01-01,{"x" * 21}\n'
+        path = self.write_csv('Equipment Name,Type,Flowrate,Installation Date,Status\n' + ''.join(rows))
+        
+        results = {}
+        for label, options in (('sequential', {'workers': 1, 'chunk_size': 3}), ('parallel', {'workers': 2})):
+            row_errors = RowErrorLog()
+            success, records, error_msg = stream_csv_file(path, row_errors=row_errors, **options)
+            self.assertTrue(success, error_msg)
+            results[label] = (list(records), row_errors.errors, row_errors.rejected_rows)
+        
+        records, errors, rejected_rows = results['sequential']
+        self.assertEqual(results['parallel'], results['sequential'])
+        self.assertEqual(rejected_rows, 4)
+        self.assertEqual(len(records), 16)
+        self.assertEqual(records[0]['row_number'], 2)
+        self.assertNotIn(5, [record['row_number'] for record in records])
+        self.assertEqual(
+            [(error.row, error.column, error.message) for error in errors],
+            [(5, 'flowrate', 'Not a number'),
+             (10, 'equipment_id', 'Equipment ID is required'),
+             (14, 'installation_date', 'Not a valid date'),
+             (19, 'status', 'Longer than 20 characters')]
+        )
+        self.assertEqual(errors[0].value, 'fast')
+    
+    def test_text_limits_match_model(self):
+        """Test that validated text lengths are the model's max_length."""
+        for column, max_length in TEXT_MAX_LENGTHS.items():
+            self.assertEqual(Equipment._meta.get_field(column).max_length, max_length, column)
+    
+    def test_missing_type_column_is_rejected(self):
+        """Test that files without an equipment type column are rejected."""
+        path = self.write_csv('Equipment Name,Flowrate\nPump-1,120\n')
+        success, data_list, error_msg = parse_csv_file(path)
+        
+        self.assertFalse(success)
+        self.assertEqual(data_list, [])
+        self.assertIn('Equipment Type', error_msg)
+    
+    def write_compressed(self, content, suffix):
+        """Write CSV content compressed according to suffix and return its path."""
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        data = content.encode()
+        if suffix == '.zip':
+            with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr('export/plant.csv', data)
+        else:
+            opener = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}[suffix]
+            with opener(path, 'wb') as compressed:
+                compressed.write(data)
+        return path
+    
+    def test_compressed_files_match_plain_parse(self):
+        """Test that compressed uploads stream to the same records as plain CSV."""
+        content = 'Equipment Name,Type,Flowrate,Humidity\n' + ''.join(
+            f'Pump-{i},Pump,{i},{"high" if i % 3 else i}\n' for i in range(20)
+        )
+        _, expected, _ = parse_csv_file(self.write_csv(content))
+        
+        for suffix in ('.gz', '.bz2', '.xz', '.zip'):
+            with self.subTest(suffix=suffix):
+                success, records, error_msg = stream_csv_file(self.write_compressed(content, suffix), chunk_size=7)
+                self.assertTrue(success, error_msg)
+                self.assertEqual(list(records), expected)
+    
+    def test_decompressed_size_limit(self):
+        """Test that the size limit applies to the decompressed data."""
+        rows = ''.join(f'Pump-{i},Pump\n' for i in range(200000))
+        path = self.write_compressed('Equipment Name,Type\n' + rows, '.gz')
+        
+        def parse_error():
+            success, records, error_msg = stream_csv_file(path, chunk_size=1000)
+            if not success:
+                return error_msg
+            try:
+                list(records)
+            except CSVParseError as e:
+                return str(e)
+            return ''
+        
+        with override_settings(CSV_MAX_SIZE=1000000):
+            self.assertIn('exceeds the maximum size', parse_error())
+        with override_settings(CSV_MAX_COMPRESSION_RATIO=2):
+            self.assertIn('compression bomb', parse_error())
+        self.assertEqual(parse_error(), '')
+    
+    def write_columnar(self, df, suffix):
+        """Write a DataFrame as Parquet or Arrow IPC and return its path."""
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        table = pa.Table.from_pandas(df)
+        if suffix == '.parquet':
+            pq.write_table(table, path, row_group_size=3)
+        elif suffix == '.arrows':
+            with pa.ipc.new_stream(path, table.schema) as writer:
+                writer.write_table(table, max_chunksize=4)
+        else:
+            with pa.ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table, max_chunksize=4)
+        return path
+    
+    def test_columnar_files_match_csv_parse(self):
+        """Test that Parquet and Arrow IPC files give the same records as CSV."""
+        content = 'Equipment Name,Type,Flowrate,Installation Date,Humidity,Vibration\n' + ''.join(
+            f'Pump-{i},Pump,{i if i % 3 else ""},2023-01-{i + 1:02d},{i / 2},{"high" if i % 2 else "low"}\n'
+            for i in range(10)
+        )
+        csv_path = self.write_csv(content)
+        _, expected, _ = parse_csv_file(csv_path)
+        df = pd.read_csv(csv_path, parse_dates=['Installation Date'])
+        
+        for suffix in ('.parquet', '.arrow', '.feather', '.arrows'):
+            with self.subTest(suffix=suffix):
+                path = self.write_columnar(df, suffix)
+                success, records, error_msg = stream_csv_file(path, chunk_size=4)
+                self.assertTrue(success, error_msg)
+                self.assertEqual(list(records), expected)
+    
+    def test_columnar_typed_identifiers_are_text(self):
+        """Test that integer ID columns from typed files are stored as text."""
+        df = pd.DataFrame({'ID': [101, 102], 'Type': ['Pump', 'Valve'], 'Pressure': [1.5, None]})
+        success, data_list, error_msg = parse_csv_file(self.write_columnar(df, '.parquet'))
+        
+        self.assertTrue(success, error_msg)
+        self.assertEqual(data_list[0]['equipment_id'], '101')
+        self.assertEqual(data_list[0]['pressure'], 1.5)
+        self.assertIsNone(data_list[1]['pressure'])
+    
+    def test_columnar_integer_identifiers_with_nulls_match_csv(self):
+        """Test that integer IDs read as floats because of missing values keep their CSV form."""
+        content = 'ID,Type,Serial Number\n1001,Pump,7\n,Valve,\n1003,Tank,9.5\n'
+        _, expected, _ = parse_csv_file(self.write_csv(content))
+        df = pd.DataFrame({
+            'ID': [1001, None, 1003], 'Type': ['Pump', 'Valve', 'Tank'], 'Serial Number': [7, None, 9.5]
+        })
+        self.assertEqual(df['ID'].dtype, 'float64')
+        
+        success, data_list, error_msg = parse_csv_file(self.write_columnar(df, '.parquet'))
+        self.assertTrue(success, error_msg)
+        self.assertEqual([record['equipment_id'] for record in data_list], ['1001', '1003'])
+        self.assertEqual([record['serial_number'] for record in data_list], ['7', '9.5'])
+        self.assertEqual(data_list, expected)
+    
+    def test_columnar_missing_type_column_is_rejected(self):
+        """Test that typed files are validated against the column mapping up front."""
+        path = self.write_columnar(pd.DataFrame({'Equipment Name': ['Pump-1']}), '.parquet')
+        success, _, error_msg = stream_csv_file(path)
+        
+        self.assertFalse(success)
+        self.assertIn('Equipment Type', error_msg)
+    
+    def test_workbook_sheet_matches_csv_parse(self):
+        """Test that a worksheet streams to the same records as the equivalent CSV."""
+        content = 'Equipment Name,Type,Flowrate,Humidity\n' + ''.join(
+            f'Pump-{i},Pump,{i + 0.5},{"high" if i % 2 else i}\n' for i in range(7)
+        )
+        _, expected, _ = parse_csv_file(self.write_csv(content))
+        
+        workbook = Workbook()
+        workbook.active.title = 'Notes'
+        workbook.active.append(['Written by the historian export'])
+        sheet = workbook.create_sheet('Pumps')
+        for line in content.splitlines():
+            sheet.append([float(value) if value.replace('.', '').isdigit() else value for value in line.split(',')])
+        sheet.append([None, None, None, None])
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workbook.save(path)
+        
+        success, records, error_msg = stream_csv_file(path, chunk_size=3, sheet_name='Pumps')
+        self.assertTrue(success, error_msg)
+        self.assertEqual(list(records), expected)
+        
+        success, _, error_msg = stream_csv_file(path)
+        self.assertFalse(success)
+        self.assertIn("Sheet 'Notes'", error_msg)
+    
+    def test_workbook_mixed_identifier_column_is_text(self):
+        """Test that an Excel ID column mixing numbers and text yields string IDs that can be saved."""
+        workbook = Workbook()
+        workbook.active.append(['Equipment ID', 'Type', 'Location'])
+        workbook.active.append([1001, 'Pump', 7])
+        workbook.active.append(['P-7', 'Valve', 'Hall B'])
+        workbook.active.append([1002.0, 'Tank', None])
+        handle, path = tempfile.mkstemp(suffix='.xlsx')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        workbook.save(path)
+        
+        success, records, error_msg = stream_csv_file(path)
+        self.assertTrue(success, error_msg)
+        records = list(records)
+        self.assertEqual([record['equipment_id'] for record in records], ['1001', 'P-7', '1002'])
+        self.assertEqual([record['location'] for record in records], ['7', 'Hall B', ''])
+        
+        user = User.objects.create_user(username='sheets', password='secret123')
+        csv_upload = CSVUpload.objects.create(user=user, filename='plant.xlsx')
+        self.assertEqual(save_equipment_from_csv(csv_upload, records), (3, 0, 0))
+    
+    def test_zip_must_hold_one_csv(self):
+        """Test that ZIP archives with several CSV files are rejected."""
+        handle, path = tempfile.mkstemp(suffix='.zip')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('a.csv', 'Equipment Name,Type\nPump-1,Pump\n')
+            archive.writestr('b.csv', 'Equipment Name,Type\nPump-2,Pump\n')
+        
+        success, _, error_msg = stream_csv_file(path)
+        self.assertFalse(success)
+        self.assertIn('exactly one CSV file', error_msg)
+    
+    def engine_output(self, path, engine, chunk_size):
+        """Stream a file with one parser backend; return typed records, their fingerprints and row errors."""
+        row_errors = RowErrorLog()
+        with override_settings(CSV_PARSER_ENGINE=engine):
+            success, records, error_msg = stream_csv_file(path, chunk_size=chunk_size, row_errors=row_errors)
+            self.assertTrue(success, error_msg)
+            records = list(records)
+            fingerprints = [build_equipment_fields(CSVUpload(), record)[1].get('fingerprint') for record in records]
+            typed = [
+                sorted((key, type(value), value) for key, value in {
+                    **record, **{f'param:{name}': value for name, value in record.pop('additional_params').items()}
+                }.items())
+                for record in records
+            ]
+        return typed, fingerprints, row_errors.as_dicts()
+    
+    def test_parser_backends_produce_identical_records(self):
+        """Test that every parser backend yields the C parser's records, values and types."""
+        synthetic_path = os.path.join(tempfile.mkdtemp(), 'synthetic.csv')
+        write_equipment_csv(synthetic_path, 300, dynamic_columns=7, null_rate=0.1, seed=3)
+        edge_path = self.write_csv(
+            'Equipment ID,Equipment Name,Type,Serial Number,Flowrate,Pressure,Installation Date,'
+            'Flag,Mixed,Stamp,Empty,Notes\n'
+            'EQ-1,Pump A,Pump,00123,12.5,1e1,2020-01-01,True,1,2020-01-01 10:00:00,,"quoted, comma"\n'
+            '2,Valve B,Valve,456,NA,7,not a date,false,x,2020-01-01T11:00,,\n'
+            '\n'
+            'EQ-3,Tank,Tank,,,-3.25,2019-12-31,TRUE,,n/a,,"multi\nline"\n'
+            ',No ID,Pump,1,2,3,2020-01-01,False,2.5,,,  spaced  \n'
+            'EQ-5,Short row,Valve\n'
+            'EQ-6,Café,Pump,7,0.1,0.2,2020-02-02,true,None,x,,ünïcode\n'
+        )
+        # Whole numbers, blank in some chunks only
+        integer_path = self.write_csv(
+            'Equipment ID,Equipment Name,Type,Flowrate,Temperature,Rpm\n'
+            'EQ-1,Pump A,Pump,10,20,1500\n'
+            'EQ-2,Valve B,Valve,,30,\n'
+            'EQ-3,Tank C,Tank,12,,1200\n'
+        )
+        
+        for path, chunk_sizes in ((synthetic_path, (64, 1000)), (edge_path, (2, 100)), (integer_path, (1, 100))):
+            chunked_fingerprints = []
+            for chunk_size in chunk_sizes:
+                expected = self.engine_output(path, ENGINE_C, chunk_size)
+                self.assertTrue(expected[0])
+                chunked_fingerprints.append(expected[1])
+                for engine in available_engines():
+                    with self.subTest(path=os.path.basename(path), chunk_size=chunk_size, engine=engine):
+                        self.assertEqual(self.engine_output(path, engine, chunk_size), expected)
+            # Chunking must not change what a row hashes to either
+            self.assertEqual(chunked_fingerprints[0], chunked_fingerprints[1])
+    
+    def test_parser_backend_is_chosen_by_size(self):
+        """Test that file size and installed libraries pick the backend."""
+        limits = (16, 256, 1024)
+        self.assertEqual(select_engine(10, *limits), 'stdlib')
+        self.assertEqual(select_engine(100, *limits), 'c')
+        self.assertEqual(select_engine(500, *limits), 'pyarrow')
+        self.assertEqual(select_engine(2048, *limits), 'mmap')
+        with mock.patch('api.csv_engines.available_engines', return_value=['c', 'mmap', 'stdlib']):
+            self.assertEqual(select_engine(500, *limits), 'c')
+
+
+class SaveEquipmentTestCase(TestCase):
+    """
+    Test cases for bulk saving parsed CSV records.
+    """
+    
+    def setUp(self):
+        """Set up an upload and one existing equipment row."""
+        self.csv_upload = CSVUpload.objects.create(filename='plant.csv')
+        self.existing = Equipment.objects.create(
+            equipment_id='PUMP-001',
+            equipment_name='Old Pump',
+            equipment_type='Pump',
+            flowrate=10.0,
+            status='Inactive'
+        )
+        self.records = [
+            {'equipment_id': 'PUMP-001', 'equipment_name': 'Main Pump', 'equipment_type': 'Pump',
+             'flowrate': 150.5, 'status': 'Active', 'additional_params': {'humidity': 40.0}},
+            {'equipment_id': 'HX-001', 'equipment_name': '', 'equipment_type': 'heat exchanger',
+             'flowrate': float('nan'), 'status': 'Active', 'additional_params': {}},
+            {'equipment_id': '  ', 'equipment_name': 'Blank', 'equipment_type': 'Pump'},
+            {'equipment_id': 'HX-001', 'equipment_name': 'Exchanger', 'equipment_type': 'Heat Exchanger',
+             'flowrate': 80.0, 'status': 'Maintenance', 'additional_params': {}},
+        ]
+    
+    def assert_end_state(self):
+        """Check the rows written from self.records."""
+        pump = Equipment.objects.get(equipment_id='PUMP-001')
+        self.assertEqual(pump.pk, self.existing.pk)
+        self.assertEqual(pump.equipment_name, 'Main Pump')
+        self.assertEqual(pump.status, 'Active')
+        self.assertEqual(pump.additional_params, {'humidity': 40.0})
+        self.assertEqual(pump.csv_upload, self.csv_upload)
+        self.assertGreater(pump.updated_at, self.existing.updated_at)
+        
+        exchanger = Equipment.objects.get(equipment_id='HX-001')
+        self.assertEqual(exchanger.equipment_name, 'Exchanger')
+        self.assertEqual(exchanger.equipment_type, 'Heat Exchanger')
+        self.assertEqual(exchanger.flowrate, 80.0)
+        self.assertEqual(Equipment.objects.count(), 2)
+    
+    def test_upsert_counts_and_end_state(self):
+        """Test created/updated counts including repeated IDs across batches."""
+        counts = save_equipment_from_csv(self.csv_upload, self.records, batch_size=1)
+        
+        self.assertEqual(counts, (1, 2, 0))
+        self.assert_end_state()
+    
+    def test_upsert_without_conflict_support(self):
+        """Test the bulk_create/bulk_update fallback gives the same result."""
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False):
+            counts = save_equipment_from_csv(self.csv_upload, self.records)
+        
+        self.assertEqual(counts, (1, 2, 0))
+        self.assert_end_state()
+    
+    def test_batch_uses_constant_number_of_queries(self):
+        """Test that a batch costs one prefetch and one upsert statement."""
+        records = [
+            {'equipment_id': f'TANK-{i:03d}', 'equipment_name': f'Tank {i}', 'equipment_type': 'Tank'}
+            for i in range(40)
+        ]
+        # SAVEPOINT/RELEASE around the atomic block, prefetch, upsert
+        # (40 rows stay under SQLite's 999 parameter limit per statement)
+        with self.assertNumQueries(4):
+            counts = save_equipment_from_csv(self.csv_upload, records)
+        
+        self.assertEqual(counts, (40, 0, 0))
+    
+    def test_unchanged_rows_are_not_rewritten(self):
+        """Test that a re-sync only rewrites rows whose values changed."""
+        save_equipment_from_csv(self.csv_upload, self.records)
+        before = dict(Equipment.objects.values_list('equipment_id', 'updated_at'))
+        
+        next_upload = CSVUpload.objects.create(filename='plant-v2.csv')
+        records = [
+            {'equipment_id': 'PUMP-001', 'equipment_name': 'Main Pump', 'equipment_type': 'Pump',
+             'flowrate': 150.5, 'status': 'Active', 'additional_params': {'humidity': 40.0}},
+            {'equipment_id': 'HX-001', 'equipment_name': 'Exchanger', 'equipment_type': 'Heat Exchanger',
+             'flowrate': 95.0, 'status': 'Maintenance', 'additional_params': {}},
+            {'equipment_id': 'TANK-001', 'equipment_name': 'Tank', 'equipment_type': 'Tank'},
+        ]
+        counts = save_equipment_from_csv(next_upload, records)
+        
+        self.assertEqual(counts, (1, 1, 1))
+        pump = Equipment.objects.get(equipment_id='PUMP-001')
+        self.assertEqual(pump.updated_at, before['PUMP-001'])
+        self.assertEqual(pump.csv_upload, next_upload)
+        exchanger = Equipment.objects.get(equipment_id='HX-001')
+        self.assertGreater(exchanger.updated_at, before['HX-001'])
+        self.assertEqual(exchanger.flowrate, 95.0)
+    
+    @override_settings(CSV_PARSER_ENGINE=ENGINE_C)
+    def test_unchanged_rows_are_unchanged_whatever_the_chunking(self):
+        """Test that a row's fingerprint does not depend on the blanks of the rows parsed with it."""
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as csv_file:
+            csv_file.write('Equipment ID,Type,Flowrate,Capacity\nE1,Pump,12,100\nE2,Pump,,\nE3,Pump,14,300\n')
+        self.addCleanup(os.remove, path)
+        
+        success, records, error_msg = stream_csv_file(path, chunk_size=1)
+        self.assertTrue(success, error_msg)
+        self.assertEqual(save_equipment_from_csv(self.csv_upload, records), (3, 0, 0))
+        
+        for chunk_size in (2, 3):
+            success, records, error_msg = stream_csv_file(path, chunk_size=chunk_size)
+            self.assertTrue(success, error_msg)
+            self.assertEqual(save_equipment_from_csv(self.csv_upload, records), (0, 0, 3))
+    
+    def test_owner_follows_the_upload(self):
+        """Test that saved rows take their upload's user as owner, also when another user's upload takes them over."""
+        first_user = User.objects.create_user(username='first', password='secret123')
+        second_user = User.objects.create_user(username='second', password='secret123')
+        first_upload = CSVUpload.objects.create(user=first_user, filename='plant.csv')
+        second_upload = CSVUpload.objects.create(user=second_user, filename='plant.csv')
+        save_equipment_from_csv(first_upload, self.records)
+        self.assertEqual(set(Equipment.objects.values_list('owner', flat=True)), {first_user.pk})
+        
+        for supports_conflicts in (True, False):
+            Equipment.objects.update(csv_upload=first_upload, owner=first_user)
+            changed = dict(self.records[3], flowrate=90.0 + supports_conflicts)
+            with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', supports_conflicts):
+                counts = save_equipment_from_csv(second_upload, [self.records[0], changed])
+            
+            self.assertEqual(counts, (0, 1, 1))
+            self.assertEqual(set(Equipment.objects.values_list('owner', flat=True)), {second_user.pk})
+    
+    def test_saving_a_row_takes_the_owner_of_its_new_upload(self):
+        """Test that a single save re-points the owner when the row moves to another user's upload."""
+        first_user = User.objects.create_user(username='first', password='secret123')
+        second_user = User.objects.create_user(username='second', password='secret123')
+        first_upload = CSVUpload.objects.create(user=first_user, filename='plant.csv')
+        second_upload = CSVUpload.objects.create(user=second_user, filename='plant.csv')
+        equipment = Equipment.objects.create(
+            csv_upload=first_upload, equipment_id='TANK-001', equipment_name='Tank', equipment_type='Tank'
+        )
+        self.assertEqual(equipment.owner_id, first_user.pk)
+        
+        equipment.csv_upload = second_upload
+        equipment.save()
+        self.assertEqual(Equipment.objects.get(pk=equipment.pk).owner_id, second_user.pk)
+        
+        equipment.csv_upload_id = first_upload.pk
+        equipment.save(update_fields=['csv_upload'])
+        self.assertEqual(Equipment.objects.get(pk=equipment.pk).owner_id, first_user.pk)
+    
+    def test_migration_backfills_owner(self):
+        """Test that the owner migration copies every upload's user onto its equipment."""
+        user = User.objects.create_user(username='operator', password='secret123')
+        csv_upload = CSVUpload.objects.create(user=user, filename='plant.csv')
+        save_equipment_from_csv(csv_upload, self.records)
+        Equipment.objects.create(equipment_id='TANK-001', equipment_name='Loose Tank', equipment_type='Tank')
+        Equipment.objects.update(owner=None)
+        migration = importlib.import_module('api.migrations.0014_equipment_owner')
+        
+        with self.assertNumQueries(1):
+            migration.copy_upload_users(django_apps, None)
+        
+        self.assertEqual(Equipment.objects.filter(owner=user).count(), 2)
+        self.assertIsNone(Equipment.objects.get(equipment_id='TANK-001').owner_id)
+    
+    def test_manual_edit_is_rewritten_by_next_sync(self):
+        """Test that a row edited through the API no longer counts as unchanged."""
+        save_equipment_from_csv(self.csv_upload, self.records)
+        Equipment.objects.filter(equipment_id='PUMP-001').update(status='Inactive', fingerprint='')
+        
+        counts = save_equipment_from_csv(self.csv_upload, self.records[:1])
+        
+        self.assertEqual(counts, (0, 1, 0))
+        self.assertEqual(Equipment.objects.get(equipment_id='PUMP-001').status, 'Active')
+    
+    def test_refused_row_does_not_fail_batch(self):
+        """Test that a row the database refuses is rejected alone."""
+        records = [
+            {'equipment_id': f'TANK-{i}', 'equipment_name': f'Tank {i}', 'equipment_type': 'Tank',
+             'installation_date': 'never' if i == 2 else None, 'row_number': i + 2}
+            for i in range(5)
+        ]
+        row_errors = RowErrorLog()
+        counts = save_equipment_from_csv(self.csv_upload, records, row_errors=row_errors)
+        
+        self.assertEqual(counts, (4, 0, 0))
+        self.assertFalse(Equipment.objects.filter(equipment_id='TANK-2').exists())
+        self.assertEqual(row_errors.rejected_rows, 1)
+        self.assertEqual(row_errors.errors[0].row, 4)
+        self.assertEqual(row_errors.errors[0].value, 'TANK-2')
+        
+        with self.assertRaises(ValidationError):
+            save_equipment_from_csv(self.csv_upload, records)
+    
+    def summary_fields(self, summary):
+        """Return the statistics of a DataSummary as a dict."""
+        return {
+            field: getattr(summary, field) for field in (
+                'total_equipment', 'active_equipment', 'inactive_equipment',
+                'maintenance_equipment', 'type_distribution', 'avg_flowrate',
+                'max_flowrate', 'min_flowrate', 'avg_pressure', 'avg_temperature'
+            )
+        }
+    
+    def test_summary_matches_database_aggregates(self):
+        """Test that a stored summary equals the database aggregates, in two queries."""
+        # Values whose sum depends on the order they are added in
+        records = [
+            {'equipment_id': f'EQ-{i:03d}', 'equipment_name': f'Unit {i}',
+             'equipment_type': ['Pump', 'Valve', 'Tank'][i % 3],
+             'status': ['Active', 'Inactive', 'Maintenance', 'Active'][i % 4],
+             'flowrate': None if i % 5 == 0 else i * 0.1 + 1 / 3,
+             'pressure': 1e16 if i == 7 else i * 0.7, 'temperature': None}
+            for i in range(30)
+        ]
+        save_equipment_from_csv(self.csv_upload, records, batch_size=7)
+        
+        with CaptureQueriesContext(connection) as queries:
+            summary = self.summary_fields(calculate_summary_statistics(self.csv_upload))
+        
+        # The aggregate and the type GROUP BY
+        equipment_queries = [query for query in queries.captured_queries if 'api_equipment' in query['sql']]
+        self.assertEqual(len(equipment_queries), 2)
+        
+        aggregates = aggregate_equipment_metrics(Equipment.objects.filter(csv_upload=self.csv_upload))
+        for name in ('avg_flowrate', 'max_flowrate', 'min_flowrate', 'avg_pressure', 'avg_temperature'):
+            self.assertEqual(summary[name], aggregates[name])
+        self.assertEqual(summary['total_equipment'], 30)
+        self.assertEqual(summary['type_distribution'], {'Pump': 10, 'Valve': 10, 'Tank': 10})
+        self.assertIsNone(summary['avg_temperature'])
+    
+    def test_summary_counts_rows_replaced_by_later_batches_once(self):
+        """Test that a row repeated in a later batch is summarised with its final values."""
+        save_equipment_from_csv(self.csv_upload, self.records, batch_size=1)
+        
+        summary = calculate_summary_statistics(self.csv_upload)
+        
+        self.assertEqual(summary.total_equipment, 2)
+        self.assertEqual(summary.active_equipment, 1)
+        self.assertEqual(summary.maintenance_equipment, 1)
+        self.assertEqual(summary.type_distribution, {'Pump': 1, 'Heat Exchanger': 1})
+        self.assertEqual(summary.max_flowrate, 150.5)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class CSVUploadAPITestCase(APITestCase):
+    """
+    Test cases for the CSV upload endpoint.
+    """
+    
+    def setUp(self):
+        """Set up an authenticated client."""
+        self.user = User.objects.create_user(username='operator', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('api:csv-upload-list')
+    
+    def upload(self, content, name='plant.csv', **extra):
+        """POST CSV content to the upload endpoint."""
+        csv_file = SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+        return self.client.post(self.url, {'file': csv_file, **extra}, format='multipart')
+    
+    def test_upload_csv(self):
+        """Test uploading and processing a CSV file."""
+        response = self.upload(
+            'Equipment Name,Type,Flowrate,Status\n'
+            'Pump-1,Pump,120,Active\n'
+            'Valve-1,Valve,60,Inactive\n'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(response.data['total_records'], 2)
+        self.assertEqual(response.data['summary']['active_equipment'], 1)
+        self.assertEqual(Equipment.objects.filter(csv_upload__user=self.user).count(), 2)
+    
+    def test_upload_reports_stage_metrics(self):
+        """Test that per-stage timings, row counts and throughput are returned and stored."""
+        response = self.upload(
+            'Equipment Name,Type,Flowrate\n'
+            'Pump-1,Pump,120\n'
+            'Valve-1,Valve,not a number\n'
+            'Tank-1,Tank,80\n'
+        )
+        
+        metrics = response.data['metrics']
+        self.assertEqual(
+            list(metrics['stages']), ['store', 'read', 'map', 'convert', 'upsert', 'summary']
+        )
+        self.assertEqual(metrics['stages']['read']['rows'], 3)
+        self.assertEqual(metrics['stages']['convert']['rows'], 2)
+        self.assertEqual(metrics['stages']['upsert']['rows'], 2)
+        self.assertGreater(metrics['rows_per_sec'], 0)
+        self.assertGreater(metrics['peak_rss_bytes'], 0)
+        
+        csv_upload = CSVUpload.objects.get(id=response.data['csv_upload_id'])
+        self.assertEqual(csv_upload.stage_timings, metrics['stages'])
+        self.assertEqual(csv_upload.rows_per_sec, metrics['rows_per_sec'])
+    
+    @override_settings(CSV_CHUNK_SIZE=2)
+    def test_malformed_later_chunk_rolls_back(self):
+        """Test that a parse error in a later chunk leaves nothing behind."""
+        response = self.upload(
+            'Equipment Name,Type,Flowrate\n'
+            'Pump-1,Pump,120\n'
+            'Pump-2,Pump,130\n'
+            'Pump-3,Pump,140\n'
+            'Pump-4,Pump,150,extra,fields\n'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Error parsing CSV file', response.data['error'])
+        self.assertFalse(Equipment.objects.exists())
+        self.assertFalse(CSVUpload.objects.exists())
+    
+    @override_settings(CSV_CHUNK_SIZE=500)
+    def test_error_after_committed_batch_fails_upload_keeping_saved_rows(self):
+        """Test that rows committed before a later error are kept by a failed upload and finished by re-uploading."""
+        rows = ''.join(f'Pump-{i},Pump,{i}\n' for i in range(1000))
+        response = self.upload(
+            'Equipment Name,Type,Flowrate\n' + rows + 'Pump-x,Pump,1\nPump-y,Pump,2,extra,fields\n'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Error parsing CSV file', response.data['error'])
+        self.assertEqual(response.data['rows_processed'], 1000)
+        csv_upload = CSVUpload.objects.get(id=response.data['csv_upload_id'])
+        self.assertEqual(csv_upload.status, CSVUpload.STATUS_FAILED)
+        self.assertEqual(csv_upload.rows_processed, 1000)
+        self.assertIn('1,000 rows saved before the error were kept', csv_upload.error_message)
+        self.assertEqual(Equipment.objects.filter(csv_upload=csv_upload).count(), 1000)
+        
+        response = self.upload('Equipment Name,Type,Flowrate\n' + rows + 'Pump-x,Pump,1\nPump-y,Pump,2\n')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(response.data['unchanged_count'], 1000)
+    
+    def test_invalid_rows_are_rejected_and_reported(self):
+        """Test that valid rows are saved and rejected rows are downloadable as CSV."""
+        response = self.upload(
+            'Equipment Name,Type,Flowrate\n'
+            'Pump-1,Pump,120\n'
+            'Pump-2,Pump,lots\n'
+            'Pump-3,Pump,140\n'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 2)
+        self.assertEqual(response.data['rejected_count'], 1)
+        self.assertEqual(response.data['row_errors'], [
+            {'row': 3, 'column': 'flowrate', 'value': 'lots', 'message': 'Not a number'}
+        ])
+        self.assertFalse(Equipment.objects.filter(equipment_id='Pump-2').exists())
+        
+        report = self.client.get(response.data['error_report_url'])
+        self.assertEqual(report.status_code, status.HTTP_200_OK)
+        self.assertEqual(report['Content-Type'], 'text/csv')
+        self.assertEqual(
+            report.content.decode().splitlines(),
+            ['row,column,value,message', '3,flowrate,lots,Not a number']
+        )
+        
+        other = User.objects.create_user(username='other', password='secret123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(response.data['error_report_url']).status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_upload_without_valid_rows_fails(self):
+        """Test that an upload whose rows are all rejected fails with the errors."""
+        response = self.upload('Equipment Name,Type,Flowrate\nPump-1,Pump,lots\n')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('No valid rows', response.data['error'])
+        self.assertEqual(response.data['rejected_count'], 1)
+        self.assertFalse(CSVUpload.objects.exists())
+    
+    def batch_upload(self, members, **extra):
+        """POST a ZIP archive of CSV files to the batch endpoint."""
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for name, content in members.items():
+                archive.writestr(name, content)
+        archive_file = SimpleUploadedFile('site.zip', buffer.getvalue(), content_type='application/zip')
+        return self.client.post(
+            reverse('api:csv-upload-batch'), {'file': archive_file, **extra}, format='multipart'
+        )
+    
+    @override_settings(CSV_PARSE_WORKERS=2)
+    def test_batch_archive_is_ingested_into_one_upload(self):
+        """Test that the CSV files of an archive are saved together and reported per file."""
+        response = self.batch_upload({
+            'units/pump.csv': 'Equipment Name,Type,Flowrate\nPump-1,Pump,120\nPump-2,Pump,fast\n',
+            'units/valve.csv': 'Equipment Name,Type,Status\nValve-1,Valve,Active\nValve-2,Valve,Maintenance\n',
+            'units/notes.csv': 'Remarks\nchecked\n',
+            'readme.txt': 'not a CSV file',
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 3)
+        self.assertEqual(response.data['rejected_count'], 1)
+        members = {member['file']: member for member in response.data['members']}
+        self.assertEqual(list(members), ['units/pump.csv', 'units/valve.csv', 'units/notes.csv'])
+        self.assertEqual(members['units/pump.csv']['created_count'], 1)
+        self.assertEqual(members['units/pump.csv']['rejected_count'], 1)
+        self.assertEqual(members['units/valve.csv']['created_count'], 2)
+        self.assertEqual(members['units/notes.csv']['status'], CSVUpload.STATUS_FAILED)
+        self.assertIn('Missing required column', members['units/notes.csv']['error'])
+        self.assertEqual(response.data['row_errors'][0]['file'], 'units/pump.csv')
+        self.assertEqual(response.data['summary']['total_equipment'], 3)
+        self.assertEqual(response.data['summary']['maintenance_equipment'], 1)
+        
+        csv_upload = CSVUpload.objects.get()
+        self.assertTrue(csv_upload.archive_batch)
+        self.assertEqual(csv_upload.equipment.count(), 3)
+        self.assertEqual(DataSummary.objects.count(), 1)
+        
+        report = self.client.get(response.data['error_report_url'])
+        self.assertEqual(
+            report.content.decode().splitlines(),
+            ['file,row,column,value,message', 'units/pump.csv,3,flowrate,fast,Not a number']
+        )
+    
+    def test_batch_without_csv_files_fails(self):
+        """Test that archives without any usable CSV file are rejected."""
+        response = self.batch_upload({'readme.txt': 'nothing here'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('no CSV files', response.data['error'])
+        
+        response = self.batch_upload({'notes.csv': 'Remarks\nchecked\n'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['members'][0]['status'], CSVUpload.STATUS_FAILED)
+        self.assertFalse(CSVUpload.objects.exists())
+    
+    def test_unexpected_ingestion_error_fails_upload(self):
+        """Test that an exception during ingestion marks the upload failed instead of leaving it processing."""
+        version = get_data_version(self.user.pk)
+        with mock.patch('api.utils.save_equipment_from_csv', side_effect=RuntimeError('disk full')):
+            response = self.upload('Equipment Name,Type\nPump-1,Pump\n')
+        
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn('disk full', response.data['error'])
+        csv_upload = CSVUpload.objects.get(id=response.data['csv_upload_id'])
+        self.assertEqual(csv_upload.status, CSVUpload.STATUS_FAILED)
+        self.assertIn('disk full', csv_upload.error_message)
+        self.assertGreater(get_data_version(self.user.pk), version)
+    
+    def test_locked_database_fails_upload_instead_of_rejecting_rows(self):
+        """Test that a database lock error fails the upload rather than rejecting its rows."""
+        with mock.patch('api.utils._upsert_equipment_batch', side_effect=OperationalError('database is locked')):
+            response = self.upload('Equipment Name,Type\nPump-1,Pump\nValve-1,Valve\n')
+        
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertIn('database is locked', response.data['error'])
+        csv_upload = CSVUpload.objects.get(id=response.data['csv_upload_id'])
+        self.assertEqual(csv_upload.status, CSVUpload.STATUS_FAILED)
+        self.assertEqual(csv_upload.rejected_records, 0)
+        self.assertFalse(Equipment.objects.exists())
+        
+        with mock.patch('api.views.submit_ingestion'):
+            response = self.upload('Equipment Name,Type\nPump-2,Pump\n', **{'async': 'true'})
+        with mock.patch('api.utils._upsert_equipment_batch', side_effect=OperationalError('database is locked')):
+            run_ingestion_job(response.data['job_id'])
+        
+        csv_upload = CSVUpload.objects.get(id=response.data['job_id'])
+        self.assertEqual(csv_upload.status, CSVUpload.STATUS_FAILED)
+        self.assertIn('database is locked', csv_upload.error_message)
+        self.assertEqual(csv_upload.rejected_records, 0)
+    
+    def test_async_upload_returns_job(self):
+        """Test that async uploads return 202 and report job state."""
+        with mock.patch('api.views.submit_ingestion') as submit:
+            response = self.upload('Equipment Name,Type\nPump-1,Pump\n', **{'async': 'true'})
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['job_id']
+        submit.assert_called_once()
+        
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], CSVUpload.STATUS_PENDING)
+        self.assertFalse(Equipment.objects.exists())
+        
+        run_ingestion_job(job_id)
+        
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(status_response.data['status'], CSVUpload.STATUS_COMPLETED)
+        self.assertEqual(status_response.data['rows_processed'], 1)
+        self.assertEqual(status_response.data['error'], '')
+        self.assertTrue(CSVUpload.objects.get(id=job_id).processed)
+    
+    def test_failed_job_reports_error(self):
+        """Test that a failed background job keeps its error message."""
+        with mock.patch('api.views.submit_ingestion'):
+            response = self.upload('Equipment Name,Type,Flowrate\nPump-1,Pump,lots\n', **{'async': 'true'})
+        run_ingestion_job(response.data['job_id'])
+        
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], CSVUpload.STATUS_FAILED)
+        self.assertIn('No valid rows', status_response.data['error'])
+    
+    def test_job_status_of_other_user_is_hidden(self):
+        """Test that users cannot see each other's jobs."""
+        other = User.objects.create_user(username='other', password='secret123')
+        csv_upload = CSVUpload.objects.create(user=other, filename='other.csv')
+        url = reverse('api:csv-upload-job-status', kwargs={'job_id': csv_upload.id})
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_upload_gzipped_csv(self):
+        """Test that a gzip-compressed CSV is accepted and ingested."""
+        content = gzip.compress(b'Equipment Name,Type\nPump-1,Pump\nValve-1,Valve\n')
+        csv_file = SimpleUploadedFile('plant.csv.gz', content, content_type='application/gzip')
+        response = self.client.post(self.url, {'file': csv_file}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 2)
+    
+    def test_upload_parquet(self):
+        """Test that Parquet files are accepted and ingested."""
+        buffer = BytesIO()
+        pd.DataFrame({'Equipment Name': ['Pump-1', 'Valve-1'], 'Type': ['Pump', 'Valve']}).to_parquet(buffer)
+        upload = SimpleUploadedFile('plant.parquet', buffer.getvalue(), content_type='application/octet-stream')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 2)
+    
+    def workbook_upload(self, **extra):
+        """POST a workbook with two valid sheets and one without equipment data."""
+        workbook = Workbook()
+        workbook.active.title = 'Pumps'
+        workbook.active.append(['Equipment ID', 'Type', 'Status'])
+        workbook.active.append(['PUMP-001', 'Pump', 'Active'])
+        workbook.active.append(['PUMP-002', 'Pump', 'Inactive'])
+        valves = workbook.create_sheet('Valves')
+        valves.append(['Equipment ID', 'Type'])
+        valves.append(['VALVE-001', 'Valve'])
+        workbook.create_sheet('Notes').append(['Exported from the historian'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile('plant.xlsx', buffer.getvalue(), content_type='application/octet-stream')
+        return self.client.post(self.url, {'file': upload, **extra}, format='multipart')
+    
+    def test_upload_workbook_ingests_each_sheet(self):
+        """Test that every sheet of a workbook becomes its own upload."""
+        def run_inline(csv_upload):
+            future = Future()
+            future.set_result(run_ingestion_job(csv_upload.id))
+            return future
+        
+        with mock.patch('api.views.submit_ingestion', side_effect=run_inline) as submit:
+            response = self.workbook_upload()
+        
+        self.assertEqual(submit.call_count, 3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 3)
+        sheets = {sheet['sheet_name']: sheet for sheet in response.data['sheets']}
+        self.assertEqual(sheets['Pumps']['total_records'], 2)
+        self.assertEqual(sheets['Valves']['summary']['total_equipment'], 1)
+        self.assertEqual(sheets['Notes']['status'], CSVUpload.STATUS_FAILED)
+        
+        uploads = CSVUpload.objects.filter(user=self.user)
+        self.assertEqual(sorted(uploads.values_list('sheet_name', flat=True)), ['Pumps', 'Valves'])
+        self.assertEqual(len({upload.file.name for upload in uploads}), 1)
+        self.assertEqual(len({upload.batch_id for upload in uploads}), 1)
+        
+        # Sheets of one workbook are pruned as a single upload
+        prune_old_uploads(self.user, keep=1)
+        self.assertEqual(CSVUpload.objects.filter(user=self.user).count(), 2)
+    
+    def test_async_workbook_upload_returns_job_per_sheet(self):
+        """Test that async workbook uploads return one job per sheet."""
+        with mock.patch('api.views.submit_ingestion') as submit:
+            response = self.workbook_upload(**{'async': 'true'})
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual([job['sheet_name'] for job in response.data['jobs']], ['Pumps', 'Valves', 'Notes'])
+        self.assertEqual(submit.call_count, 3)
+    
+    def test_ingestions_take_turns_on_sqlite(self):
+        """Test that ingestion jobs hold the single-writer lock, so SQLite writers never overlap."""
+        csv_upload = CSVUpload.objects.create(user=self.user, filename='plant.csv')
+        held = []
+        
+        def ingest(*args, **kwargs):
+            held.append(jobs._single_writer_lock.locked())
+            return True, {}, ''
+        
+        with mock.patch('api.jobs.ingest_csv_upload', side_effect=ingest):
+            run_ingestion_job(csv_upload.id)
+        self.assertEqual(held, [connection.vendor == 'sqlite'])
+        
+        events = []
+        
+        def write(number):
+            with jobs.database_writes():
+                events.append('start')
+                time.sleep(0.01)
+                events.append('end')
+        
+        threads = [threading.Thread(target=write, args=(number,)) for number in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if connection.vendor == 'sqlite':
+            self.assertEqual(events, ['start', 'end'] * 3)
+    
+    def test_missing_header_column_is_rejected_while_receiving(self):
+        """Test that a CSV header without required columns stops the upload before the rest is read or stored."""
+        content = 'Equipment Name,Flowrate\n' + 'Pump-1,120\n' * 50000
+        payloads = []
+        
+        def read_body(payload, *args):
+            payloads.append(payload)
+            return original_read(payload, *args)
+        
+        original_read = FakePayload.read
+        original = TemporaryFileUploadHandler.receive_data_chunk
+        with mock.patch.object(TemporaryFileUploadHandler, 'receive_data_chunk',
+                               autospec=True, side_effect=original) as write, \
+                mock.patch.object(FakePayload, 'read', autospec=True, side_effect=read_body):
+            response = self.upload(content)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Missing required column: Equipment Type', response.data['error'])
+        write.assert_not_called()
+        # The rest of the body is left unread
+        self.assertGreater(len(payloads[0]), len(content) * 3 // 4)
+        self.assertFalse(CSVUpload.objects.exists())
+        self.assertEqual(list(incoming_dir().iterdir()), [])
+    
+    def test_upload_is_counted_and_moved_into_place(self):
+        """Test that rows are counted while receiving and the received file is moved, not copied."""
+        content = (
+            'Equipment Name,Type,Notes\n'
+            'Pump-1,Pump,"Seal replaced\nneeds check"\n'
+            'Valve-1,Valve,""\n'
+            'Tank-1,Tank,"said ""ok"""'
+        )
+        
+        with mock.patch('django.core.files.storage.filesystem.file_move_safe', wraps=file_move_safe) as move:
+            response = self.upload(content)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        upload = CSVUpload.objects.get()
+        move.assert_called_once_with(mock.ANY, upload.file.path)
+        self.assertEqual(os.path.dirname(move.call_args[0][0]), str(incoming_dir()))
+        self.assertEqual(upload.file_rows, 3)
+        self.assertEqual(upload.total_records, 3)
+        self.assertEqual(list(incoming_dir().iterdir()), [])
+        
+        # Counting does not depend on where the pieces are split
+        counter = RecordCounter()
+        for position in range(len(content)):
+            counter.feed(content[position].encode())
+        self.assertEqual(counter.records(), 4)
+    
+    def preview(self, content, name='plant.csv', **extra):
+        """POST file content to the preview endpoint."""
+        preview_file = SimpleUploadedFile(name, content, content_type='text/csv')
+        return self.client.post(
+            reverse('api:csv-upload-preview'), {'file': preview_file, **extra}, format='multipart'
+        )
+    
+    @override_settings(CSV_PREVIEW_MAX_SIZE=4096)
+    def test_preview_reads_only_the_head(self):
+        """Test that a preview maps the columns from the first rows of a large file without storing anything."""
+        content = 'Equipment Name,Type,Serial,Flow,Param 01,Vendor Code\n' + ''.join(
+            f'Pump-{row},Pump,00{row},{row}.5,{row % 7},V{row}\n' for row in range(100000)
+        )
+        
+        with self.assertNumQueries(0):
+            response = self.preview(content.encode(), nrows=3)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['column_mapping'], {
+            'Equipment Name': 'equipment_name', 'Type': 'equipment_type',
+            'Serial': 'serial_number', 'Flow': 'flowrate',
+        })
+        self.assertEqual(response.data['additional_params'], {'Param 01': 'param_01', 'Vendor Code': 'vendor_code'})
+        self.assertEqual(response.data['dtypes']['Serial'], 'object')
+        self.assertEqual(response.data['dtypes']['Flow'], 'float64')
+        self.assertEqual(response.data['samples']['Serial'], ['000', '001', '002'])
+        self.assertEqual(response.data['rows'], 3)
+        self.assertEqual(response.data['error'], '')
+        self.assertFalse(CSVUpload.objects.exists())
+    
+    @override_settings(CSV_PREVIEW_MAX_SIZE=4096)
+    def test_preview_of_compressed_head_reports_missing_columns(self):
+        """Test that a compressed file is previewed from its first bytes and missing columns are reported."""
+        content = 'Name,Flow\n' + ''.join(f'Pump-{row},{row}\n' for row in range(200000))
+        compressed = gzip.compress(content.encode())
+        self.assertGreater(len(compressed), 4096)
+        
+        response = self.preview(compressed, name='plant.csv.gz')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['rows'], 20)
+        self.assertIn('Missing required column: Equipment Type', response.data['error'])
+        
+        archive = self.preview(b'PK', name='plant.zip')
+        self.assertEqual(archive.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.preview(b'Name,Type\n', nrows=0).status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_upload_rejects_unknown_extension(self):
+        """Test that non-CSV uploads are rejected before they are stored."""
+        response = self.upload('Equipment Name,Type\nPump-1,Pump\n', name='plant.txt')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CSVUpload.objects.exists())
+    
+    def test_identical_reupload_returns_existing_result(self):
+        """Test that re-uploading the latest file skips ingestion."""
+        content = 'Equipment Name,Type,Status\nPump-1,Pump,Active\nValve-1,Valve,Active\n'
+        first = self.upload(content)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        
+        with mock.patch('api.views.ingest_csv_upload') as ingest:
+            second = self.upload(content, name='copy.csv')
+        
+        ingest.assert_not_called()
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertTrue(second.data['duplicate'])
+        self.assertEqual(second.data['csv_upload_id'], first.data['csv_upload_id'])
+        self.assertEqual(second.data['summary'], first.data['summary'])
+        self.assertEqual(CSVUpload.objects.count(), 1)
+        
+        upload = CSVUpload.objects.get()
+        self.assertEqual(upload.content_hash, hashlib.sha256(content.encode()).hexdigest())
+    
+    def test_identical_file_is_reingested_after_another_upload(self):
+        """Test that only the latest upload short-circuits a re-upload."""
+        content = 'Equipment Name,Type\nPump-1,Pump\n'
+        self.upload(content)
+        self.upload('Equipment Name,Type\nPump-1,Valve\n', name='other.csv')
+        
+        response = self.upload(content)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Equipment.objects.get().equipment_type, 'Pump')
+        
+        # Both uploads of the same content share one stored file
+        first, latest = CSVUpload.objects.filter(filename='plant.csv').order_by('uploaded_at')
+        self.assertEqual(first.file.name, latest.file.name)
+    
+    def test_users_share_blob_and_prune_keeps_it(self):
+        """Test that identical files from different users are stored once."""
+        content = 'Equipment Name,Type\nPump-1,Pump\n'
+        self.upload(content)
+        
+        other = User.objects.create_user(username='other', password='secret123')
+        self.client.force_authenticate(user=other)
+        response = self.upload(content, name='theirs.csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        mine = CSVUpload.objects.get(user=self.user)
+        theirs = CSVUpload.objects.get(user=other)
+        self.assertEqual(mine.file.name, theirs.file.name)
+        
+        # Pruning one user's upload must not remove the other's file
+        prune_old_uploads(self.user, keep=0)
+        self.assertTrue(theirs.file.storage.exists(theirs.file.name))
+        prune_old_uploads(other, keep=0)
+        self.assertFalse(theirs.file.storage.exists(theirs.file.name))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RetentionTestCase(TestCase):
+    """
+    Test cases for pruning old uploads.
+    """
+    
+    def setUp(self):
+        """Set up a user whose data version exists, as it does after their first ingested upload."""
+        self.user = User.objects.create_user(username='operator', password='secret123')
+        bump_data_version(self.user.pk)
+    
+    def make_upload(self, index, upload_status=CSVUpload.STATUS_COMPLETED):
+        """Store an upload with two equipment rows and a summary."""
+        content = f'Equipment Name,Type\nPump-{index},Pump\n'.encode()
+        csv_upload = store_upload(
+            self.user, SimpleUploadedFile('plant.csv', content), 'plant.csv',
+            hashlib.sha256(content).hexdigest()
+        )
+        csv_upload.status = upload_status
+        csv_upload.save(update_fields=['status'])
+        for suffix in ('A', 'B'):
+            Equipment.objects.create(
+                csv_upload=csv_upload, equipment_id=f'PUMP-{index}-{suffix}',
+                equipment_name='Pump', equipment_type='Pump'
+            )
+        DataSummary.objects.create(csv_upload=csv_upload, total_equipment=2)
+        return csv_upload
+    
+    def test_prune_cost_does_not_grow_with_uploads(self):
+        """Test that pruning deletes rows and files with set-based queries."""
+        def prune_queries(stale_count):
+            uploads = [self.make_upload(f'{stale_count}-{i}') for i in range(stale_count + 1)]
+            with CaptureQueriesContext(connection) as queries:
+                prune_old_uploads(self.user, keep=1)
+            self.assertEqual(list(CSVUpload.objects.filter(user=self.user)), [uploads[-1]])
+            for csv_upload in uploads[:-1]:
+                self.assertFalse(csv_upload.file.storage.exists(csv_upload.file.name))
+            return len(queries)
+        
+        self.assertEqual(prune_queries(2), prune_queries(6))
+        self.assertEqual(Equipment.objects.count(), 2)
+        self.assertEqual(DataSummary.objects.count(), 1)
+    
+    def test_uploads_being_ingested_are_kept(self):
+        """Test that pruning never deletes an upload a job is still working on."""
+        busy = self.make_upload(0, CSVUpload.STATUS_PROCESSING)
+        self.make_upload(1)
+        self.make_upload(2)
+        
+        prune_old_uploads(self.user, keep=1)
+        
+        self.assertEqual(CSVUpload.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(CSVUpload.objects.filter(pk=busy.pk).exists())
+    
+    def test_abandoned_uploads_are_failed_and_pruned(self):
+        """Test that an upload stuck in processing past the staleness cutoff no longer blocks retention."""
+        abandoned = self.make_upload(0, CSVUpload.STATUS_PROCESSING)
+        CSVUpload.objects.filter(pk=abandoned.pk).update(uploaded_at=timezone.now() - timedelta(days=1))
+        self.make_upload(1)
+        self.make_upload(2)
+        version = get_data_version(self.user.pk)
+        
+        with override_settings(INGESTION_STALE_AFTER=3600):
+            # Still among the latest, it is only marked failed
+            prune_old_uploads(self.user, keep=5)
+            abandoned.refresh_from_db()
+            self.assertEqual(abandoned.status, CSVUpload.STATUS_FAILED)
+            self.assertIn('abandoned', abandoned.error_message)
+            self.assertGreater(get_data_version(self.user.pk), version)
+            
+            prune_old_uploads(self.user, keep=1)
+        
+        self.assertFalse(CSVUpload.objects.filter(pk=abandoned.pk).exists())
+        self.assertEqual(CSVUpload.objects.filter(user=self.user).count(), 1)
+    
+    def test_long_ingestion_with_recent_heartbeat_is_not_abandoned(self):
+        """Test that staleness is measured from the last progress, not from the upload time."""
+        running = self.make_upload(0, CSVUpload.STATUS_PROCESSING)
+        CSVUpload.objects.filter(pk=running.pk).update(
+            uploaded_at=timezone.now() - timedelta(days=1), heartbeat_at=timezone.now()
+        )
+        
+        with override_settings(INGESTION_STALE_AFTER=3600):
+            prune_old_uploads(self.user)
+        
+        running.refresh_from_db()
+        self.assertEqual(running.status, CSVUpload.STATUS_PROCESSING)
+    
+    def test_ingestion_stops_when_marked_abandoned(self):
+        """Test that an ingestion failed by pruning rolls back its current batch and stops."""
+        content = ('Equipment Name,Type\n' + ''.join(f'Pump-{i},Pump\n' for i in range(1001))).encode()
+        csv_upload = store_upload(
+            self.user, SimpleUploadedFile('plant.csv', content), 'plant.csv', hashlib.sha256(content).hexdigest()
+        )
+        
+        def stall_and_prune(rows):
+            # As if the worker had stalled for a day after the first batch
+            CSVUpload.objects.filter(pk=csv_upload.pk).update(heartbeat_at=timezone.now() - timedelta(days=1))
+            prune_old_uploads(self.user)
+        
+        with override_settings(INGESTION_STALE_AFTER=3600):
+            success, _, error_msg = ingest_csv_upload(csv_upload, progress_callback=stall_and_prune)
+        
+        self.assertFalse(success)
+        self.assertIn('marked failed', error_msg)
+        csv_upload.refresh_from_db()
+        self.assertEqual(csv_upload.status, CSVUpload.STATUS_FAILED)
+        self.assertIn('abandoned', csv_upload.error_message)
+        self.assertEqual(csv_upload.rows_processed, 1000)
+        self.assertEqual(Equipment.objects.filter(csv_upload=csv_upload).count(), 1000)
+    
+    def test_pruning_runs_coalesce(self):
+        """Test that uploads finishing together queue a single retention run."""
+        self.addCleanup(jobs._pending_prunes.discard, self.user.pk)
+        
+        with mock.patch('api.jobs.get_retention_executor') as get_executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_pruning(self.user)
+                schedule_pruning(self.user)
+        
+        get_executor.return_value.submit.assert_called_once_with(jobs._run_pruning, self.user.pk)
+    
+    def test_pruning_time_is_recorded_on_upload(self):
+        """Test that a retention run adds its time to the upload that queued it."""
+        csv_upload = self.make_upload(0)
+        csv_upload.stage_timings = {'upsert': {'seconds': 0.5, 'rows': 2}}
+        csv_upload.save(update_fields=['stage_timings'])
+        
+        with mock.patch('api.jobs.connections'):
+            jobs._run_pruning(self.user.pk, csv_upload.pk)
+        
+        csv_upload.refresh_from_db()
+        self.assertEqual(list(csv_upload.stage_timings), ['upsert', 'prune'])
+        self.assertGreaterEqual(csv_upload.stage_timings['prune']['seconds'], 0)
+
+
+class BenchmarkTestCase(TestCase):
+    """
+    Test cases for ingestion metrics, the synthetic data generator and the ingestion benchmark.
+    """
+    
+    def test_nested_stages_are_timed_exclusively(self):
+        """Test that time spent in a nested stage is not charged to the enclosing one."""
+        clock = iter([0.0, 1.0, 3.0, 7.0, 8.0])
+        with mock.patch('api.metrics.time.perf_counter', side_effect=lambda: next(clock)), \
+                mock.patch('api.metrics.current_rss_bytes', return_value=1024):
+            metrics = IngestionMetrics()
+            with metrics.stage('upsert'):
+                with metrics.stage('read'):
+                    pass
+        
+        self.assertEqual(metrics.seconds, {'upsert': 3.0, 'read': 4.0})
+        self.assertEqual(metrics.peak_rss, 1024)
+    
+    def test_metrics_without_resource_module(self):
+        """Test that metrics import and run where the resource module is missing, as on Windows."""
+        from . import metrics as metrics_module
+        self.addCleanup(importlib.reload, metrics_module)
+        with mock.patch.dict(sys.modules, {'resource': None}):
+            importlib.reload(metrics_module)
+        
+        self.assertIsNone(metrics_module.resource)
+        with mock.patch.object(metrics_module, 'STATM_PATH', '/nonexistent/statm'), \
+                mock.patch.object(metrics_module, 'STATUS_PATH', '/nonexistent/status'):
+            self.assertIsNone(metrics_module.current_rss_bytes())
+            self.assertIsNone(metrics_module.peak_rss_bytes())
+            metrics = metrics_module.IngestionMetrics()
+            with metrics.stage('read'):
+                pass
+        
+        self.assertEqual(metrics.peak_rss, 0)
+        self.assertIn('read', metrics.stage_timings())
+    
+    def test_generated_file_is_reproducible_and_ingestible(self):
+        """Test that the generator is deterministic and its rows parse."""
+        tmp_dir = tempfile.mkdtemp()
+        first = os.path.join(tmp_dir, 'first.csv')
+        second = os.path.join(tmp_dir, 'second.csv')
+        write_equipment_csv(first, 300, dynamic_columns=4, null_rate=0.2, seed=7)
+        write_equipment_csv(second, 300, dynamic_columns=4, null_rate=0.2, seed=7)
+        with open(first, 'rb') as a, open(second, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+        
+        df = pd.read_csv(first)
+        self.assertEqual(len(df), 300)
+        self.assertEqual(list(df.columns[-4:]), ['Param 01', 'Param 02', 'Param 03', 'Param 04'])
+        self.assertFalse(df[REQUIRED_COLUMNS].isna().any().any())
+        self.assertTrue(df['Flowrate'].isna().any())
+        
+        success, data_list, _ = parse_csv_file(first)
+        self.assertTrue(success)
+        self.assertEqual(len(data_list), 300)
+    
+    def test_benchmark_reports_stages_and_rolls_back(self):
+        """Test that the benchmark prints per-stage JSON results and leaves no rows behind."""
+        stdout = StringIO()
+        output_path = os.path.join(tempfile.mkdtemp(), 'results.json')
+        call_command('benchmark_ingestion', rows=[200, 50], output=output_path, stdout=stdout)
+        results = json.loads(stdout.getvalue())
+        with open(output_path) as output_file:
+            self.assertEqual(json.load(output_file), results)
+        
+        self.assertEqual([run['rows'] for run in results['runs']], [50, 200])
+        for run in results['runs']:
+            self.assertEqual(run['saved_rows'], run['rows'])
+            self.assertEqual(set(run['stages']), {'parse', 'save', 'summary'})
+            for stage in run['stages'].values():
+                self.assertGreater(stage['peak_rss_bytes'], 0)
+                self.assertGreaterEqual(stage['seconds'], 0)
+        self.assertFalse(Equipment.objects.exists())
+        self.assertFalse(CSVUpload.objects.exists())
+    
+    
+    def test_query_benchmark_reports_plans_and_rolls_back(self):
+        """Test that the query benchmark times both scopings, shows the owner indexes in use and leaves no rows."""
+        stdout = StringIO()
+        call_command('benchmark_queries', rows=600, users=3, repeat=1, stdout=stdout)
+        results = json.loads(stdout.getvalue())
+        
+        self.assertIn('flowrate_chart', results['queries'])
+        for query in results['queries'].values():
+            for scope in ('legacy', 'owner'):
+                self.assertGreaterEqual(query[scope]['median_ms'], 0)
+                self.assertTrue(query[scope]['plans'])
+        owner_plan = ' '.join(results['queries']['flowrate_chart']['owner']['plans'][0])
+        self.assertIn('equipment_owner_flowrate_idx', owner_plan)
+        self.assertNotIn('TEMP B-TREE', owner_plan)
+        self.assertFalse(Equipment.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ChunkedUploadAPITestCase(APITestCase):
+    """
+    Test cases for resumable chunked uploads.
+    """
+    
+    def setUp(self):
+        """Set up an authenticated client and a file split into chunks."""
+        self.user = User.objects.create_user(username='field', password='secret123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        content = b'Equipment Name,Type,Flowrate\n' + b''.join(
+            f'Pump-{i},Pump,{100 + i}\n'.encode() for i in range(30)
+        )
+        self.content = content
+        self.chunks = [content[i:i + 200] for i in range(0, len(content), 200)]
+    
+    def initiate(self):
+        """Start an upload session for self.content."""
+        response = self.client.post(reverse('api:upload-session-list'), {
+            'filename': 'plant.csv',
+            'total_size': len(self.content),
+            'total_chunks': len(self.chunks),
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+    
+    def put_chunk(self, session_id, index, data, checksum=None):
+        """PUT one chunk with its checksum header."""
+        url = reverse('api:upload-session-chunk', kwargs={'pk': session_id, 'index': index})
+        return self.client.put(
+            url, data, content_type='application/octet-stream',
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest()
+        )
+    
+    def test_chunked_upload_resume_and_finalize(self):
+        """Test uploading chunks out of order, resending a corrupt one and finalizing."""
+        session_id = self.initiate()
+        
+        for index in reversed(range(1, len(self.chunks))):
+            response = self.put_chunk(session_id, index, self.chunks[index])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = self.put_chunk(session_id, 0, self.chunks[0], checksum='0' * 64)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        # The client asks which chunks are missing and resends only those
+        response = self.client.get(reverse('api:upload-session-detail', kwargs={'pk': session_id}))
+        self.assertEqual(response.data['received_chunks'], list(range(1, len(self.chunks))))
+        self.put_chunk(session_id, 0, self.chunks[0])
+        
+        finalize_url = reverse('api:upload-session-finalize', kwargs={'pk': session_id})
+        response = self.client.post(finalize_url, {'sha256': hashlib.sha256(self.content).hexdigest()}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created_count'], 30)
+        
+        # A retried finalize reports the same upload instead of failing
+        retry = self.client.post(finalize_url, format='json')
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.data['csv_upload_id'], response.data['csv_upload_id'])
+    
+    def test_finalize_with_missing_chunks_is_rejected(self):
+        """Test that finalize lists the chunks still missing."""
+        session_id = self.initiate()
+        self.put_chunk(session_id, 0, self.chunks[0])
+        
+        response = self.client.post(reverse('api:upload-session-finalize', kwargs={'pk': session_id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Missing chunks: 1', response.data['error'])
+        self.assertFalse(CSVUpload.objects.exists())
+
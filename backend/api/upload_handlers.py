@@ -0,0 +1,183 @@
+"""
+Upload handlers for CSV file uploads.
+
+Uploads are written once, as they are received, to a temporary file in
+MEDIA_ROOT/UPLOAD_INCOMING_DIR. Being on the storage's file system, the
+file is renamed into its content-addressed place afterwards instead of
+being copied. Plain CSV files are also checked on the way: their header
+row is validated against the column mapping as soon as it has arrived, so
+a file without the required columns is rejected before the rest of it is
+read, and their records are counted.
+
+Previews only need the beginning of a file: PreviewMultiPartParser
+receives uploads with PreviewUploadHandler, which keeps the first
+CSV_PREVIEW_MAX_SIZE bytes in memory and lets the rest pass.
+"""
+import csv
+import hashlib
+import os
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload, TemporaryFileUploadHandler
+from rest_framework.parsers import MultiPartParser
+from .parsing import header_error
+
+# Bytes of a first row buffered for validation; longer header rows are left to the parser
+HEADER_MAX_SIZE = 1024 * 1024
+
+
+def incoming_dir() -> Path:
+    """Return the directory uploads are received into, creating it if needed."""
+    directory = Path(settings.MEDIA_ROOT) / settings.UPLOAD_INCOMING_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
+
+class IncomingUploadedFile(TemporaryUploadedFile):
+    """
+    An upload received into the incoming directory of the media storage.
+    Like any TemporaryUploadedFile it is removed on close unless it was moved.
+    """
+    
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        _, ext = os.path.splitext(name)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=incoming_dir())
+        # Skip TemporaryUploadedFile.__init__, which creates the file in FILE_UPLOAD_TEMP_DIR
+        super(TemporaryUploadedFile, self).__init__(
+            file, name, content_type, size, charset, content_type_extra
+        )
+
+
+class RecordCounter:
+    """
+    Count the records of a CSV file fed in pieces.
+    
+    Line breaks inside quoted values do not end a record. Blank lines are
+    counted like records.
+    """
+    
+    def __init__(self):
+        self.line_breaks = 0
+        self.in_quotes = False
+        self.last_byte = b''
+    
+    def feed(self, data: bytes) -> None:
+        """Count the line breaks in the next piece of the file."""
+        if b'"' not in data:
+            if not self.in_quotes:
+                self.line_breaks += data.count(b'\n')
+        else:
+            # Pieces between quote characters alternate between outside and inside quotes
+            parts = data.split(b'"')
+            outside = parts[1::2] if self.in_quotes else parts[0::2]
+            self.line_breaks += b''.join(outside).count(b'\n')
+            if len(parts) % 2 == 0:
+                self.in_quotes = not self.in_quotes
+        if data:
+            self.last_byte = data[-1:]
+    
+    def records(self) -> int:
+        """Return the records seen so far, the header row included."""
+        unterminated = self.last_byte not in (b'', b'\n')
+        return self.line_breaks + unterminated
+
+
+class ContentHashUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream uploads to the media storage and compute their SHA-256 on the way.
+    
+    The digest is attached to the uploaded file as `content_hash`, so the
+    upload can be deduplicated without reading it again. For plain CSV
+    files, the number of data rows is attached as `row_count`, and a header
+    row lacking required columns stops the upload: the error is left on the
+    request as `upload_error` and the rest of the body is not read at all,
+    so the response does not wait for the whole file to arrive.
+    """
+    
+    def new_file(self, *args, **kwargs):
+        FileUploadHandler.new_file(self, *args, **kwargs)
+        self.file = IncomingUploadedFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        self.sha256 = hashlib.sha256()
+        is_csv = self.file_name.lower().endswith('.csv')
+        self.counter = RecordCounter() if is_csv else None
+        self.header = b'' if is_csv else None
+    
+    def check_header(self) -> None:
+        """Validate the buffered first row and stop the upload if it lacks required columns."""
+        head, self.header = self.header, None
+        columns = next(csv.reader(StringIO(head.decode('utf-8-sig', errors='replace'))), [])
+        # Empty files are reported by the parser
+        if not columns:
+            return
+        error_msg = header_error(columns)
+        if error_msg:
+            self.request.upload_error = error_msg
+            # Leave the rest of the body unread instead of draining it
+            raise StopUpload(connection_reset=True)
+    
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        if self.counter is not None:
+            self.counter.feed(raw_data)
+            if self.header is not None:
+                self.header += raw_data
+                if self.counter.line_breaks:
+                    self.check_header()
+                elif len(self.header) > HEADER_MAX_SIZE:
+                    self.header = None
+        return super().receive_data_chunk(raw_data, start)
+    
+    def file_complete(self, file_size):
+        # A file without line breaks is all header
+        if self.header is not None:
+            self.check_header()
+        uploaded_file = super().file_complete(file_size)
+        uploaded_file.content_hash = self.sha256.hexdigest()
+        if self.counter is not None:
+            uploaded_file.row_count = max(self.counter.records() - 1, 0)
+        return uploaded_file
+
+
+class PreviewUploadHandler(FileUploadHandler):
+    """
+    Keep the first CSV_PREVIEW_MAX_SIZE bytes of an upload in memory.
+    
+    The rest of the body is received but neither stored nor hashed. The
+    uploaded file's `truncated` attribute tells whether anything was left out.
+    """
+    
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.head = BytesIO()
+        self.truncated = False
+    
+    def receive_data_chunk(self, raw_data, start):
+        room = settings.CSV_PREVIEW_MAX_SIZE - self.head.tell()
+        if len(raw_data) > room:
+            self.truncated = True
+        if room > 0:
+            self.head.write(raw_data[:room])
+        return None
+    
+    def file_complete(self, file_size):
+        self.head.seek(0)
+        uploaded_file = InMemoryUploadedFile(
+            self.head, self.field_name, self.file_name, self.content_type,
+            self.head.getbuffer().nbytes, self.charset, self.content_type_extra
+        )
+        uploaded_file.truncated = self.truncated
+        return uploaded_file
+
+
+class PreviewMultiPartParser(MultiPartParser):
+    """Multipart parser receiving files with PreviewUploadHandler instead of the configured handlers."""
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = parser_context['request']
+        request._request.upload_handlers = [PreviewUploadHandler(request._request)]
+        return super().parse(stream, media_type, parser_context)
@@ -4,8 +4,8 @@ URL configuration for API endpoints.
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    EquipmentViewSet, CSVUploadViewSet,
-    dashboard_summary, flowrate_chart_data, type_distribution_data,
+    EquipmentViewSet, CSVUploadViewSet, UploadSessionViewSet,
+    dashboard_summary, flowrate_chart_data, type_distribution_data, dashboard_bundle, dashboard_cache_stats,
     generate_report, clear_all_data, health_check,
     login_view, register_view, logout_view, current_user, get_csrf_token
 )
@@ -13,6 +13,8 @@ from .views import (
 # Create router for ViewSets
 router = DefaultRouter()
 router.register(r'equipment', EquipmentViewSet, basename='equipment')
+# Registered before 'uploads' so 'uploads/sessions/' is not read as an upload id
+router.register(r'uploads/sessions', UploadSessionViewSet, basename='upload-session')
 router.register(r'uploads', CSVUploadViewSet, basename='csv-upload')
 
 app_name = 'api'
@@ -32,6 +34,8 @@ urlpatterns = [
     path('dashboard/summary/', dashboard_summary, name='dashboard-summary'),
     path('dashboard/flowrate-chart/', flowrate_chart_data, name='flowrate-chart'),
     path('dashboard/type-distribution/', type_distribution_data, name='type-distribution'),
+    path('dashboard/bundle/', dashboard_bundle, name='dashboard-bundle'),
+    path('dashboard/cache-stats/', dashboard_cache_stats, name='dashboard-cache-stats'),
     
     # Report generation
     path('reports/generate/', generate_report, name='generate-report'),
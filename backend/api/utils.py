@@ -1,12 +1,27 @@
 """
 Utility functions for CSV parsing, PDF generation, and data processing.
 """
+import hashlib
+import json
+import math
+import os
+import uuid
 import pandas as pd
 import csv
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from itertools import islice
+from multiprocessing import get_context
 from io import BytesIO
-from typing import List, Dict, Any
-from django.db.models import Avg, Max, Min, Count, Q
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import DataError, IntegrityError, connection, transaction
+from django.db.models import Avg, Max, Min, Count, Q, Sum
+from django.utils import timezone
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -17,230 +32,806 @@ from reportlab.platypus import (
 )
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from .models import Equipment, CSVUpload, DataSummary
+from .columnar import is_columnar, iter_columnar_frames, read_columnar_columns
+from .compression import (
+    DecompressionLimitError, decompress_head, is_compressed, list_csv_members, open_csv_source
+)
+from .csv_engines import ENGINE_C, iter_csv_frames, select_engine
+from .dashboard_cache import bump_data_version
+from .metrics import IngestionMetrics, rows_per_second
+from .workbook import is_workbook, iter_sheet_frames, list_sheets, read_sheet_columns
+from .parsing import (
+    ERROR_VALUE_LENGTH, FIRST_DATA_ROW, CleanedColumns, RowError,
+    prepare_dataframe, clean_columns, zip_records, text_columns,
+    find_record_boundaries, parse_archive_member, parse_csv_range, preview_csv_head
+)
+
+
+class CSVParseError(ValueError):
+    """Raised when a chunk of a streamed CSV file cannot be parsed."""
+
+
+class IngestionAbandoned(Exception):
+    """Raised when an upload being ingested was marked failed meanwhile, e.g. as abandoned by pruning."""
+
+
+class RowErrorLog:
+    """
+    Rejected rows of one upload, in file order.
+    
+    Every rejected row is counted, but only the first `limit` errors are
+    kept for the report, so a file full of bad rows stays cheap to store.
+    For archive batches, set `file` to the archive member being read and
+    its errors are reported with the member's name.
+    """
+    
+    def __init__(self, limit: int = None):
+        self.limit = settings.CSV_ROW_ERROR_LIMIT if limit is None else limit
+        self.rejected_rows = 0
+        self.errors = []
+        self.file = ''
+        self._files = []
+    
+    def add(self, errors: List[RowError], rejected_rows: int, first_row: int = 0) -> None:
+        """Record rejected rows; error rows are counted from first_row."""
+        self.rejected_rows += rejected_rows
+        room = self.limit - len(self.errors)
+        if room > 0:
+            kept = [error._replace(row=error.row + first_row) for error in errors[:room]]
+            self.errors.extend(kept)
+            self._files.extend([self.file] * len(kept))
+    
+    def as_dicts(self) -> List[Dict[str, Any]]:
+        """Return the kept errors as JSON-ready dicts."""
+        return [
+            {'file': file, **error._asdict()} if file else error._asdict()
+            for file, error in zip(self._files, self.errors)
+        ]
+
+
+def _cleaned_records(cleaned: CleanedColumns, first_row: int,
+                     row_errors: RowErrorLog = None) -> Iterator[Dict[str, Any]]:
+    """Report the rejected rows of a cleaned chunk and return its records."""
+    if row_errors is not None:
+        row_errors.add(cleaned.errors, cleaned.source_rows - cleaned.row_count, first_row)
+    return zip_records(cleaned, first_row)
+
+
+def _frame_records(frames: Iterable[pd.DataFrame], row_errors: RowErrorLog = None,
+                   metrics: IngestionMetrics = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the equipment records of the successive DataFrames of one file,
+    numbering rows across DataFrames. Reading, column mapping and cleaning
+    of each DataFrame are timed as the read, map and convert stages.
+    """
+    if metrics is None:
+        metrics = IngestionMetrics()
+    frames = iter(frames)
+    first_row = FIRST_DATA_ROW
+    while True:
+        with metrics.stage('read'):
+            chunk = next(frames, None)
+        if chunk is None:
+            break
+        with metrics.stage('map'):
+            _, chunk, _ = prepare_dataframe(chunk)
+        with metrics.stage('convert'):
+            cleaned = clean_columns(chunk)
+            records = _cleaned_records(cleaned, first_row, row_errors)
+        metrics.add_rows('read', cleaned.source_rows)
+        metrics.add_rows('convert', cleaned.row_count)
+        yield from records
+        first_row += cleaned.source_rows
+
+
+def csv_source(file_path: str):
+    """
+    Open a CSV upload for pandas, decompressing .gz/.bz2/.xz/.zip files on the fly.
+    
+    Decompressed size is limited to CSV_MAX_SIZE and CSV_MAX_COMPRESSION_RATIO.
+    """
+    return open_csv_source(file_path, settings.CSV_MAX_SIZE, settings.CSV_MAX_COMPRESSION_RATIO)
+
+
+def choose_csv_engine(file_path: str) -> str:
+    """
+    Return the parser backend for a CSV upload.
+    
+    settings.CSV_PARSER_ENGINE names a backend, or 'auto' to pick one by
+    file size and installed libraries. Compressed files are decompressed
+    as a stream, which only the C parser reads.
+    """
+    if is_compressed(file_path):
+        return ENGINE_C
+    if settings.CSV_PARSER_ENGINE != 'auto':
+        return settings.CSV_PARSER_ENGINE
+    return select_engine(
+        os.path.getsize(file_path), settings.CSV_STDLIB_MAX_SIZE,
+        settings.CSV_PYARROW_MIN_SIZE, settings.CSV_MMAP_MIN_SIZE
+    )
+
+
+def read_csv_columns(file_path: str) -> List[str]:
+    """Return the column names of a CSV upload's header row."""
+    with csv_source(file_path) as source:
+        return pd.read_csv(source, nrows=0).columns.tolist()
+
+
+def iter_csv_upload_frames(file_path: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+    """
+    Yield a CSV upload as DataFrames of at most chunk_size rows, read by the backend choose_csv_engine picks.
+    
+    Args:
+        file_path: Path to the CSV file, optionally compressed
+        chunk_size: Maximum rows per DataFrame
+        columns: Column names of the header row
+    
+    Yields:
+        DataFrames with the file's columns
+    """
+    if is_compressed(file_path):
+        dtypes = {name: str for name in text_columns(columns)}
+        with csv_source(file_path) as source, pd.read_csv(source, chunksize=chunk_size, dtype=dtypes) as reader:
+            yield from reader
+        return
+    yield from iter_csv_frames(file_path, chunk_size, columns, choose_csv_engine(file_path))
+
+
+def _iter_csv_records(file_path: str, chunk_size: int, columns: List[str], row_errors: RowErrorLog = None,
+                      metrics: IngestionMetrics = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield equipment records from a CSV file, chunk_size rows at a time.
+    """
+    try:
+        yield from _frame_records(iter_csv_upload_frames(file_path, chunk_size, columns), row_errors, metrics)
+    except DecompressionLimitError as e:
+        raise CSVParseError(str(e)) from e
+    except Exception as e:
+        raise CSVParseError(f"Error parsing CSV file: {str(e)}") from e
+
+
+def _iter_columnar_records(file_path: str, chunk_size: int, row_errors: RowErrorLog = None,
+                           metrics: IngestionMetrics = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield equipment records from a Parquet or Arrow IPC file, chunk_size rows at a time.
+    """
+    try:
+        yield from _frame_records(iter_columnar_frames(file_path, chunk_size), row_errors, metrics)
+    except Exception as e:
+        raise CSVParseError(f"Error reading columnar file: {str(e)}") from e
 
 
-def parse_csv_file(file_path: str) -> tuple[bool, List[Dict[str, Any]], str]:
+def _iter_sheet_records(file_path: str, sheet_name: str, chunk_size: int, row_errors: RowErrorLog = None,
+                        metrics: IngestionMetrics = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield equipment records from one worksheet of a workbook, chunk_size rows at a time.
+    """
+    try:
+        yield from _frame_records(iter_sheet_frames(file_path, sheet_name, chunk_size), row_errors, metrics)
+    except Exception as e:
+        raise CSVParseError(f"Error reading sheet '{sheet_name}': {str(e)}") from e
+
+
+# Parse worker pools by worker count, created on first use
+_parse_executors = {}
+
+
+def get_parse_executor(workers: int) -> ProcessPoolExecutor:
+    """
+    Return a process pool for parallel CSV parsing.
+    
+    Workers are spawned rather than forked, because the web process may be
+    running ingestion threads, and they only import the Django-free
+    api.parsing module.
+    """
+    if workers not in _parse_executors:
+        _parse_executors[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+    return _parse_executors[workers]
+
+
+def _iter_csv_records_parallel(file_path: str, columns: List[str], workers: int, range_size: int,
+                               row_errors: RowErrorLog = None,
+                               metrics: IngestionMetrics = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yield equipment records from a CSV file parsed by a pool of processes.
+    
+    The file is split into byte ranges on record boundaries, each range is
+    parsed and cleaned in a worker, and results are yielded in file order.
+    At most two ranges per worker are in flight, so memory stays bounded
+    when saving is slower than parsing. Workers number rows within their
+    range; the rows of earlier ranges are added here. Waiting for a worker
+    is timed as the read stage, as reading, mapping and cleaning all happen
+    in the worker.
+    """
+    if metrics is None:
+        metrics = IngestionMetrics()
+    executor = get_parse_executor(workers)
+    pending = deque()
+    first_row = FIRST_DATA_ROW
+    
+    def take_next():
+        nonlocal first_row
+        with metrics.stage('read'):
+            cleaned = pending.popleft().result()
+        metrics.add_rows('read', cleaned.source_rows)
+        metrics.add_rows('convert', cleaned.row_count)
+        records = _cleaned_records(cleaned, first_row, row_errors)
+        first_row += cleaned.source_rows
+        return records
+    
+    try:
+        for start, end in find_record_boundaries(file_path, range_size):
+            pending.append(executor.submit(parse_csv_range, file_path, start, end, columns))
+            if len(pending) >= workers * 2:
+                yield from take_next()
+        while pending:
+            yield from take_next()
+    except Exception as e:
+        if isinstance(e, BrokenProcessPool):
+            # Start a fresh pool next time instead of failing every later upload
+            _parse_executors.pop(workers, None)
+        raise CSVParseError(f"Error parsing CSV file: {str(e)}") from e
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _iter_archive_members(file_path: str, member_names: List[str],
+                          workers: int) -> Iterator[tuple[str, Optional[CleanedColumns], str]]:
+    """
+    Parse the CSV files of a ZIP archive, yielding results in archive order.
+    
+    With more than one worker the files are parsed concurrently by the
+    parse process pool, at most two per worker in flight.
+    
+    Yields:
+        Tuples of (member_name, cleaned_columns, error_message); cleaned_columns
+        is None for files that could not be parsed
+    """
+    limits = (settings.CSV_MAX_SIZE, settings.CSV_MAX_COMPRESSION_RATIO)
+    if workers <= 1:
+        for name in member_names:
+            yield (name, *parse_archive_member(file_path, name, *limits))
+        return
+    
+    executor = get_parse_executor(workers)
+    pending = deque()
+    try:
+        for name in member_names:
+            pending.append((name, executor.submit(parse_archive_member, file_path, name, *limits)))
+            if len(pending) >= workers * 2:
+                name, future = pending.popleft()
+                yield (name, *future.result())
+        while pending:
+            name, future = pending.popleft()
+            yield (name, *future.result())
+    except BrokenProcessPool as e:
+        # Start a fresh pool next time instead of failing every later upload
+        _parse_executors.pop(workers, None)
+        raise CSVParseError(f"Error parsing archive: {str(e)}") from e
+    finally:
+        for _, future in pending:
+            future.cancel()
+
+
+def stream_csv_file(file_path: str, chunk_size: int = None, workers: int = None, sheet_name: str = '',
+                    row_errors: RowErrorLog = None,
+                    metrics: IngestionMetrics = None) -> tuple[bool, Iterator[Dict[str, Any]], str]:
+    """
+    Parse CSV file lazily in fixed-size row chunks.
+    
+    Only the header is read up front to validate the required columns; the
+    returned iterator reads, maps and cleans chunk_size rows at a time, so
+    peak memory stays roughly constant whatever the file size. Files of at
+    least CSV_PARALLEL_THRESHOLD bytes are split into byte ranges parsed by
+    a process pool instead. Other plain CSV files are read by the parser
+    backend choose_csv_engine picks for their size. Compressed files are
+    decompressed as a stream and always parsed sequentially by the C
+    parser. Parquet and Arrow IPC files are read
+    in typed record batches instead of being parsed as text, and Excel
+    workbooks one worksheet at a time in read-only mode. Errors in later
+    chunks are raised from the iterator as CSVParseError. Rows with values
+    that cannot be stored are left out and reported to row_errors.
+    Reading, mapping and converting the chunks is timed in metrics as the
+    iterator is consumed.
+    
+    Args:
+        file_path: Path to the CSV (optionally compressed), Parquet or Arrow IPC file
+        chunk_size: Rows per chunk (defaults to settings.CSV_CHUNK_SIZE)
+        workers: Parse processes for large files (defaults to settings.CSV_PARSE_WORKERS)
+        sheet_name: Worksheet to read from a workbook (defaults to the first one)
+        row_errors: Optional RowErrorLog collecting the rejected rows
+        metrics: Optional IngestionMetrics timing the stages
+    
+    Returns:
+        Tuple of (success, record_iterator, error_message)
+    """
+    chunk_size = chunk_size or settings.CSV_CHUNK_SIZE
+    workers = workers or settings.CSV_PARSE_WORKERS
+    
+    if is_workbook(file_path):
+        try:
+            sheet_name = sheet_name or list_sheets(file_path)[0]
+            header = pd.DataFrame(columns=read_sheet_columns(file_path, sheet_name))
+        except Exception as e:
+            return False, iter(()), f"Error reading workbook: {str(e)}"
+        success, _, error_msg = prepare_dataframe(header)
+        if not success:
+            return False, iter(()), f"Sheet '{sheet_name}': {error_msg}"
+        return True, _iter_sheet_records(file_path, sheet_name, chunk_size, row_errors, metrics), ""
+    
+    if is_columnar(file_path):
+        try:
+            header = pd.DataFrame(columns=read_columnar_columns(file_path))
+        except Exception as e:
+            return False, iter(()), f"Error reading columnar file: {str(e)}"
+        success, _, error_msg = prepare_dataframe(header)
+        if not success:
+            return False, iter(()), error_msg
+        return True, _iter_columnar_records(file_path, chunk_size, row_errors, metrics), ""
+    
+    try:
+        columns = read_csv_columns(file_path)
+        success, _, error_msg = prepare_dataframe(pd.DataFrame(columns=columns))
+        if not success:
+            return False, iter(()), error_msg
+    except DecompressionLimitError as e:
+        return False, iter(()), str(e)
+    except Exception as e:
+        return False, iter(()), f"Error parsing CSV file: {str(e)}"
+    
+    # Byte ranges can only be split in uncompressed files
+    if (workers > 1 and not is_compressed(file_path)
+            and os.path.getsize(file_path) >= settings.CSV_PARALLEL_THRESHOLD):
+        records = _iter_csv_records_parallel(
+            file_path, columns, workers, settings.CSV_PARALLEL_RANGE_SIZE, row_errors, metrics
+        )
+        return True, records, ""
+    
+    return True, _iter_csv_records(file_path, chunk_size, columns, row_errors, metrics), ""
+
+
+def parse_csv_file(file_path: str, row_errors: RowErrorLog = None) -> tuple[bool, List[Dict[str, Any]], str]:
     """
     Parse CSV file and return equipment data.
     
     Args:
         file_path: Path to the CSV file
+        row_errors: Optional RowErrorLog collecting the rejected rows
     
     Returns:
         Tuple of (success, data_list, error_message)
     """
     try:
-        # Read CSV file using pandas
-        df = pd.read_csv(file_path)
-        
-        # Store original column names for better error messages
-        original_columns = df.columns.tolist()
-        
-        # Convert column names to lowercase and replace spaces with underscores
-        df.columns = df.columns.str.lower().str.replace(' ', '_').str.strip()
-        
-        # Expected columns (flexible mapping)
-        column_mapping = {
-            'equipment_id': ['equipment_id', 'id', 'equip_id', 'equipment_no', 'equipment_name'],
-            'equipment_name': ['equipment_name', 'name', 'equip_name', 'equipment_name'],
-            'equipment_type': ['equipment_type', 'type', 'equip_type'],
-            'manufacturer': ['manufacturer', 'make', 'vendor'],
-            'model_number': ['model_number', 'model', 'model_no'],
-            'serial_number': ['serial_number', 'serial', 'serial_no'],
-            'capacity': ['capacity', 'cap'],
-            'flowrate': ['flowrate', 'flow_rate', 'flow'],
-            'pressure': ['pressure', 'press'],
-            'temperature': ['temperature', 'temp'],
-            'location': ['location', 'loc', 'site'],
-            'status': ['status', 'state'],
-            'installation_date': ['installation_date', 'install_date', 'commissioned_date'],
-            'last_maintenance': ['last_maintenance', 'last_maint', 'maintenance_date'],
-            'notes': ['notes', 'remarks', 'comments'],
-        }
-        
-        # Map columns
-        mapped_columns = {}
-        for target_col, possible_names in column_mapping.items():
-            for name in possible_names:
-                if name in df.columns:
-                    mapped_columns[name] = target_col
-                    break
-        
-        # Rename columns
-        df.rename(columns=mapped_columns, inplace=True)
-        
-        # Handle case where Equipment Name is used for both ID and Name
-        if 'equipment_name' in df.columns and 'equipment_id' not in df.columns:
-            df['equipment_id'] = df['equipment_name']
-        elif 'equipment_id' in df.columns and 'equipment_name' not in df.columns:
-            df['equipment_name'] = df['equipment_id']
-        
-        # Ensure required columns exist (only Equipment Name/ID and Type are required)
-        # Check if we have at least one identifier column
-        has_id = 'equipment_id' in df.columns or 'equipment_name' in df.columns
-        has_type = 'equipment_type' in df.columns
-        
-        if not has_id:
-            available_cols = ', '.join(original_columns)
-            return False, [], f"Missing required column: Equipment Name or Equipment ID. Available columns: {available_cols}"
-        
-        if not has_type:
-            available_cols = ', '.join(original_columns)
-            return False, [], f"Missing required column: Equipment Type. Available columns: {available_cols}"
-        
-        # Convert dates first
-        date_columns = ['installation_date', 'last_maintenance']
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Known numeric columns (will be stored in model fields)
-        known_numeric_columns = ['capacity', 'flowrate', 'pressure', 'temperature']
-        for col in known_numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Known standard columns that will be stored in model fields
-        standard_columns = [
-            'equipment_id', 'equipment_name', 'equipment_type',
-            'manufacturer', 'model_number', 'serial_number',
-            'capacity', 'flowrate', 'pressure', 'temperature',
-            'location', 'status', 'installation_date', 'last_maintenance', 'notes'
-        ]
-        
-        # Handle missing values - replace NaN with None for proper JSON serialization
-        df = df.where(pd.notnull(df), None)
-        
-        # For non-numeric, non-date standard columns, replace None with empty string
-        for col in df.columns:
-            if col not in known_numeric_columns and col not in date_columns and col in standard_columns:
-                df[col] = df[col].fillna('')
-        
-        # Convert to list of dictionaries
-        data_list = df.to_dict('records')
+        if is_columnar(file_path):
+            df = pd.concat(iter_columnar_frames(file_path, settings.CSV_CHUNK_SIZE), ignore_index=True)
+        else:
+            # Read CSV file with the parser backend suited to its size
+            columns = read_csv_columns(file_path)
+            df = pd.concat(
+                iter_csv_upload_frames(file_path, settings.CSV_CHUNK_SIZE, columns), ignore_index=True
+            )
         
-        # Separate standard columns from dynamic columns for each record
-        processed_data = []
-        for record in data_list:
-            standard_data = {}
-            dynamic_data = {}
-            
-            for key, value in record.items():
-                if key in standard_columns:
-                    standard_data[key] = value
-                else:
-                    # Store dynamic columns
-                    # Try to convert to numeric if possible
-                    if value is not None and value != '':
-                        try:
-                            # Try to convert to float
-                            numeric_value = pd.to_numeric(value, errors='coerce')
-                            if pd.notna(numeric_value):
-                                dynamic_data[key] = float(numeric_value)
-                            else:
-                                dynamic_data[key] = str(value) if value else None
-                        except (ValueError, TypeError):
-                            dynamic_data[key] = str(value) if value else None
-                    else:
-                        dynamic_data[key] = None
-            
-            # Combine standard and dynamic data
-            processed_record = {**standard_data, 'additional_params': dynamic_data}
-            processed_data.append(processed_record)
+        success, df, error_msg = prepare_dataframe(df)
+        if not success:
+            return False, [], error_msg
         
-        return True, processed_data, ""
+        return True, list(_cleaned_records(clean_columns(df), FIRST_DATA_ROW, row_errors)), ""
     
+    except DecompressionLimitError as e:
+        return False, [], str(e)
     except Exception as e:
         return False, [], f"Error parsing CSV file: {str(e)}"
 
 
-def save_equipment_from_csv(csv_upload: CSVUpload, data_list: List[Dict[str, Any]]) -> tuple[int, int]:
+# Files a preview can read from their first bytes
+PREVIEW_SUFFIXES = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz')
+
+
+def preview_upload(uploaded_file, nrows: int) -> tuple[bool, Dict[str, Any], str]:
     """
-    Save equipment data from parsed CSV to database.
+    Describe how the first rows of an uploaded CSV file would be ingested.
+    
+    At most CSV_PREVIEW_MAX_SIZE bytes are read, decompressed if needed, so
+    a preview costs the same for any file size. Nothing is stored.
     
     Args:
-        csv_upload: CSVUpload instance
-        data_list: List of equipment data dictionaries
+        uploaded_file: Uploaded file, usually only its head as kept by PreviewUploadHandler
+        nrows: Maximum number of data rows to read
     
     Returns:
-        Tuple of (created_count, updated_count)
+        Tuple of (success, preview, error_message); see preview_csv_head
+        for the preview's fields
     """
-    created_count = 0
-    updated_count = 0
+    name = uploaded_file.name
+    if not name.lower().endswith(PREVIEW_SUFFIXES):
+        return False, {}, "Preview supports CSV files (.csv, .csv.gz, .csv.bz2, .csv.xz)."
     
-    for data in data_list:
-        equipment_id = data.get('equipment_id', '').strip()
-        if not equipment_id:
-            continue
-        
-        # Get equipment name, use equipment_id if name is empty
-        equip_name = data.get('equipment_name', '') or data.get('equipment_id', '')
-        equip_type = data.get('equipment_type', 'Other')
-        
-        # Clean up equipment type (remove spaces, handle variations)
-        if equip_type:
-            equip_type = equip_type.strip()
-            # Map common variations to standard types
-            type_mapping = {
-                'heatexchanger': 'Heat Exchanger',
-                'heat_exchanger': 'Heat Exchanger',
-                'condenser': 'Heat Exchanger',  # Condenser is a type of heat exchanger
-            }
-            equip_type_lower = equip_type.lower().replace(' ', '')
-            equip_type = type_mapping.get(equip_type_lower, equip_type)
-        
-        # Helper function to convert NaN/None to None for numeric fields
-        def clean_numeric_value(value):
-            """Convert NaN, None, or empty string to None for numeric fields."""
-            import math
-            if value is None or value == '':
-                return None
-            # Check for NaN (float('nan') or numpy NaN)
-            if isinstance(value, float) and math.isnan(value):
-                return None
-            return value
-        
-        # Get additional dynamic parameters
-        additional_params = data.get('additional_params', {}) or {}
+    max_size = settings.CSV_PREVIEW_MAX_SIZE
+    data = uploaded_file.read(max_size)
+    truncated = getattr(uploaded_file, 'truncated', False) or uploaded_file.size > len(data)
+    try:
+        if is_compressed(name):
+            data = decompress_head(data, name, max_size)
+            truncated = truncated or len(data) >= max_size
         
-        # Prepare equipment data
-        equipment_data = {
-            'equipment_name': equip_name,
-            'equipment_type': equip_type,
-            'manufacturer': data.get('manufacturer', None) or None,
-            'model_number': data.get('model_number', None) or None,
-            'serial_number': data.get('serial_number', None) or None,
-            'capacity': clean_numeric_value(data.get('capacity', None)),
-            'flowrate': clean_numeric_value(data.get('flowrate', None)),
-            'pressure': clean_numeric_value(data.get('pressure', None)),
-            'temperature': clean_numeric_value(data.get('temperature', None)),
-            'location': data.get('location', None) or None,
-            'status': data.get('status', 'Active'),
-            'installation_date': data.get('installation_date', None),
-            'last_maintenance': data.get('last_maintenance', None),
-            'notes': data.get('notes', None) or None,
-            'additional_params': additional_params,
-            'csv_upload': csv_upload,
-        }
+        # A head cut off mid-row ends at its last complete row
+        if truncated:
+            end = data.rfind(b'\n')
+            if end < 0:
+                return False, {}, f"Header row is longer than {max_size} bytes."
+            data = data[:end + 1]
         
-        # Create or update equipment
-        equipment, created = Equipment.objects.update_or_create(
-            equipment_id=equipment_id,
-            defaults=equipment_data
-        )
-        
-        if created:
+        return True, preview_csv_head(data, nrows), ""
+    except Exception as e:
+        return False, {}, f"Error parsing CSV file: {str(e)}"
+
+
+# Map common variations to standard types
+EQUIPMENT_TYPE_MAPPING = {
+    'heatexchanger': 'Heat Exchanger',
+    'heat_exchanger': 'Heat Exchanger',
+    'condenser': 'Heat Exchanger',  # Condenser is a type of heat exchanger
+}
+
+# Equipment fields written by CSV ingestion (everything except the equipment_id key)
+UPSERT_FIELDS = [
+    'equipment_name', 'equipment_type', 'manufacturer', 'model_number',
+    'serial_number', 'capacity', 'flowrate', 'pressure', 'temperature',
+    'location', 'status', 'installation_date', 'last_maintenance', 'notes',
+    'additional_params', 'fingerprint', 'csv_upload', 'owner', 'updated_at',
+]
+
+# Ingested values that make up a row's fingerprint
+FINGERPRINT_FIELDS = UPSERT_FIELDS[:UPSERT_FIELDS.index('fingerprint')]
+
+# Numeric equipment fields averaged by the summaries
+SUMMARY_NUMERIC_FIELDS = ['flowrate', 'pressure', 'temperature']
+
+# Rows written per INSERT/UPDATE statement and per existing-id prefetch
+UPSERT_BATCH_SIZE = 1000
+
+
+def clean_numeric_value(value):
+    """Convert NaN, None, or empty string to None for numeric fields."""
+    if value is None or value == '':
+        return None
+    # Check for NaN (float('nan') or numpy NaN)
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+def build_equipment_fields(csv_upload: CSVUpload, data: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
+    """
+    Build model field values for one parsed CSV record.
+    
+    Args:
+        csv_upload: CSVUpload instance the record belongs to
+        data: Equipment data dictionary from parse_csv_file
+    
+    Returns:
+        Tuple of (equipment_id, field_values); equipment_id is '' for rows to skip
+    """
+    equipment_id = data.get('equipment_id', '').strip()
+    if not equipment_id:
+        return '', {}
+    
+    # Get equipment name, use equipment_id if name is empty
+    equip_name = data.get('equipment_name', '') or data.get('equipment_id', '')
+    equip_type = data.get('equipment_type', 'Other')
+    
+    # Clean up equipment type (remove spaces, handle variations)
+    if equip_type:
+        equip_type = equip_type.strip()
+        equip_type_lower = equip_type.lower().replace(' ', '')
+        equip_type = EQUIPMENT_TYPE_MAPPING.get(equip_type_lower, equip_type)
+    
+    # Get additional dynamic parameters
+    additional_params = data.get('additional_params', {}) or {}
+    
+    fields = {
+        'equipment_name': equip_name,
+        'equipment_type': equip_type,
+        'manufacturer': data.get('manufacturer', None) or None,
+        'model_number': data.get('model_number', None) or None,
+        'serial_number': data.get('serial_number', None) or None,
+        'capacity': clean_numeric_value(data.get('capacity', None)),
+        'flowrate': clean_numeric_value(data.get('flowrate', None)),
+        'pressure': clean_numeric_value(data.get('pressure', None)),
+        'temperature': clean_numeric_value(data.get('temperature', None)),
+        'location': data.get('location', None) or None,
+        'status': data.get('status', 'Active'),
+        'installation_date': data.get('installation_date', None),
+        'last_maintenance': data.get('last_maintenance', None),
+        'notes': data.get('notes', None) or None,
+        'additional_params': additional_params,
+    }
+    fields['fingerprint'] = equipment_fingerprint(fields)
+    fields['csv_upload'] = csv_upload
+    fields['owner_id'] = csv_upload.user_id
+    return equipment_id, fields
+
+
+def equipment_fingerprint(fields: Dict[str, Any]) -> str:
+    """
+    Return a stable hash of the ingested values of one equipment row.
+    
+    Rows reach the upsert as dicts, so hashing them one by one is cheaper
+    than first assembling the batch into a DataFrame for
+    pd.util.hash_pandas_object, which also cannot hash additional_params.
+    
+    Args:
+        fields: Field values from build_equipment_fields
+    
+    Returns:
+        32 character hex digest
+    """
+    values = [fields[name] for name in FINGERPRINT_FIELDS]
+    payload = json.dumps(values, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _upsert_equipment_batch(csv_upload: CSVUpload, batch: List[Dict[str, Any]]) -> tuple[int, int, int]:
+    """
+    Insert or update one batch of parsed records with a constant number of queries.
+    
+    Existing equipment_ids and their fingerprints are prefetched in one
+    query. Rows whose fingerprint matches the stored one are not rewritten,
+    they are only moved to this upload with a single narrow UPDATE that
+    leaves updated_at alone. Where the backend supports ON CONFLICT ... DO
+    UPDATE the new and changed rows are a single statement, otherwise it
+    falls back to bulk_create for new rows and bulk_update for changed ones.
+    Rows taken over from another user's upload bump that user's data version.
+    """
+    rows = {}
+    row_fingerprints = []
+    
+    for data in batch:
+        equipment_id, fields = build_equipment_fields(csv_upload, data)
+        if not equipment_id:
+            continue
+        # A repeated equipment_id within the batch keeps its last values
+        rows[equipment_id] = fields
+        row_fingerprints.append((equipment_id, fields['fingerprint']))
+    
+    if not rows:
+        return 0, 0, 0
+    
+    stored = {}
+    # Users whose rows this batch takes over, as equipment_id is unique across users
+    previous_owners = set()
+    for equipment_id, pk, fingerprint, owner_id in Equipment.objects.filter(
+        equipment_id__in=list(rows)
+    ).values_list('equipment_id', 'id', 'fingerprint', 'owner_id'):
+        stored[equipment_id] = (pk, fingerprint)
+        if owner_id != csv_upload.user_id:
+            previous_owners.add(owner_id)
+    
+    # Count in file order: a repeated equipment_id is compared with its earlier values
+    known = {equipment_id: fingerprint for equipment_id, (_, fingerprint) in stored.items()}
+    created_count = 0
+    updated_count = 0
+    unchanged_count = 0
+    for equipment_id, fingerprint in row_fingerprints:
+        if equipment_id not in known:
             created_count += 1
+        elif known[equipment_id] == fingerprint:
+            unchanged_count += 1
         else:
             updated_count += 1
+        known[equipment_id] = fingerprint
+    
+    changed_rows = {}
+    unchanged_ids = []
+    for equipment_id, fields in rows.items():
+        if equipment_id in stored and stored[equipment_id][1] == fields['fingerprint']:
+            unchanged_ids.append(stored[equipment_id][0])
+        else:
+            changed_rows[equipment_id] = fields
+    
+    if unchanged_ids:
+        Equipment.objects.filter(pk__in=unchanged_ids).exclude(
+            csv_upload=csv_upload
+        ).update(csv_upload=csv_upload, owner_id=csv_upload.user_id)
     
-    return created_count, updated_count
+    if changed_rows:
+        if connection.features.supports_update_conflicts_with_target:
+            Equipment.objects.bulk_create(
+                [Equipment(equipment_id=equipment_id, **fields) for equipment_id, fields in changed_rows.items()],
+                update_conflicts=True,
+                unique_fields=['equipment_id'],
+                update_fields=UPSERT_FIELDS,
+            )
+        else:
+            now = timezone.now()
+            new_equipment = []
+            existing_equipment = []
+            for equipment_id, fields in changed_rows.items():
+                equipment = Equipment(equipment_id=equipment_id, **fields)
+                if equipment_id in stored:
+                    # bulk_update skips auto_now, so stamp updated_at explicitly
+                    equipment.pk = stored[equipment_id][0]
+                    equipment.updated_at = now
+                    existing_equipment.append(equipment)
+                else:
+                    new_equipment.append(equipment)
+            Equipment.objects.bulk_create(new_equipment)
+            Equipment.objects.bulk_update(existing_equipment, UPSERT_FIELDS)
+    
+    # Their cached responses still show the rows that moved away
+    bump_data_version(*previous_owners)
+    
+    return created_count, updated_count, unchanged_count
+
+
+# Errors that reject the row being written rather than the whole upload. Other
+# database errors, e.g. OperationalError for a locked database or a lost
+# connection, are about the database rather than the row and fail the upload.
+ROW_WRITE_ERRORS = (IntegrityError, DataError, ValidationError, ValueError, TypeError)
+
+
+def _save_batch_isolating_errors(csv_upload: CSVUpload, batch: List[Dict[str, Any]],
+                                 row_errors: RowErrorLog) -> tuple[int, int, int]:
+    """
+    Upsert one batch in its own savepoint. If the database refuses it, the
+    batch is rolled back and its rows are retried one savepoint each, so
+    only the rows that fail are rejected.
+    """
+    try:
+        with transaction.atomic():
+            return _upsert_equipment_batch(csv_upload, batch)
+    except ROW_WRITE_ERRORS:
+        pass
+    
+    counts = (0, 0, 0)
+    for data in batch:
+        try:
+            with transaction.atomic():
+                row_counts = _upsert_equipment_batch(csv_upload, [data])
+        except ROW_WRITE_ERRORS as e:
+            message = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+            row_errors.add([RowError(
+                data.get('row_number', 0),
+                'equipment_id',
+                str(data.get('equipment_id', ''))[:ERROR_VALUE_LENGTH],
+                f'Could not be saved: {message}'
+            )], 1)
+            continue
+        counts = tuple(total + count for total, count in zip(counts, row_counts))
+    return counts
+
+
+def save_equipment_from_csv(csv_upload: CSVUpload, data_list: Iterable[Dict[str, Any]],
+                            batch_size: int = UPSERT_BATCH_SIZE,
+                            progress_callback: Callable[[int], None] = None,
+                            row_errors: RowErrorLog = None,
+                            metrics: IngestionMetrics = None) -> tuple[int, int, int]:
+    """
+    Save equipment data from parsed CSV to database.
+    
+    Records are upserted in batches of batch_size, each committed in its
+    own transaction, so a long upload never holds one write transaction
+    open. progress_callback runs inside the batch's transaction, so
+    progress it stores is committed together with the rows it counts.
+    Only new rows and rows whose values changed are rewritten. With
+    row_errors, rows the database refuses are rolled back to a savepoint
+    and rejected one by one instead of failing the upload.
+    Writing is timed as the upsert stage; pulling each batch from a lazy
+    data_list is timed as the convert stage, or as the stages the
+    iterator times itself.
+    
+    Args:
+        csv_upload: CSVUpload instance
+        data_list: Iterable of equipment data dictionaries
+        batch_size: Number of records written per batch
+        progress_callback: Optional callable receiving the rows saved so far, in each batch's transaction
+        row_errors: Optional RowErrorLog collecting the rows that could not be saved
+        metrics: Optional IngestionMetrics timing the stages
+    
+    Returns:
+        Tuple of (created_count, updated_count, unchanged_count)
+    """
+    if metrics is None:
+        metrics = IngestionMetrics()
+    created_count = 0
+    updated_count = 0
+    unchanged_count = 0
+    records = iter(data_list)
+    
+    with metrics.stage('upsert'):
+        while True:
+            with metrics.stage('convert'):
+                batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                if row_errors is None:
+                    batch_counts = _upsert_equipment_batch(csv_upload, batch)
+                else:
+                    batch_counts = _save_batch_isolating_errors(csv_upload, batch, row_errors)
+                if progress_callback:
+                    progress_callback(created_count + updated_count + unchanged_count + sum(batch_counts))
+            batch_created, batch_updated, batch_unchanged = batch_counts
+            created_count += batch_created
+            updated_count += batch_updated
+            unchanged_count += batch_unchanged
+            metrics.add_rows('upsert', sum(batch_counts))
+    
+    return created_count, updated_count, unchanged_count
+
+
+# Equipment metrics as aggregates over one queryset. Status counts are
+# conditional aggregates (COUNT ... FILTER), so any selection of them is
+# computed by a single SQL statement in one scan.
+EQUIPMENT_METRICS = {
+    'total_equipment': Count('id'),
+    'active_equipment': Count('id', filter=Q(status='Active')),
+    'inactive_equipment': Count('id', filter=Q(status='Inactive')),
+    'maintenance_equipment': Count('id', filter=Q(status='Maintenance')),
+    'avg_flowrate': Avg('flowrate'),
+    'max_flowrate': Max('flowrate'),
+    'min_flowrate': Min('flowrate'),
+    'avg_pressure': Avg('pressure'),
+    'avg_temperature': Avg('temperature'),
+    'total_types': Count('equipment_type', distinct=True),
+}
+
+# Metrics of the dashboard cards
+DASHBOARD_METRICS = [
+    'total_equipment', 'active_equipment', 'inactive_equipment', 'maintenance_equipment',
+    'avg_flowrate', 'avg_pressure', 'avg_temperature', 'total_types',
+]
+
+# Metrics stored on DataSummary, besides the type distribution
+SUMMARY_METRICS = [
+    'total_equipment', 'active_equipment', 'inactive_equipment', 'maintenance_equipment',
+    'avg_flowrate', 'max_flowrate', 'min_flowrate', 'avg_pressure', 'avg_temperature',
+]
+
+
+def user_equipment(user=None, csv_upload_id: int = None):
+    """
+    Return the equipment of a user's uploads, or all equipment without a user.
+    
+    The user is matched on the denormalized owner column, so queries need
+    neither a join nor a subquery and are served by the owner indexes.
+    
+    Args:
+        user: User instance to filter by
+        csv_upload_id: Optional CSV upload ID to narrow the equipment to
+    """
+    queryset = Equipment.objects.filter(owner=user) if user else Equipment.objects.all()
+    if csv_upload_id:
+        queryset = queryset.filter(csv_upload_id=csv_upload_id)
+    return queryset
+
+
+def aggregate_equipment_metrics(queryset, names: Iterable[str] = None) -> Dict[str, Any]:
+    """
+    Compute equipment metrics over a queryset in a single SQL statement.
+    
+    Args:
+        queryset: Equipment queryset, already filtered
+        names: Keys of EQUIPMENT_METRICS to compute, all of them by default
+    
+    Returns:
+        Dictionary mapping metric names to values; averages, minima and
+        maxima are None when no row has a value
+    """
+    if names is None:
+        names = EQUIPMENT_METRICS.keys()
+    return queryset.aggregate(**{name: EQUIPMENT_METRICS[name] for name in names})
 
 
 def calculate_summary_statistics(csv_upload: CSVUpload) -> DataSummary:
     """
     Calculate and save summary statistics for uploaded data.
     
+    Status counts and operational statistics are aggregated in the database
+    with one aggregate_equipment_metrics query; the type distribution is
+    one more GROUP BY.
+    
     Args:
         csv_upload: CSVUpload instance
     
@@ -249,49 +840,501 @@ def calculate_summary_statistics(csv_upload: CSVUpload) -> DataSummary:
     """
     equipment_qs = Equipment.objects.filter(csv_upload=csv_upload)
     
-    # Count by status
-    total_equipment = equipment_qs.count()
-    active_equipment = equipment_qs.filter(status='Active').count()
-    inactive_equipment = equipment_qs.filter(status='Inactive').count()
-    maintenance_equipment = equipment_qs.filter(status='Maintenance').count()
+    # Status counts and operational statistics in a single scan
+    values = aggregate_equipment_metrics(equipment_qs, SUMMARY_METRICS)
     
-    # Type distribution
     type_dist = equipment_qs.values('equipment_type').annotate(
         count=Count('id')
     ).order_by('-count')
-    
-    type_distribution = {item['equipment_type']: item['count'] for item in type_dist}
-    
-    # Operational statistics
-    flow_stats = equipment_qs.aggregate(
-        avg_flowrate=Avg('flowrate'),
-        max_flowrate=Max('flowrate'),
-        min_flowrate=Min('flowrate')
-    )
-    
-    pressure_stats = equipment_qs.aggregate(avg_pressure=Avg('pressure'))
-    temp_stats = equipment_qs.aggregate(avg_temperature=Avg('temperature'))
+    values['type_distribution'] = {item['equipment_type']: item['count'] for item in type_dist}
     
     # Create or update summary
     summary, created = DataSummary.objects.update_or_create(
         csv_upload=csv_upload,
-        defaults={
-            'total_equipment': total_equipment,
-            'active_equipment': active_equipment,
-            'inactive_equipment': inactive_equipment,
-            'maintenance_equipment': maintenance_equipment,
-            'type_distribution': type_distribution,
-            'avg_flowrate': flow_stats['avg_flowrate'],
-            'max_flowrate': flow_stats['max_flowrate'],
-            'min_flowrate': flow_stats['min_flowrate'],
-            'avg_pressure': pressure_stats['avg_pressure'],
-            'avg_temperature': temp_stats['avg_temperature'],
-        }
+        defaults=values
     )
     
     return summary
 
 
+# Upload states that are no longer being worked on
+FINISHED_STATUSES = (CSVUpload.STATUS_COMPLETED, CSVUpload.STATUS_FAILED)
+
+# Upload states of work that is still queued or running
+UNFINISHED_STATUSES = (CSVUpload.STATUS_PENDING, CSVUpload.STATUS_PROCESSING)
+
+# Uploads are stored by content under this directory of the storage backend
+UPLOAD_BLOB_DIR = 'uploads/blobs'
+
+# Bytes read at a time when hashing a file that arrived without a content hash
+HASH_READ_SIZE = 1024 * 1024
+
+
+def compute_content_hash(uploaded_file) -> str:
+    """
+    Return the SHA-256 of an uploaded file.
+    
+    Uses the digest computed by ContentHashUploadHandler while the file was
+    received when available, otherwise reads the file once.
+    """
+    content_hash = getattr(uploaded_file, 'content_hash', '')
+    if content_hash:
+        return content_hash
+    
+    digest = hashlib.sha256()
+    for data in uploaded_file.chunks(HASH_READ_SIZE):
+        digest.update(data)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def upload_blob_name(content_hash: str, filename: str) -> str:
+    """Return the content-addressed storage name for an upload."""
+    extension = os.path.splitext(filename)[1].lower()
+    return f"{UPLOAD_BLOB_DIR}/{content_hash[:2]}/{content_hash}{extension}"
+
+
+def store_upload(user, uploaded_file, filename: str, content_hash: str,
+                 archive_batch: bool = False) -> CSVUpload:
+    """
+    Create a CSVUpload whose file is stored by content.
+    
+    If a blob with the same content already exists (uploaded by anyone) it
+    is shared instead of storing another copy. The row count taken by
+    ContentHashUploadHandler, if any, is kept as file_rows.
+    
+    Args:
+        user: User the upload belongs to
+        uploaded_file: File object with the upload's content
+        filename: Original name of the uploaded file
+        content_hash: SHA-256 of the file content
+        archive_batch: Whether the file is a ZIP archive of several CSV files
+    
+    Returns:
+        The new, pending CSVUpload
+    """
+    csv_upload = CSVUpload(
+        user=user, filename=filename, content_hash=content_hash, archive_batch=archive_batch,
+        file_rows=getattr(uploaded_file, 'row_count', None)
+    )
+    storage = csv_upload.file.storage
+    name = upload_blob_name(content_hash, filename)
+    if not storage.exists(name):
+        name = storage.save(name, uploaded_file)
+    csv_upload.file = name
+    csv_upload.save()
+    bump_data_version(user.pk)
+    return csv_upload
+
+
+def store_workbook_uploads(user, uploaded_file, filename: str,
+                           content_hash: str) -> tuple[bool, List[CSVUpload], str]:
+    """
+    Store a workbook once and create one pending upload per worksheet.
+    
+    The sheets' uploads share the stored file and a batch_id, so they are
+    pruned together and can be ingested independently.
+    
+    Args:
+        user: User the uploads belong to
+        uploaded_file: File object with the workbook
+        filename: Original name of the workbook
+        content_hash: SHA-256 of the file content
+    
+    Returns:
+        Tuple of (success, csv_uploads, error_message)
+    """
+    first_upload = store_upload(user, uploaded_file, filename, content_hash)
+    try:
+        sheets = list_sheets(first_upload.file.path)
+    except Exception as e:
+        delete_upload_file(first_upload)
+        first_upload.delete()
+        bump_data_version(user.pk)
+        return False, [], f"Error reading workbook: {str(e)}"
+    
+    batch_id = uuid.uuid4()
+    first_upload.sheet_name = sheets[0]
+    first_upload.batch_id = batch_id
+    first_upload.save(update_fields=['sheet_name', 'batch_id'])
+    
+    csv_uploads = [first_upload]
+    for sheet_name in sheets[1:]:
+        csv_uploads.append(CSVUpload.objects.create(
+            user=user,
+            file=first_upload.file.name,
+            filename=filename,
+            content_hash=content_hash,
+            sheet_name=sheet_name,
+            batch_id=batch_id
+        ))
+    bump_data_version(user.pk)
+    return True, csv_uploads, ""
+
+
+def find_duplicate_upload(user, content_hash: str) -> CSVUpload:
+    """
+    Return the user's latest upload if it has identical content.
+    
+    Only the latest upload counts: once a different file has been ingested
+    its rows may have overwritten this content's, so it must be re-ingested.
+    
+    Returns:
+        CSVUpload instance (completed or still being ingested), or None
+    """
+    if not content_hash:
+        return None
+    latest = CSVUpload.objects.filter(user=user).exclude(
+        status=CSVUpload.STATUS_FAILED
+    ).order_by('-uploaded_at').first()
+    if latest is not None and latest.content_hash == content_hash:
+        return latest
+    return None
+
+
+def delete_upload_file(csv_upload: CSVUpload) -> None:
+    """
+    Delete an upload's stored file unless another upload still shares it.
+    """
+    if not csv_upload.file:
+        return
+    shared = CSVUpload.objects.filter(file=csv_upload.file.name).exclude(pk=csv_upload.pk).exists()
+    if not shared:
+        csv_upload.file.delete(save=False)
+
+
+def save_archive_members(csv_upload: CSVUpload, row_errors: RowErrorLog,
+                         progress_callback: Callable[[int], None] = None,
+                         metrics: IngestionMetrics = None) -> tuple[bool, tuple[int, int, int], str]:
+    """
+    Parse the CSV files of an archive batch concurrently and save them all into one upload.
+    
+    Files are saved in archive order, batch by batch. A file that
+    cannot be parsed or lacks the required columns is reported and
+    skipped; the others are still saved. Per-file results are stored in
+    csv_upload.member_results.
+    
+    Args:
+        csv_upload: CSVUpload of the archive
+        row_errors: RowErrorLog collecting rejected rows, tagged with their file
+        progress_callback: Optional callable receiving the rows saved so far
+        metrics: Optional IngestionMetrics timing the stages; parsing a file counts as reading
+    
+    Returns:
+        Tuple of (success, (created_count, updated_count, unchanged_count), error_message)
+    """
+    if metrics is None:
+        metrics = IngestionMetrics()
+    try:
+        member_names = list_csv_members(csv_upload.file.path)
+    except Exception as e:
+        return False, (0, 0, 0), f"Error reading archive: {str(e)}"
+    if not member_names:
+        return False, (0, 0, 0), "ZIP archive contains no CSV files."
+    if len(member_names) > settings.CSV_BATCH_MAX_FILES:
+        return False, (0, 0, 0), (
+            f"ZIP archive contains {len(member_names)} CSV files, "
+            f"at most {settings.CSV_BATCH_MAX_FILES} are accepted."
+        )
+    
+    totals = (0, 0, 0)
+    members = []
+    
+    def member_progress(rows):
+        progress_callback(sum(totals) + rows)
+    
+    parsed_members = _iter_archive_members(csv_upload.file.path, member_names, settings.CSV_PARSE_WORKERS)
+    while True:
+        with metrics.stage('read'):
+            parsed = next(parsed_members, None)
+        if parsed is None:
+            break
+        name, cleaned, error_msg = parsed
+        if cleaned is None:
+            members.append({'file': name, 'status': CSVUpload.STATUS_FAILED, 'error': error_msg})
+            continue
+        
+        metrics.add_rows('read', cleaned.source_rows)
+        metrics.add_rows('convert', cleaned.row_count)
+        row_errors.file = name
+        rejected_before = row_errors.rejected_rows
+        records = _cleaned_records(cleaned, FIRST_DATA_ROW, row_errors)
+        counts = save_equipment_from_csv(
+            csv_upload, records, row_errors=row_errors,
+            progress_callback=member_progress if progress_callback else None, metrics=metrics
+        )
+        totals = tuple(total + count for total, count in zip(totals, counts))
+        rejected_count = row_errors.rejected_rows - rejected_before
+        
+        member = {
+            'file': name,
+            'status': CSVUpload.STATUS_COMPLETED,
+            'created_count': counts[0],
+            'updated_count': counts[1],
+            'unchanged_count': counts[2],
+            'rejected_count': rejected_count,
+        }
+        if rejected_count and not sum(counts):
+            member.update(status=CSVUpload.STATUS_FAILED, error="No valid rows.")
+        members.append(member)
+    
+    row_errors.file = ''
+    csv_upload.member_results = members
+    if not any(member['status'] == CSVUpload.STATUS_COMPLETED for member in members):
+        return False, totals, "No CSV file in the archive could be processed."
+    return True, totals, ""
+
+
+# CSVUpload fields written by record_ingest_metrics
+INGEST_METRIC_FIELDS = ['stage_timings', 'ingest_seconds', 'rows_per_sec', 'peak_rss_bytes']
+
+
+def record_ingest_metrics(csv_upload: CSVUpload, metrics: IngestionMetrics, rows: int) -> None:
+    """
+    Copy the measurements of an ingestion onto its upload, without saving it.
+    
+    Args:
+        csv_upload: CSVUpload that was ingested
+        metrics: IngestionMetrics of the ingestion
+        rows: Rows saved, the numerator of rows_per_sec
+    """
+    csv_upload.stage_timings = metrics.stage_timings()
+    csv_upload.ingest_seconds = round(metrics.elapsed(), 4)
+    csv_upload.rows_per_sec = rows_per_second(rows, csv_upload.ingest_seconds)
+    csv_upload.peak_rss_bytes = metrics.peak_rss or None
+
+
+def ingest_csv_upload(csv_upload: CSVUpload,
+                      progress_callback: Callable[[int], None] = None,
+                      metrics: IngestionMetrics = None) -> tuple[bool, Dict[str, Any], str]:
+    """
+    Run the ingestion pipeline for a stored upload: parse, save and summarise.
+    
+    The upload's lifecycle status moves from processing to completed or
+    failed; on failure the error is stored on the upload as well. Rows
+    with values that cannot be stored are left out and the rest of the
+    file is saved; the rejected rows are stored on the upload as an error
+    report. An upload whose rows are all rejected fails. For an archive
+    batch, every CSV file of the ZIP archive is saved into the upload.
+    Per-stage timings, row counts, throughput and peak memory are stored
+    on the upload. Every status change bumps the user's data version.
+    
+    Rows are committed batch by batch and rows_processed is stored with
+    each batch. If a later batch fails, the rows already saved stay and
+    the upload is failed with rows_processed counting them; uploading
+    the file again finishes it, skipping the unchanged rows. Each batch
+    also refreshes heartbeat_at, which pruning uses to tell a live
+    ingestion from an abandoned one. If the upload was marked failed
+    meanwhile, the batch is rolled back and ingestion stops, leaving the
+    upload as pruning left it.
+    
+    Args:
+        csv_upload: CSVUpload instance whose file has been stored
+        progress_callback: Optional callable receiving the rows saved so far
+        metrics: Optional IngestionMetrics, e.g. with the time spent storing the file
+    
+    Returns:
+        Tuple of (success, result, error_message) where result holds
+        created_count, updated_count, unchanged_count, the DataSummary
+        instance, rejected_count, row_errors and, for archive batches, the
+        per-file members; on failure only the last three
+    """
+    csv_upload.status = CSVUpload.STATUS_PROCESSING
+    csv_upload.rows_processed = 0
+    csv_upload.heartbeat_at = timezone.now()
+    csv_upload.save(update_fields=['status', 'rows_processed', 'heartbeat_at'])
+    bump_data_version(csv_upload.user_id)
+    
+    def save_progress(rows):
+        # Runs in the batch's transaction, so it counts exactly the committed rows
+        running = CSVUpload.objects.filter(pk=csv_upload.pk, status=CSVUpload.STATUS_PROCESSING).update(
+            rows_processed=rows, heartbeat_at=timezone.now()
+        )
+        if not running:
+            raise IngestionAbandoned("Ingestion was stopped: the upload was marked failed meanwhile.")
+        csv_upload.rows_processed = rows
+        if progress_callback:
+            progress_callback(rows)
+    
+    row_errors = RowErrorLog()
+    if metrics is None:
+        metrics = IngestionMetrics()
+    metrics.restart()
+    
+    if csv_upload.archive_batch:
+        # Archive files are parsed whole by the worker pool while saving
+        success, error_msg = True, ""
+    else:
+        # Parse CSV file in streaming chunks, setting aside invalid rows
+        with metrics.stage('read'):
+            success, records, error_msg = stream_csv_file(
+                csv_upload.file.path, sheet_name=csv_upload.sheet_name, row_errors=row_errors,
+                metrics=metrics
+            )
+    
+    if success:
+        # Save equipment data chunk by chunk, committing each batch
+        try:
+            if csv_upload.archive_batch:
+                # Every CSV file of the archive goes into this upload, summarised once at the end
+                success, counts, error_msg = save_archive_members(
+                    csv_upload, row_errors, save_progress, metrics
+                )
+            else:
+                counts = save_equipment_from_csv(
+                    csv_upload, records, progress_callback=save_progress,
+                    row_errors=row_errors, metrics=metrics
+                )
+            created_count, updated_count, unchanged_count = counts
+        except CSVParseError as e:
+            success, error_msg = False, str(e)
+        except IngestionAbandoned as e:
+            # Its status and error were set by whoever failed it, and it may be deleted already
+            report = {'rejected_count': row_errors.rejected_rows, 'row_errors': row_errors.as_dicts()}
+            return False, report, str(e)
+    
+    if success and row_errors.rejected_rows and not created_count + updated_count + unchanged_count:
+        success = False
+        error_msg = f"No valid rows: all {row_errors.rejected_rows:,} rows were rejected."
+    
+    csv_upload.rejected_records = row_errors.rejected_rows
+    csv_upload.row_errors = row_errors.as_dicts()
+    report = {'rejected_count': csv_upload.rejected_records, 'row_errors': csv_upload.row_errors}
+    if csv_upload.archive_batch:
+        report['members'] = csv_upload.member_results
+    
+    if not success:
+        if csv_upload.rows_processed:
+            error_msg = (
+                f"{error_msg} The {csv_upload.rows_processed:,} rows saved before the error were kept; "
+                "upload the file again to finish, unchanged rows are skipped."
+            )
+        record_ingest_metrics(csv_upload, metrics, 0)
+        csv_upload.status = CSVUpload.STATUS_FAILED
+        csv_upload.error_message = error_msg
+        csv_upload.save(update_fields=[
+            'status', 'error_message', 'rejected_records', 'row_errors', 'member_results', *INGEST_METRIC_FIELDS
+        ])
+        bump_data_version(csv_upload.user_id)
+        return False, report, error_msg
+    
+    # Calculate summary statistics
+    with metrics.stage('summary'):
+        summary = calculate_summary_statistics(csv_upload)
+    metrics.add_rows('summary', created_count + updated_count + unchanged_count)
+    
+    # Update CSV upload record
+    csv_upload.status = CSVUpload.STATUS_COMPLETED
+    csv_upload.total_records = created_count + updated_count + unchanged_count
+    csv_upload.rows_processed = csv_upload.total_records
+    record_ingest_metrics(csv_upload, metrics, csv_upload.total_records)
+    csv_upload.save(update_fields=[
+        'status', 'total_records', 'rows_processed', 'rejected_records', 'row_errors', 'member_results',
+        *INGEST_METRIC_FIELDS
+    ])
+    bump_data_version(csv_upload.user_id)
+    
+    return True, {
+        'created_count': created_count,
+        'updated_count': updated_count,
+        'unchanged_count': unchanged_count,
+        'summary': summary,
+        **report,
+    }, ""
+
+
+# Stored file names checked for remaining references per query when pruning
+FILE_DELETE_BATCH_SIZE = 500
+
+
+def delete_unreferenced_files(names: Iterable[str]) -> None:
+    """
+    Delete stored upload files that no upload references any more.
+    
+    References are checked right before deleting, one query per batch of
+    FILE_DELETE_BATCH_SIZE names, so blobs shared with other uploads stay.
+    """
+    storage = CSVUpload._meta.get_field('file').storage
+    names = list(names)
+    for start in range(0, len(names), FILE_DELETE_BATCH_SIZE):
+        batch = names[start:start + FILE_DELETE_BATCH_SIZE]
+        in_use = set(CSVUpload.objects.filter(file__in=batch).values_list('file', flat=True))
+        for name in batch:
+            if name not in in_use:
+                storage.delete(name)
+
+
+def prune_old_uploads(user, keep: int = 5) -> None:
+    """
+    Keep only the last `keep` CSV uploads for a user, delete older ones.
+    
+    Uploads sharing a batch_id (the sheets of one workbook) count as one
+    and are kept or deleted together. Uploads still pending or processing
+    are never deleted, unless their ingestion has not reported progress
+    (heartbeat_at, or uploaded_at before it started) for more than
+    INGESTION_STALE_AFTER seconds: those were abandoned, e.g. by a
+    crashed worker, and are marked failed first. A live ingestion
+    refreshes its heartbeat with every batch, and stops at its next
+    batch if it is marked failed. Equipment, summaries and uploads are
+    removed with one set-based DELETE each, whatever the number of
+    uploads, and the files afterwards. Runs for the same user take a lock on the user row,
+    so concurrent runs queue up instead of interleaving. Deleting anything
+    bumps the user's data version.
+    
+    Args:
+        user: User (or user id) whose uploads should be pruned
+        keep: Number of most recent uploads to keep
+    """
+    user_id = getattr(user, 'pk', user)
+    
+    with transaction.atomic():
+        User.objects.select_for_update().filter(pk=user_id).first()
+        
+        stale_before = timezone.now() - timedelta(seconds=settings.INGESTION_STALE_AFTER)
+        abandoned = CSVUpload.objects.filter(
+            Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, uploaded_at__lt=stale_before),
+            user_id=user_id, status__in=UNFINISHED_STATUSES
+        ).update(
+            status=CSVUpload.STATUS_FAILED,
+            error_message='Ingestion was abandoned before it finished.'
+        )
+        if abandoned:
+            bump_data_version(user_id)
+        
+        user_uploads = CSVUpload.objects.filter(user_id=user_id).order_by('-uploaded_at')
+        kept_groups = set()
+        stale_groups = {}
+        busy_groups = set()
+        for upload_id, batch_id, upload_status in user_uploads.values_list('id', 'batch_id', 'status'):
+            group = batch_id or upload_id
+            if group not in kept_groups and len(kept_groups) < keep:
+                kept_groups.add(group)
+            if group in kept_groups:
+                continue
+            stale_groups.setdefault(group, []).append(upload_id)
+            if upload_status not in FINISHED_STATUSES:
+                busy_groups.add(group)
+        
+        # A sheet still being ingested keeps its whole workbook
+        stale_ids = [
+            upload_id for group, upload_ids in stale_groups.items()
+            if group not in busy_groups for upload_id in upload_ids
+        ]
+        
+        if not stale_ids:
+            return
+        
+        stale_uploads = CSVUpload.objects.filter(id__in=stale_ids)
+        file_names = set(stale_uploads.exclude(file='').values_list('file', flat=True))
+        Equipment.objects.filter(csv_upload_id__in=stale_ids).delete()
+        DataSummary.objects.filter(csv_upload_id__in=stale_ids).delete()
+        stale_uploads.delete()
+        bump_data_version(user_id)
+    
+    # Files go once the rows are gone, so a failed delete never leaves rows without files
+    delete_unreferenced_files(file_names)
+
+
 def generate_equipment_pdf(equipment_list: List[Equipment] = None, summary_data: Dict = None) -> BytesIO:
     """
     Generate PDF report for equipment data.
@@ -412,6 +1455,59 @@ def generate_equipment_pdf(equipment_list: List[Equipment] = None, summary_data:
     return buffer
 
 
+# Equipment shown in the flowrate chart
+FLOWRATE_CHART_SIZE = 20
+
+# Per-type partial aggregates of the dashboard bundle. Adding them up gives
+# the summary cards, and the per-type totals are the type distribution, so
+# one GROUP BY scan serves both.
+TYPE_METRICS = {
+    **{name: EQUIPMENT_METRICS[name] for name in [
+        'total_equipment', 'active_equipment', 'inactive_equipment', 'maintenance_equipment'
+    ]},
+    **{f'{field}_sum': Sum(field) for field in SUMMARY_NUMERIC_FIELDS},
+    **{f'{field}_count': Count(field) for field in SUMMARY_NUMERIC_FIELDS},
+}
+
+
+def flowrate_chart(queryset) -> Dict[str, List]:
+    """Return the flowrate chart of an equipment queryset: its active equipment with the highest flowrates."""
+    top = queryset.filter(flowrate__isnull=False, status='Active').order_by('-flowrate').values_list(
+        'equipment_id', 'flowrate'
+    )[:FLOWRATE_CHART_SIZE]
+    
+    return {
+        'equipment_ids': [equipment_id for equipment_id, _ in top],
+        'flowrates': [float(flowrate) for _, flowrate in top]
+    }
+
+
+def type_distribution(type_counts: Iterable[tuple]) -> Dict[str, List]:
+    """Return the type distribution chart for (type, count) pairs: largest count first, ties by type."""
+    type_counts = sorted(type_counts, key=lambda pair: (-pair[1], pair[0]))
+    total = sum(count for _, count in type_counts)
+    
+    return {
+        'types': [equipment_type for equipment_type, _ in type_counts],
+        'counts': [count for _, count in type_counts],
+        'percentages': [round((count / total * 100), 2) if total > 0 else 0 for _, count in type_counts]
+    }
+
+
+def summary_cards(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the dashboard cards for DASHBOARD_METRICS values, with averages rounded."""
+    return {
+        'total_equipment': stats['total_equipment'],
+        'active_equipment': stats['active_equipment'],
+        'inactive_equipment': stats['inactive_equipment'],
+        'maintenance_equipment': stats['maintenance_equipment'],
+        'avg_flowrate': round(stats['avg_flowrate'], 2) if stats['avg_flowrate'] else None,
+        'avg_pressure': round(stats['avg_pressure'], 2) if stats['avg_pressure'] else None,
+        'avg_temperature': round(stats['avg_temperature'], 2) if stats['avg_temperature'] else None,
+        'total_types': stats['total_types']
+    }
+
+
 def get_flowrate_chart_data(csv_upload_id: int = None, user=None) -> Dict[str, List]:
     """
     Get data for flowrate chart visualization.
@@ -423,29 +1519,7 @@ def get_flowrate_chart_data(csv_upload_id: int = None, user=None) -> Dict[str, L
     Returns:
         Dictionary with equipment_ids and flowrates
     """
-    # Filter by user's CSV uploads
-    if user:
-        user_csv_uploads = CSVUpload.objects.filter(user=user)
-        queryset = Equipment.objects.filter(
-            csv_upload__in=user_csv_uploads,
-            flowrate__isnull=False,
-            status='Active'
-        )
-    else:
-        queryset = Equipment.objects.filter(
-            flowrate__isnull=False,
-            status='Active'
-        )
-    
-    if csv_upload_id:
-        queryset = queryset.filter(csv_upload_id=csv_upload_id)
-    
-    equipment = queryset.order_by('-flowrate')[:20]
-    
-    return {
-        'equipment_ids': [e.equipment_id for e in equipment],
-        'flowrates': [float(e.flowrate) for e in equipment]
-    }
+    return flowrate_chart(user_equipment(user, csv_upload_id))
 
 
 def get_type_distribution_data(csv_upload_id: int = None, user=None) -> Dict[str, List]:
@@ -459,36 +1533,16 @@ def get_type_distribution_data(csv_upload_id: int = None, user=None) -> Dict[str
     Returns:
         Dictionary with types, counts, and percentages
     """
-    # Filter by user's CSV uploads
-    if user:
-        user_csv_uploads = CSVUpload.objects.filter(user=user)
-        queryset = Equipment.objects.filter(csv_upload__in=user_csv_uploads)
-    else:
-        queryset = Equipment.objects.all()
-    
-    if csv_upload_id:
-        queryset = queryset.filter(csv_upload_id=csv_upload_id)
-    
-    type_data = queryset.values('equipment_type').annotate(
+    type_data = user_equipment(user, csv_upload_id).values('equipment_type').annotate(
         count=Count('id')
-    ).order_by('-count')
-    
-    total = sum(item['count'] for item in type_data)
+    ).order_by()
     
-    types = [item['equipment_type'] for item in type_data]
-    counts = [item['count'] for item in type_data]
-    percentages = [round((item['count'] / total * 100), 2) if total > 0 else 0 for item in type_data]
-    
-    return {
-        'types': types,
-        'counts': counts,
-        'percentages': percentages
-    }
+    return type_distribution([(item['equipment_type'], item['count']) for item in type_data])
 
 
 def get_dashboard_summary(user=None) -> Dict[str, Any]:
     """
-    Get summary data for dashboard cards.
+    Get summary data for dashboard cards, computed by a single query.
     
     Args:
         user: User instance to filter by
@@ -496,34 +1550,42 @@ def get_dashboard_summary(user=None) -> Dict[str, Any]:
     Returns:
         Dictionary with summary statistics
     """
-    # Filter by user's CSV uploads
-    if user:
-        user_csv_uploads = CSVUpload.objects.filter(user=user)
-        equipment_queryset = Equipment.objects.filter(csv_upload__in=user_csv_uploads)
-    else:
-        equipment_queryset = Equipment.objects.all()
+    return summary_cards(aggregate_equipment_metrics(user_equipment(user), DASHBOARD_METRICS))
+
+
+def get_dashboard_bundle(user=None, csv_upload_id: int = None) -> Dict[str, Any]:
+    """
+    Get the summary cards, type distribution and flowrate chart of the dashboard together.
     
-    total_equipment = equipment_queryset.count()
-    active_equipment = equipment_queryset.filter(status='Active').count()
-    inactive_equipment = equipment_queryset.filter(status='Inactive').count()
-    maintenance_equipment = equipment_queryset.filter(status='Maintenance').count()
+    All three come from one filtered base queryset. The cards and the type
+    distribution are added up from a single GROUP BY over equipment types;
+    the flowrate chart is one more query for the top rows.
     
-    stats = equipment_queryset.aggregate(
-        avg_flowrate=Avg('flowrate'),
-        avg_pressure=Avg('pressure'),
-        avg_temperature=Avg('temperature')
-    )
+    Args:
+        user: User instance to filter by
+        csv_upload_id: Optional CSV upload ID to filter by
     
-    total_types = equipment_queryset.values('equipment_type').distinct().count()
+    Returns:
+        Dictionary with 'summary', 'type_distribution' and 'flowrate_chart',
+        each as returned by the separate dashboard functions
+    """
+    base = user_equipment(user, csv_upload_id)
+    groups = list(base.values('equipment_type').annotate(**TYPE_METRICS).order_by())
+    
+    stats = {
+        name: sum(group[name] for group in groups)
+        for name in ['total_equipment', 'active_equipment', 'inactive_equipment', 'maintenance_equipment']
+    }
+    for field in SUMMARY_NUMERIC_FIELDS:
+        count = sum(group[f'{field}_count'] for group in groups)
+        total = math.fsum(group[f'{field}_sum'] or 0 for group in groups)
+        stats[f'avg_{field}'] = total / count if count else None
+    stats['total_types'] = len(groups)
     
     return {
-        'total_equipment': total_equipment,
-        'active_equipment': active_equipment,
-        'inactive_equipment': inactive_equipment,
-        'maintenance_equipment': maintenance_equipment,
-        'avg_flowrate': round(stats['avg_flowrate'], 2) if stats['avg_flowrate'] else None,
-        'avg_pressure': round(stats['avg_pressure'], 2) if stats['avg_pressure'] else None,
-        'avg_temperature': round(stats['avg_temperature'], 2) if stats['avg_temperature'] else None,
-        'total_types': total_types
+        'summary': summary_cards(stats),
+        'type_distribution': type_distribution(
+            [(group['equipment_type'], group['total_equipment']) for group in groups]
+        ),
+        'flowrate_chart': flowrate_chart(base),
     }
-
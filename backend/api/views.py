@@ -1,31 +1,268 @@
 """
 API views for chemical equipment data management.
 """
-from rest_framework import viewsets, status
+import csv
+import logging
+from io import BytesIO
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
 from django.db.models import Q
 from django.http import HttpResponse
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 from django.utils.decorators import method_decorator
-from .models import Equipment, CSVUpload, DataSummary
+from .models import Equipment, CSVUpload, DataSummary, UploadSession
 from .serializers import (
     EquipmentSerializer, EquipmentListSerializer, CSVUploadSerializer,
     DataSummarySerializer, FileUploadSerializer, FlowrateChartSerializer,
-    TypeDistributionSerializer, SummaryCardsSerializer, UserSerializer, RegisterSerializer
+    TypeDistributionSerializer, SummaryCardsSerializer, UserSerializer, RegisterSerializer,
+    IngestionJobSerializer, UploadSessionSerializer, DashboardBundleSerializer
 )
+from .chunked_upload import (
+    AssembledFile, assemble_chunks, discard_session_files, received_chunks, write_chunk
+)
+from .conditional import conditional_per_user
+from .dashboard_cache import bump_all_data_versions, bump_data_version, cache_stats, cached_per_user
+from .jobs import database_writes, schedule_pruning, submit_ingestion
+from .metrics import IngestionMetrics
+from .upload_handlers import PreviewMultiPartParser
+from .workbook import is_workbook
 from .utils import (
-    parse_csv_file, save_equipment_from_csv, calculate_summary_statistics,
-    generate_equipment_pdf, get_flowrate_chart_data, get_type_distribution_data,
-    get_dashboard_summary
+    ingest_csv_upload, preview_upload, generate_equipment_pdf, calculate_summary_statistics,
+    compute_content_hash, find_duplicate_upload, store_upload, store_workbook_uploads, delete_upload_file,
+    get_flowrate_chart_data, get_type_distribution_data, get_dashboard_summary, get_dashboard_bundle,
+    user_equipment
 )
 
 
+logger = logging.getLogger(__name__)
+
+# Row errors included in upload responses; the full report is a CSV download
+ROW_ERROR_PREVIEW = 20
+
+# Largest nrows accepted by the upload preview
+PREVIEW_MAX_ROWS = 1000
+
+
+def error_report(csv_upload, with_url=True):
+    """Build the rejected-row fields of an upload response, plus per-file results of archive batches."""
+    data = {'rejected_count': csv_upload.rejected_records}
+    if csv_upload.rejected_records:
+        data['row_errors'] = csv_upload.row_errors[:ROW_ERROR_PREVIEW]
+        if with_url:
+            data['error_report_url'] = reverse('api:csv-upload-errors', kwargs={'pk': csv_upload.id})
+    if csv_upload.archive_batch:
+        data['members'] = csv_upload.member_results
+    return data
+
+
+def ingest_metrics(csv_upload):
+    """Build the timing fields of an upload response: per-stage time and rows, throughput and peak memory."""
+    return {
+        'ingest_seconds': csv_upload.ingest_seconds,
+        'rows_per_sec': csv_upload.rows_per_sec,
+        'peak_rss_bytes': csv_upload.peak_rss_bytes,
+        'stages': csv_upload.stage_timings,
+    }
+
+
+def job_accepted_response(csv_upload, message):
+    """Build the 202 response pointing at an upload's background job."""
+    return Response({
+        'message': message,
+        'job_id': csv_upload.id,
+        'csv_upload_id': csv_upload.id,
+        'filename': csv_upload.filename,
+        'status': csv_upload.status,
+        'status_url': reverse('api:csv-upload-job-status', kwargs={'job_id': csv_upload.id}),
+    }, status=status.HTTP_202_ACCEPTED)
+
+
+def duplicate_upload_response(csv_upload):
+    """
+    Report an identical upload that was already ingested instead of ingesting it again.
+    """
+    if csv_upload.status != CSVUpload.STATUS_COMPLETED:
+        return job_accepted_response(csv_upload, 'Identical CSV file is already being processed')
+    
+    try:
+        summary = csv_upload.summary
+    except DataSummary.DoesNotExist:
+        summary = calculate_summary_statistics(csv_upload)
+    
+    return Response({
+        'message': 'Identical CSV file already processed',
+        'duplicate': True,
+        'csv_upload_id': csv_upload.id,
+        'filename': csv_upload.filename,
+        'created_count': 0,
+        'updated_count': 0,
+        'unchanged_count': csv_upload.total_records,
+        'total_records': csv_upload.total_records,
+        **error_report(csv_upload),
+        'summary': DataSummarySerializer(summary).data
+    }, status=status.HTTP_200_OK)
+
+
+def wants_async(request):
+    """Return True if the client asked for background processing."""
+    run_async = request.query_params.get('async', request.data.get('async', ''))
+    return str(run_async).lower() in ('1', 'true', 'yes')
+
+
+def process_upload(request, csv_upload, metrics=None):
+    """
+    Run the ingestion pipeline for a stored upload and build the API response.
+    Shared by direct uploads and finalized chunked uploads; metrics holds
+    the stages timed while the file was stored.
+    """
+    # Optionally hand the pipeline to the background worker pool
+    if wants_async(request):
+        submit_ingestion(csv_upload, metrics)
+        return job_accepted_response(csv_upload, 'CSV file accepted for processing')
+    
+    # Parse, save and summarise within the request
+    try:
+        with database_writes():
+            success, result, error_msg = ingest_csv_upload(csv_upload, metrics=metrics)
+    except Exception as e:
+        # Leave a failed upload behind rather than one processing forever
+        logger.exception("Ingestion of upload %s failed", csv_upload.pk)
+        error_msg = f"Error processing CSV file: {str(e)}"
+        CSVUpload.objects.filter(pk=csv_upload.pk).update(
+            status=CSVUpload.STATUS_FAILED, error_message=error_msg
+        )
+        bump_data_version(csv_upload.user_id)
+        return Response(
+            {'error': error_msg, 'csv_upload_id': csv_upload.id},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    if not success:
+        delete_upload_file(csv_upload)
+        if csv_upload.rows_processed:
+            # Rows saved before the error are committed, keep the failed upload that owns them
+            data = {
+                'error': error_msg,
+                'csv_upload_id': csv_upload.id,
+                'rows_processed': csv_upload.rows_processed,
+                **error_report(csv_upload),
+            }
+        else:
+            csv_upload.delete()
+            bump_data_version(csv_upload.user_id)
+            data = {'error': error_msg, **error_report(csv_upload, with_url=False)}
+        return Response(
+            {**data, 'metrics': ingest_metrics(csv_upload)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    # Keep only the last 5 CSV uploads per user, older ones are deleted in the background
+    schedule_pruning(request.user, csv_upload)
+    
+    return Response({
+        'message': 'CSV file processed successfully',
+        'csv_upload_id': csv_upload.id,
+        'filename': csv_upload.filename,
+        'created_count': result['created_count'],
+        'updated_count': result['updated_count'],
+        'unchanged_count': result['unchanged_count'],
+        'total_records': csv_upload.total_records,
+        **error_report(csv_upload),
+        'summary': DataSummarySerializer(result['summary']).data,
+        'metrics': ingest_metrics(csv_upload),
+    }, status=status.HTTP_201_CREATED)
+
+
+def process_workbook(request, csv_uploads):
+    """
+    Ingest the per-sheet uploads of a workbook concurrently and build the API response.
+    
+    Sheets run as jobs on the ingestion worker pool, one after another on
+    databases with a single writer such as SQLite. Without async the
+    request waits for all of them and reports each sheet; failed sheets
+    are removed like failed CSV uploads.
+    """
+    batch_id = csv_uploads[0].batch_id
+    filename = csv_uploads[0].filename
+    futures = [(csv_upload, submit_ingestion(csv_upload)) for csv_upload in csv_uploads]
+    
+    if wants_async(request):
+        return Response({
+            'message': 'Workbook accepted for processing',
+            'batch_id': batch_id,
+            'filename': filename,
+            'jobs': [{
+                'sheet_name': csv_upload.sheet_name,
+                'job_id': csv_upload.id,
+                'status': csv_upload.status,
+                'status_url': reverse('api:csv-upload-job-status', kwargs={'job_id': csv_upload.id}),
+            } for csv_upload, _ in futures],
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    sheets = []
+    totals = {
+        'created_count': 0, 'updated_count': 0, 'unchanged_count': 0, 'total_records': 0, 'rejected_count': 0
+    }
+    for csv_upload, future in futures:
+        result = future.result()
+        csv_upload.refresh_from_db()
+        if result is None:
+            sheets.append({
+                'sheet_name': csv_upload.sheet_name,
+                'status': CSVUpload.STATUS_FAILED,
+                'error': csv_upload.error_message,
+                **error_report(csv_upload, with_url=False),
+            })
+            delete_upload_file(csv_upload)
+            if csv_upload.rows_processed:
+                # Keep the failed sheet that owns the rows saved before its error
+                sheets[-1].update(csv_upload_id=csv_upload.id, rows_processed=csv_upload.rows_processed)
+            else:
+                csv_upload.delete()
+                bump_data_version(csv_upload.user_id)
+            continue
+        
+        sheet = {
+            'sheet_name': csv_upload.sheet_name,
+            'csv_upload_id': csv_upload.id,
+            'status': csv_upload.status,
+            'created_count': result['created_count'],
+            'updated_count': result['updated_count'],
+            'unchanged_count': result['unchanged_count'],
+            'total_records': csv_upload.total_records,
+            **error_report(csv_upload),
+            'summary': DataSummarySerializer(result['summary']).data,
+            'metrics': ingest_metrics(csv_upload),
+        }
+        for key in totals:
+            totals[key] += sheet[key]
+        sheets.append(sheet)
+    
+    if not any(sheet['status'] == CSVUpload.STATUS_COMPLETED for sheet in sheets):
+        return Response(
+            {'error': 'No sheet of the workbook could be processed', 'sheets': sheets},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    return Response({
+        'message': 'Workbook processed successfully',
+        'batch_id': batch_id,
+        'filename': filename,
+        **totals,
+        'sheets': sheets,
+    }, status=status.HTTP_201_CREATED)
+
+
+@method_decorator(conditional_per_user, name='list')
+@method_decorator(conditional_per_user, name='retrieve')
 class EquipmentViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Equipment CRUD operations.
@@ -41,6 +278,20 @@ class EquipmentViewSet(viewsets.ModelViewSet):
             return EquipmentListSerializer
         return EquipmentSerializer
     
+    # Only the user's own equipment can be changed, so only their data version moves
+    def perform_create(self, serializer):
+        serializer.save()
+        bump_data_version(self.request.user.pk)
+    
+    def perform_update(self, serializer):
+        # Manual edits no longer match the ingested values, so the next sync rewrites the row
+        serializer.save(fingerprint='')
+        bump_data_version(self.request.user.pk)
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump_data_version(self.request.user.pk)
+    
     def get_queryset(self):
         """
         Filter queryset based on query parameters and user.
@@ -49,18 +300,13 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             return Equipment.objects.none()
         
-        # Filter by user's CSV uploads
-        user_csv_uploads = CSVUpload.objects.filter(user=self.request.user)
-        queryset = Equipment.objects.filter(csv_upload__in=user_csv_uploads)
+        # Filter by the user's equipment
+        queryset = Equipment.objects.filter(owner=self.request.user)
         
-        # Filter by CSV upload
+        # Filter by CSV upload; another user's upload matches none of the user's equipment
         csv_upload_id = self.request.query_params.get('csv_upload', None)
         if csv_upload_id:
-            # Ensure the CSV upload belongs to the user
-            if user_csv_uploads.filter(id=csv_upload_id).exists():
-                queryset = queryset.filter(csv_upload_id=csv_upload_id)
-            else:
-                queryset = queryset.none()
+            queryset = queryset.filter(csv_upload_id=csv_upload_id)
         
         # Filter by equipment type
         equipment_type = self.request.query_params.get('type', None)
@@ -83,10 +329,12 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         return queryset.order_by('equipment_id')
     
     @action(detail=False, methods=['get'])
+    @method_decorator(conditional_per_user)
     def types(self, request):
         """Get list of unique equipment types for the authenticated user."""
-        user_csv_uploads = CSVUpload.objects.filter(user=request.user)
-        types = Equipment.objects.filter(csv_upload__in=user_csv_uploads).values_list('equipment_type', flat=True).distinct()
+        types = Equipment.objects.filter(owner=request.user).order_by('equipment_type').values_list(
+            'equipment_type', flat=True
+        ).distinct()
         return Response({'types': list(types)})
     
     @action(detail=False, methods=['get'])
@@ -96,6 +344,8 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         return Response({'statuses': statuses})
 
 
+@method_decorator(conditional_per_user, name='list')
+@method_decorator(conditional_per_user, name='retrieve')
 class CSVUploadViewSet(viewsets.ModelViewSet):
     """
     ViewSet for CSV upload management.
@@ -116,12 +366,25 @@ class CSVUploadViewSet(viewsets.ModelViewSet):
         
         return CSVUpload.objects.filter(user=self.request.user).order_by('-uploaded_at')[:5]
     
+    def perform_update(self, serializer):
+        csv_upload = serializer.save()
+        bump_data_version(csv_upload.user_id)
+    
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump_data_version(instance.user_id)
+    
     def create(self, request, *args, **kwargs):
         """
         Handle CSV file upload and processing.
         """
         file_serializer = FileUploadSerializer(data=request.data)
         
+        # ContentHashUploadHandler stops receiving a CSV file whose header lacks required columns
+        upload_error = getattr(request, 'upload_error', '')
+        if upload_error:
+            return Response({'error': upload_error}, status=status.HTTP_400_BAD_REQUEST)
+        
         if not file_serializer.is_valid():
             return Response(
                 file_serializer.errors,
@@ -129,70 +392,124 @@ class CSVUploadViewSet(viewsets.ModelViewSet):
             )
         
         uploaded_file = file_serializer.validated_data['file']
+        metrics = IngestionMetrics()
+        with metrics.stage('store'):
+            content_hash = compute_content_hash(uploaded_file)
         
-        # Create CSVUpload record associated with the user
-        csv_upload = CSVUpload.objects.create(
-            user=self.request.user,
-            file=uploaded_file,
-            filename=uploaded_file.name
-        )
+        # Each worksheet of a workbook becomes its own upload
+        if is_workbook(uploaded_file.name):
+            success, csv_uploads, error_msg = store_workbook_uploads(
+                request.user, uploaded_file, uploaded_file.name, content_hash
+            )
+            if not success:
+                return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+            return process_workbook(request, csv_uploads)
         
-        # Parse CSV file
-        success, data_list, error_msg = parse_csv_file(csv_upload.file.path)
+        # Re-uploading the latest file again returns its existing results
+        duplicate = find_duplicate_upload(request.user, content_hash)
+        if duplicate is not None:
+            return duplicate_upload_response(duplicate)
         
-        if not success:
-            csv_upload.delete()
+        # Create CSVUpload record associated with the user, stored by content
+        with metrics.stage('store'):
+            csv_upload = store_upload(request.user, uploaded_file, uploaded_file.name, content_hash)
+        
+        return process_upload(request, csv_upload, metrics)
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Handle a ZIP archive of many CSV files, ingested together into one upload.
+        """
+        file_serializer = FileUploadSerializer(data=request.data)
+        
+        if not file_serializer.is_valid():
             return Response(
-                {'error': error_msg},
+                file_serializer.errors,
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Save equipment data
-        created_count, updated_count = save_equipment_from_csv(csv_upload, data_list)
+        uploaded_file = file_serializer.validated_data['file']
+        if not uploaded_file.name.lower().endswith('.zip'):
+            return Response(
+                {'error': 'Batch uploads must be ZIP archives of CSV files'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        metrics = IngestionMetrics()
+        with metrics.stage('store'):
+            content_hash = compute_content_hash(uploaded_file)
         
-        # Calculate summary statistics
-        summary = calculate_summary_statistics(csv_upload)
+        duplicate = find_duplicate_upload(request.user, content_hash)
+        if duplicate is not None and duplicate.archive_batch:
+            return duplicate_upload_response(duplicate)
         
-        # Update CSV upload record
-        csv_upload.processed = True
-        csv_upload.total_records = created_count + updated_count
-        csv_upload.save()
-        
-        # Keep only the last 5 CSV uploads per user, delete older ones
-        user_uploads = CSVUpload.objects.filter(user=self.request.user).order_by('-uploaded_at')
-        total_count = user_uploads.count()
-        if total_count > 5:
-            # Get IDs of uploads to keep (first 5, which are the most recent)
-            keep_ids = list(user_uploads[:5].values_list('id', flat=True))
-            # Get all uploads that should be deleted (older than the 5th most recent)
-            old_uploads = CSVUpload.objects.filter(user=self.request.user).exclude(id__in=keep_ids)
-            
-            # Delete associated data for each old upload
-            for old_upload in old_uploads:
-                # Delete associated equipment (CASCADE will handle it, but explicit for clarity)
-                old_upload.equipment.all().delete()
-                # Delete summary if it exists
-                try:
-                    old_upload.summary.delete()
-                except DataSummary.DoesNotExist:
-                    pass
-                # Delete the file from storage
-                if old_upload.file:
-                    old_upload.file.delete(save=False)
-                # Delete the CSV upload record
-                old_upload.delete()
+        with metrics.stage('store'):
+            csv_upload = store_upload(
+                request.user, uploaded_file, uploaded_file.name, content_hash, archive_batch=True
+            )
         
-        return Response({
-            'message': 'CSV file processed successfully',
-            'csv_upload_id': csv_upload.id,
-            'filename': csv_upload.filename,
-            'created_count': created_count,
-            'updated_count': updated_count,
-            'total_records': csv_upload.total_records,
-            'summary': DataSummarySerializer(summary).data
-        }, status=status.HTTP_201_CREATED)
+        return process_upload(request, csv_upload, metrics)
+    
+    @action(detail=False, methods=['post'], parser_classes=[PreviewMultiPartParser])
+    def preview(self, request):
+        """
+        Show how the first rows of a CSV file would be mapped, without storing anything.
+        Only the beginning of the file is received, so clients may send just that.
+        """
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is None:
+            return Response({'error': 'No file was submitted.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            nrows = int(request.query_params.get('nrows', request.data.get('nrows', settings.CSV_PREVIEW_ROWS)))
+        except (TypeError, ValueError):
+            nrows = 0
+        if not 1 <= nrows <= PREVIEW_MAX_ROWS:
+            return Response(
+                {'error': f'nrows must be a number from 1 to {PREVIEW_MAX_ROWS}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        success, preview, error_msg = preview_upload(uploaded_file, nrows)
+        if not success:
+            return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'filename': uploaded_file.name, **preview}, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'], url_path=r'jobs/(?P<job_id>[^/.]+)', url_name='job-status')
+    def job_status(self, request, job_id=None):
+        """Get the state of a background ingestion job."""
+        csv_upload = CSVUpload.objects.filter(user=request.user, id=job_id).first()
+        if csv_upload is None:
+            return Response(
+                {'error': 'Job not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        return Response(IngestionJobSerializer(csv_upload).data)
     
     @action(detail=True, methods=['get'])
+    def errors(self, request, pk=None):
+        """Download the rejected rows of an upload as a CSV error report."""
+        csv_upload = CSVUpload.objects.filter(user=request.user, id=pk).first()
+        if csv_upload is None:
+            return Response(
+                {'error': 'Not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="upload_{csv_upload.id}_errors.csv"'
+        fieldnames = ['row', 'column', 'value', 'message']
+        if csv_upload.archive_batch:
+            fieldnames.insert(0, 'file')
+        writer = csv.DictWriter(response, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(csv_upload.row_errors)
+        return response
+    
+    @action(detail=True, methods=['get'])
+    @method_decorator(conditional_per_user)
     def equipment(self, request, pk=None):
         """Get all equipment from a specific CSV upload."""
         csv_upload = self.get_object()
@@ -207,6 +524,7 @@ class CSVUploadViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     @action(detail=True, methods=['get'])
+    @method_decorator(conditional_per_user)
     def summary(self, request, pk=None):
         """Get summary statistics for a specific CSV upload."""
         csv_upload = self.get_object()
@@ -227,8 +545,139 @@ class CSVUploadViewSet(viewsets.ModelViewSet):
             )
 
 
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    ViewSet for resumable chunked uploads.
+    Initiate a session, PUT numbered chunks with a SHA-256 checksum, then finalize.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """
+        Return only the authenticated user's upload sessions.
+        """
+        # Handle Swagger schema generation (user is AnonymousUser)
+        if not self.request.user.is_authenticated:
+            return UploadSession.objects.none()
+        
+        return UploadSession.objects.filter(user=self.request.user)
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+    
+    def perform_destroy(self, instance):
+        discard_session_files(instance)
+        instance.delete()
+    
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<index>\d+)', url_name='chunk')
+    def upload_chunk(self, request, pk=None, index=None):
+        """Store one chunk; the raw request body is the chunk data."""
+        session = self.get_object()
+        index = int(index)
+        
+        if session.csv_upload_id:
+            return Response(
+                {'error': 'Upload session has already been finalized'},
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        if index >= session.total_chunks:
+            return Response(
+                {'error': f'Chunk index must be between 0 and {session.total_chunks - 1}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        checksum = request.headers.get('X-Chunk-SHA256', '')
+        if not checksum:
+            return Response(
+                {'error': 'X-Chunk-SHA256 header is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        success, size, error_msg = write_chunk(session, index, request.stream or BytesIO(), checksum)
+        if not success:
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({
+            'index': index,
+            'size': size,
+            'received_chunks': received_chunks(session),
+        })
+    
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        """Assemble the received chunks and process the complete file."""
+        session = self.get_object()
+        
+        # A retried finalize (e.g. after a dropped response) reports the existing upload
+        if session.csv_upload_id:
+            csv_upload = session.csv_upload
+            return Response({
+                'message': 'Upload session has already been finalized',
+                'csv_upload_id': csv_upload.id,
+                'filename': csv_upload.filename,
+                'status': csv_upload.status,
+                'total_records': csv_upload.total_records,
+            })
+        
+        success, assembled_path, content_hash, error_msg = assemble_chunks(
+            session, request.data.get('sha256', '')
+        )
+        if not success:
+            return Response(
+                {'error': error_msg},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if is_workbook(session.filename):
+            with open(assembled_path, 'rb') as assembled_file:
+                success, csv_uploads, error_msg = store_workbook_uploads(
+                    request.user,
+                    AssembledFile(assembled_file, name=session.filename),
+                    session.filename,
+                    content_hash
+                )
+            discard_session_files(session)
+            if not success:
+                return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+            session.csv_upload = csv_uploads[0]
+            session.save(update_fields=['csv_upload', 'updated_at'])
+            return process_workbook(request, csv_uploads)
+        
+        duplicate = find_duplicate_upload(request.user, content_hash)
+        if duplicate is not None:
+            discard_session_files(session)
+            # Link the session so a retried finalize reports the same upload
+            if not UploadSession.objects.filter(csv_upload=duplicate).exists():
+                session.csv_upload = duplicate
+                session.save(update_fields=['csv_upload', 'updated_at'])
+            return duplicate_upload_response(duplicate)
+        
+        # Move the assembled file into upload storage and hand it to the pipeline
+        metrics = IngestionMetrics()
+        with metrics.stage('store'), open(assembled_path, 'rb') as assembled_file:
+            csv_upload = store_upload(
+                request.user,
+                AssembledFile(assembled_file, name=session.filename),
+                session.filename,
+                content_hash
+            )
+        discard_session_files(session)
+        session.csv_upload = csv_upload
+        session.save(update_fields=['csv_upload', 'updated_at'])
+        
+        return process_upload(request, csv_upload, metrics)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_per_user
+@cached_per_user('summary')
 def dashboard_summary(request):
     """
     Get summary statistics for dashboard cards.
@@ -241,6 +690,8 @@ def dashboard_summary(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_per_user
+@cached_per_user('flowrate_chart', ['csv_upload'])
 def flowrate_chart_data(request):
     """
     Get data for flowrate chart visualization.
@@ -255,6 +706,8 @@ def flowrate_chart_data(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_per_user
+@cached_per_user('type_distribution', ['csv_upload'])
 def type_distribution_data(request):
     """
     Get data for equipment type distribution chart.
@@ -267,6 +720,31 @@ def type_distribution_data(request):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional_per_user
+@cached_per_user('bundle', ['csv_upload'])
+def dashboard_bundle(request):
+    """
+    Get the dashboard summary cards, type distribution and flowrate chart in one response.
+    """
+    csv_upload_id = request.query_params.get('csv_upload', None)
+    csv_upload_id = int(csv_upload_id) if csv_upload_id else None
+    bundle = get_dashboard_bundle(user=request.user, csv_upload_id=csv_upload_id)
+    serializer = DashboardBundleSerializer(data=bundle)
+    serializer.is_valid()
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_cache_stats(request):
+    """
+    Get the hit and miss counters of the dashboard response cache in this server process.
+    """
+    return Response(cache_stats())
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def generate_report(request):
@@ -278,8 +756,7 @@ def generate_report(request):
     equipment_status = request.data.get('status', None)
     
     # Build queryset - filter by user's CSV uploads
-    user_csv_uploads = CSVUpload.objects.filter(user=request.user)
-    queryset = Equipment.objects.filter(csv_upload__in=user_csv_uploads)
+    queryset = user_equipment(request.user)
     
     if equipment_type:
         queryset = queryset.filter(equipment_type=equipment_type)
@@ -313,6 +790,7 @@ def clear_all_data(request):
     Equipment.objects.all().delete()
     CSVUpload.objects.all().delete()
     DataSummary.objects.all().delete()
+    bump_all_data_versions()
     
     return Response({
         'message': 'All data cleared successfully',
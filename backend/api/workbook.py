@@ -0,0 +1,106 @@
+"""
+Streaming reading of Excel workbooks.
+
+Workbooks are opened with openpyxl's read-only mode, which parses the
+sheet XML as it is iterated instead of loading every cell, and rows are
+handed out as DataFrames of a bounded number of rows. Each sheet is
+ingested as its own upload.
+"""
+import os
+from itertools import islice
+from typing import Iterator, List
+import pandas as pd
+from openpyxl import load_workbook
+
+# File name suffixes of workbook uploads
+WORKBOOK_SUFFIXES = ('.xlsx',)
+
+
+def is_workbook(name: str) -> bool:
+    """Return True if a file name denotes an Excel workbook upload."""
+    return os.path.splitext(name)[1].lower() in WORKBOOK_SUFFIXES
+
+
+def list_sheets(file_path: str) -> List[str]:
+    """Return the names of a workbook's worksheets, in workbook order."""
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _header(row: tuple) -> tuple[List[int], List[str]]:
+    """
+    Return the positions and names of the non-empty header cells.
+    Repeated names get a '.1', '.2', ... suffix like pandas.read_csv gives them.
+    """
+    positions = [i for i, value in enumerate(row) if value is not None and str(value).strip()]
+    columns = []
+    seen = {}
+    for i in positions:
+        name = str(row[i]).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return positions, columns
+
+
+def read_sheet_columns(file_path: str, sheet_name: str) -> List[str]:
+    """
+    Return the column names from the first row of a sheet.
+    
+    Args:
+        file_path: Path to the workbook
+        sheet_name: Worksheet to read
+    
+    Returns:
+        List of column names, empty if the sheet has no header row
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        return _header(next(rows, ()))[1]
+    finally:
+        workbook.close()
+
+
+def iter_sheet_frames(file_path: str, sheet_name: str, batch_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Yield a worksheet as DataFrames of at most batch_size rows.
+    
+    The first row is the header; columns without a header and rows without
+    any value are skipped. Cells keep the types Excel stored (numbers,
+    dates, text), formulas yield their cached values.
+    
+    Args:
+        file_path: Path to the workbook
+        sheet_name: Worksheet to read
+        batch_size: Maximum rows per DataFrame
+    
+    Yields:
+        DataFrames with the sheet's columns
+    """
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        positions, columns = _header(next(rows, ()))
+        width = positions[-1] + 1 if positions else 0
+        
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            records = []
+            for row in batch:
+                # Read-only rows can be shorter than the header when trailing cells are empty
+                row = tuple(row[:width]) + (None,) * (width - len(row))
+                values = [row[i] for i in positions]
+                if any(value is not None for value in values):
+                    records.append(values)
+            yield pd.DataFrame.from_records(records, columns=columns)
+    finally:
+        workbook.close()
@@ -90,6 +90,22 @@ else:
         }
     }
 
+# Cache, used for dashboard and chart responses:
+# 'locmem' (per process), 'file' (shared by the processes of a host) or 'redis' (needs the redis package)
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': config('CACHE_LOCATION', default=CACHE_BACKENDS[CACHE_BACKEND][1]),
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)  # Seconds a cached response is kept
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -191,9 +207,32 @@ SESSION_COOKIE_SECURE = True  # Required when SameSite=None (HTTPS only)
 SESSION_COOKIE_HTTPONLY = True  # Prevent XSS attacks
 SESSION_COOKIE_AGE = 86400  # 24 hours
 
+# Hash, count and check CSV headers of uploads while they stream into MEDIA_ROOT/UPLOAD_INCOMING_DIR
+FILE_UPLOAD_HANDLERS = [
+    'api.upload_handlers.ContentHashUploadHandler',
+]
+
 # CSV Upload Settings
-CSV_MAX_SIZE = 10 * 1024 * 1024  # 10 MB
-ALLOWED_CSV_EXTENSIONS = ['csv']
+CSV_MAX_SIZE = config('CSV_MAX_SIZE', default=5 * 1024 * 1024 * 1024, cast=int)  # 5 GB
+CSV_MAX_COMPRESSION_RATIO = config('CSV_MAX_COMPRESSION_RATIO', default=250, cast=float)  # Larger ratios are treated as compression bombs
+CSV_CHUNK_SIZE = config('CSV_CHUNK_SIZE', default=50000, cast=int)  # Rows parsed per streaming chunk
+CSV_PARSE_WORKERS = config('CSV_PARSE_WORKERS', default=min(os.cpu_count() or 1, 4), cast=int)  # Parse processes for large files
+CSV_PARALLEL_THRESHOLD = config('CSV_PARALLEL_THRESHOLD', default=64 * 1024 * 1024, cast=int)  # Parse in parallel from 64 MB
+CSV_PARALLEL_RANGE_SIZE = config('CSV_PARALLEL_RANGE_SIZE', default=16 * 1024 * 1024, cast=int)  # Bytes per parse task
+CSV_PARSER_ENGINE = config('CSV_PARSER_ENGINE', default='auto')  # 'auto' picks by size; or 'c', 'mmap', 'pyarrow', 'stdlib'
+CSV_STDLIB_MAX_SIZE = config('CSV_STDLIB_MAX_SIZE', default=8 * 1024, cast=int)  # csv module below 8 KB
+CSV_PYARROW_MIN_SIZE = config('CSV_PYARROW_MIN_SIZE', default=128 * 1024, cast=int)  # pyarrow from 128 KB, when installed
+CSV_MMAP_MIN_SIZE = config('CSV_MMAP_MIN_SIZE', default=64 * 1024 * 1024, cast=int)  # Memory-mapped C parser from 64 MB
+CSV_PREVIEW_ROWS = config('CSV_PREVIEW_ROWS', default=20, cast=int)  # Rows read by an upload preview unless nrows is given
+CSV_PREVIEW_MAX_SIZE = config('CSV_PREVIEW_MAX_SIZE', default=1024 * 1024, cast=int)  # Bytes of a previewed file that are read
+CSV_ROW_ERROR_LIMIT = config('CSV_ROW_ERROR_LIMIT', default=10000, cast=int)  # Row errors kept in an upload's error report
+CSV_BATCH_MAX_FILES = config('CSV_BATCH_MAX_FILES', default=1000, cast=int)  # CSV files accepted in one batch archive
+INGESTION_WORKERS = config('INGESTION_WORKERS', default=2, cast=int)  # Background ingestion threads per process
+INGESTION_STALE_AFTER = config('INGESTION_STALE_AFTER', default=6 * 60 * 60, cast=int)  # Seconds without progress until an unfinished upload counts as abandoned
+UPLOAD_INCOMING_DIR = 'uploads/incoming'  # Under MEDIA_ROOT, uploads being received
+CHUNKED_UPLOAD_DIR = 'chunked_uploads'  # Under MEDIA_ROOT, one directory per upload session
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = config('CHUNKED_UPLOAD_MAX_CHUNK_SIZE', default=64 * 1024 * 1024, cast=int)  # 64 MB
+ALLOWED_CSV_EXTENSIONS = ['csv', 'csv.gz', 'csv.bz2', 'csv.xz', 'zip', 'parquet', 'arrow', 'feather', 'arrows', 'xlsx']
 
 # Swagger Settings
 SWAGGER_SETTINGS = {
@@ -0,0 +1,212 @@
+"""
+Benchmark CSV parsing from the backend directory:
+
+    python benchmark_csv_parsing.py [rows] [extra_columns]
+        Vectorised cleaning vs. the legacy per-record loop.
+    python benchmark_csv_parsing.py scaling [rows] [extra_columns]
+        Parallel parsing with 1, 2, 4 and 8 worker processes.
+    python benchmark_csv_parsing.py engines [extra_columns]
+        Every parser backend on files from 4 KB to about 40 MB.
+"""
+import os
+import sys
+import math
+import tempfile
+import time
+import django
+import numpy as np
+import pandas as pd
+
+# Setup Django
+sys.path.insert(0, os.path.dirname(__file__))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+django.setup()
+
+from django.test import override_settings
+from api.csv_engines import available_engines, iter_csv_frames, select_engine
+from api.parsing import (
+    prepare_dataframe, clean_columns, zip_records, STANDARD_COLUMNS, NUMERIC_COLUMNS, DATE_COLUMNS
+)
+from api.utils import parse_csv_file, stream_csv_file, get_parse_executor, read_csv_columns
+
+
+def legacy_parse_csv_file(file_path):
+    """Previous implementation: cleans every dynamic cell in a Python loop."""
+    df = pd.read_csv(file_path)
+    success, df, error_msg = prepare_dataframe(df)
+    if not success:
+        return False, [], error_msg
+    
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    df = df.where(pd.notnull(df), None)
+    for col in df.columns:
+        if col not in NUMERIC_COLUMNS and col not in DATE_COLUMNS and col in STANDARD_COLUMNS:
+            df[col] = df[col].fillna('')
+    
+    processed_data = []
+    for record in df.to_dict('records'):
+        standard_data = {}
+        dynamic_data = {}
+        for key, value in record.items():
+            if key in STANDARD_COLUMNS:
+                standard_data[key] = value
+            elif value is not None and value != '':
+                try:
+                    numeric_value = pd.to_numeric(value, errors='coerce')
+                    if pd.notna(numeric_value):
+                        dynamic_data[key] = float(numeric_value)
+                    else:
+                        dynamic_data[key] = str(value) if value else None
+                except (ValueError, TypeError):
+                    dynamic_data[key] = str(value) if value else None
+            else:
+                dynamic_data[key] = None
+        processed_data.append({**standard_data, 'additional_params': dynamic_data})
+    
+    return True, processed_data, ""
+
+
+def write_synthetic_csv(path, rows, extra_columns):
+    """Write a synthetic equipment CSV with numeric, text and sparse extra columns."""
+    rng = np.random.default_rng(42)
+    data = {
+        'Equipment ID': [f'EQ-{i:07d}' for i in range(rows)],
+        'Equipment Name': [f'Unit {i}' for i in range(rows)],
+        'Type': rng.choice(['Pump', 'Valve', 'Tank', 'Reactor', 'Compressor'], rows),
+        'Flowrate': rng.uniform(10, 500, rows).round(2),
+        'Pressure': rng.uniform(1, 20, rows).round(2),
+        'Temperature': rng.uniform(20, 300, rows).round(1),
+        'Status': rng.choice(['Active', 'Inactive', 'Maintenance'], rows),
+    }
+    for i in range(extra_columns):
+        values = rng.normal(100, 15, rows).round(3).astype(object)
+        if i % 3 == 1:
+            values[rng.random(rows) < 0.1] = 'offline'
+        elif i % 3 == 2:
+            values[rng.random(rows) < 0.2] = None
+        data[f'Sensor {i}'] = values
+    pd.DataFrame(data).to_csv(path, index=False)
+
+
+def _normalise(records):
+    """Legacy records leak float NaN as 'nan'/NaN/NaT; map those to None for comparison."""
+    def clean(value):
+        if value is pd.NaT or (isinstance(value, float) and math.isnan(value)) or value == 'nan':
+            return None
+        return value
+    
+    return [
+        {**{k: clean(v) for k, v in r.items() if k != 'additional_params'},
+         'additional_params': {k: clean(v) for k, v in r['additional_params'].items()}}
+        for r in records
+    ]
+
+
+def run_benchmark(rows=200_000, extra_columns=30):
+    """Time both implementations on the same file and check their output matches."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'benchmark.csv')
+        write_synthetic_csv(path, rows, extra_columns)
+        print(f"Rows: {rows}, extra columns: {extra_columns}")
+        
+        start = time.perf_counter()
+        _, legacy_records, _ = legacy_parse_csv_file(path)
+        legacy_time = time.perf_counter() - start
+        print(f"Legacy per-cell loop: {legacy_time:.2f}s")
+        
+        start = time.perf_counter()
+        _, records, _ = parse_csv_file(path)
+        vectorised_time = time.perf_counter() - start
+        print(f"Vectorised columns:   {vectorised_time:.2f}s")
+        
+        print(f"Speedup: {legacy_time / vectorised_time:.1f}x")
+        print(f"Identical output: {_normalise(legacy_records) == _normalise(records)}")
+
+
+def run_scaling_benchmark(rows=1_000_000, extra_columns=30, worker_counts=(1, 2, 4, 8)):
+    """Time the parallel record stream with increasing numbers of parse processes."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'benchmark.csv')
+        write_synthetic_csv(path, rows, extra_columns)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Rows: {rows}, extra columns: {extra_columns}, file: {size_mb:.0f} MB, CPUs: {os.cpu_count()}")
+        
+        _, records, _ = stream_csv_file(path, workers=1)
+        sequential_rows = sum(1 for _ in records)
+        
+        baseline = None
+        with override_settings(CSV_PARALLEL_THRESHOLD=0):
+            for workers in worker_counts:
+                # Start the pool before timing so process spawn cost is not counted
+                list(get_parse_executor(workers).map(abs, range(workers)))
+                start = time.perf_counter()
+                _, records, _ = stream_csv_file(path, workers=workers)
+                parsed_rows = sum(1 for _ in records)
+                elapsed = time.perf_counter() - start
+                baseline = baseline or elapsed
+                print(
+                    f"{workers} worker(s): {elapsed:.2f}s, {parsed_rows / elapsed:,.0f} rows/s, "
+                    f"speedup {baseline / elapsed:.1f}x, rows match: {parsed_rows == sequential_rows}"
+                )
+
+
+def run_engine_benchmark(extra_columns=10, row_counts=(20, 200, 2000, 20_000, 200_000)):
+    """Time reading, mapping and cleaning with every parser backend and check their records match."""
+    from django.conf import settings
+    
+    engines = available_engines()
+    print(f"Backends: {', '.join(engines)}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'benchmark.csv')
+        for rows in row_counts:
+            write_synthetic_csv(path, rows, extra_columns)
+            size = os.path.getsize(path)
+            columns = read_csv_columns(path)
+            # Small files are timed over several runs, the best run counts
+            repeats = max(1, min(20, 20_000 // rows))
+            
+            timings = {}
+            outputs = {}
+            for engine in engines:
+                best = None
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    records = []
+                    for frame in iter_csv_frames(path, settings.CSV_CHUNK_SIZE, columns, engine):
+                        _, frame, _ = prepare_dataframe(frame)
+                        records.extend(zip_records(clean_columns(frame)))
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[engine] = best
+                outputs[engine] = _normalise(records)
+            
+            chosen = select_engine(
+                size, settings.CSV_STDLIB_MAX_SIZE, settings.CSV_PYARROW_MIN_SIZE, settings.CSV_MMAP_MIN_SIZE
+            )
+            fastest = min(timings, key=timings.get)
+            identical = all(output == outputs[engines[0]] for output in outputs.values())
+            results = ', '.join(f"{engine} {timings[engine] * 1000:.1f} ms" for engine in engines)
+            print(
+                f"{rows} rows ({size / 1024:,.0f} KB): {results}; "
+                f"fastest {fastest}, auto picks {chosen}, identical output: {identical}"
+            )
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == 'engines':
+        run_engine_benchmark(int(args[1]) if len(args) > 1 else 10)
+    elif args and args[0] == 'scaling':
+        row_arg = int(args[1]) if len(args) > 1 else 1_000_000
+        column_arg = int(args[2]) if len(args) > 2 else 30
+        run_scaling_benchmark(row_arg, column_arg)
+    else:
+        row_arg = int(args[0]) if len(args) > 0 else 200_000
+        column_arg = int(args[1]) if len(args) > 1 else 30
+        run_benchmark(row_arg, column_arg)
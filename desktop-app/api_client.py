@@ -14,6 +14,8 @@ class APIClient:
         self.session = requests.Session()
         self.csrf_token: Optional[str] = None
         self.is_authenticated = False
+        # Last ETag and data per GET request, revalidated with If-None-Match
+        self._etag_cache: Dict[tuple, tuple] = {}
         # Set Accept header for JSON responses
         self.session.headers.update({
             'Accept': 'application/json'
@@ -36,6 +38,31 @@ class APIClient:
         except Exception as e:
             print(f"Error getting CSRF token: {e}")
     
+    def _conditional_get(self, path: str, params: Optional[Dict[str, Any]] = None) -> tuple:
+        """
+        GET a JSON endpoint, revalidating the previous response with its ETag.
+        
+        Returns:
+            Tuple of (status_code, data); 304 Not Modified is returned as 200
+            with the data of the previous response
+        """
+        url = f"{self.base_url}{path}"
+        key = (url, tuple(sorted((params or {}).items())))
+        headers = {}
+        if self.csrf_token:
+            headers['X-CSRFToken'] = self.csrf_token
+        cached = self._etag_cache.get(key)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+        
+        response = self.session.get(url, params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return 200, cached[1]
+        data = response.json()
+        if response.status_code == 200 and response.headers.get('ETag'):
+            self._etag_cache[key] = (response.headers['ETag'], data)
+        return response.status_code, data
+    
     def login(self, username: str, password: str) -> Dict[str, Any]:
         """Login user and establish session."""
         try:
@@ -54,6 +81,7 @@ class APIClient:
             )
             if response.status_code == 200:
                 self.is_authenticated = True
+                self._etag_cache.clear()
                 # Update CSRF token from response cookies if available
                 csrf_cookie = self.session.cookies.get('csrftoken')
                 if csrf_cookie:
@@ -107,6 +135,7 @@ class APIClient:
                 headers=headers
             )
             self.is_authenticated = False
+            self._etag_cache.clear()
             return {'success': True}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -133,19 +162,11 @@ class APIClient:
     def get_dashboard_summary(self) -> Dict[str, Any]:
         """Get dashboard summary statistics."""
         try:
-            # Ensure CSRF token is in headers
-            headers = {}
-            if self.csrf_token:
-                headers['X-CSRFToken'] = self.csrf_token
-            
-            response = self.session.get(
-                f"{self.base_url}/dashboard/summary/",
-                headers=headers
-            )
-            if response.status_code == 200:
-                return {'success': True, 'data': response.json()}
+            status_code, data = self._conditional_get("/dashboard/summary/")
+            if status_code == 200:
+                return {'success': True, 'data': data}
             else:
-                return {'success': False, 'error': response.json()}
+                return {'success': False, 'error': data}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -156,19 +177,11 @@ class APIClient:
             if csv_upload_id:
                 params['csv_upload'] = csv_upload_id
             
-            headers = {}
-            if self.csrf_token:
-                headers['X-CSRFToken'] = self.csrf_token
-            
-            response = self.session.get(
-                f"{self.base_url}/dashboard/flowrate-chart/",
-                params=params,
-                headers=headers
-            )
-            if response.status_code == 200:
-                return {'success': True, 'data': response.json()}
+            status_code, data = self._conditional_get("/dashboard/flowrate-chart/", params)
+            if status_code == 200:
+                return {'success': True, 'data': data}
             else:
-                return {'success': False, 'error': response.json()}
+                return {'success': False, 'error': data}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -179,19 +192,26 @@ class APIClient:
             if csv_upload_id:
                 params['csv_upload'] = csv_upload_id
             
-            headers = {}
-            if self.csrf_token:
-                headers['X-CSRFToken'] = self.csrf_token
+            status_code, data = self._conditional_get("/dashboard/type-distribution/", params)
+            if status_code == 200:
+                return {'success': True, 'data': data}
+            else:
+                return {'success': False, 'error': data}
+        except Exception as e:
+            return {'success': False, 'error': str(e)}
+    
+    def get_dashboard_bundle(self, csv_upload_id: Optional[int] = None) -> Dict[str, Any]:
+        """Get dashboard summary, type distribution and flowrate chart data in one request."""
+        try:
+            params = {}
+            if csv_upload_id:
+                params['csv_upload'] = csv_upload_id
             
-            response = self.session.get(
-                f"{self.base_url}/dashboard/type-distribution/",
-                params=params,
-                headers=headers
-            )
-            if response.status_code == 200:
-                return {'success': True, 'data': response.json()}
+            status_code, data = self._conditional_get("/dashboard/bundle/", params)
+            if status_code == 200:
+                return {'success': True, 'data': data}
             else:
-                return {'success': False, 'error': response.json()}
+                return {'success': False, 'error': data}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -228,17 +248,8 @@ class APIClient:
             if equipment_type:
                 params['type'] = equipment_type
             
-            headers = {}
-            if self.csrf_token:
-                headers['X-CSRFToken'] = self.csrf_token
-            
-            response = self.session.get(
-                f"{self.base_url}/equipment/",
-                params=params,
-                headers=headers
-            )
-            if response.status_code == 200:
-                data = response.json()
+            status_code, data = self._conditional_get("/equipment/", params)
+            if status_code == 200:
                 # Handle paginated or non-paginated responses
                 if 'results' in data:
                     return {'success': True, 'data': data['results']}
@@ -247,41 +258,26 @@ class APIClient:
                 else:
                     return {'success': True, 'data': data}
             else:
-                return {'success': False, 'error': response.json()}
+                return {'success': False, 'error': data}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     def get_equipment_types(self) -> Dict[str, Any]:
         """Get list of equipment types."""
         try:
-            headers = {}
-            if self.csrf_token:
-                headers['X-CSRFToken'] = self.csrf_token
-            
-            response = self.session.get(
-                f"{self.base_url}/equipment/types/",
-                headers=headers
-            )
-            if response.status_code == 200:
-                return {'success': True, 'data': response.json()}
+            status_code, data = self._conditional_get("/equipment/types/")
+            if status_code == 200:
+                return {'success': True, 'data': data}
             else:
-                return {'success': False, 'error': response.json()}
+                return {'success': False, 'error': data}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
     def get_csv_uploads(self) -> Dict[str, Any]:
         """Get list of CSV uploads."""
         try:
-            headers = {}
-            if self.csrf_token:
-                headers['X-CSRFToken'] = self.csrf_token
-            
-            response = self.session.get(
-                f"{self.base_url}/uploads/",
-                headers=headers
-            )
-            if response.status_code == 200:
-                data = response.json()
+            status_code, data = self._conditional_get("/uploads/")
+            if status_code == 200:
                 if 'results' in data:
                     return {'success': True, 'data': data['results']}
                 elif isinstance(data, list):
@@ -289,7 +285,7 @@ class APIClient:
                 else:
                     return {'success': True, 'data': data}
             else:
-                return {'success': False, 'error': response.json()}
+                return {'success': False, 'error': data}
         except Exception as e:
             return {'success': False, 'error': str(e)}
     
@@ -140,11 +140,15 @@ class DashboardTab(QWidget):
     
     def load_data(self):
         """Load dashboard data from API."""
+        # Summary and both charts come in one request
+        bundle_result = self.api_client.get_dashboard_bundle()
+        if not bundle_result['success']:
+            return
+        bundle = bundle_result['data']
+        
         # Load summary
-        summary_result = self.api_client.get_dashboard_summary()
-        if summary_result['success']:
-            summary = summary_result['data']
-            
+        summary = bundle.get('summary')
+        if summary:
             # Update stats cards
             total = summary.get('total_equipment', 0) or 0
             self.update_card(self.total_equipment_card, str(total))
@@ -159,17 +163,15 @@ class DashboardTab(QWidget):
             self.update_card(self.avg_temperature_card, f"{avg_temp:.1f}")
         
         # Load type distribution
-        type_result = self.api_client.get_type_distribution_data()
-        if type_result['success']:
-            data = type_result['data']
+        data = bundle.get('type_distribution')
+        if data:
             types = data.get('types', [])
             counts = data.get('counts', [])
             self.type_dist_chart.plot_bar(types, counts)
         
         # Load flowrate data
-        flowrate_result = self.api_client.get_flowrate_chart_data()
-        if flowrate_result['success']:
-            data = flowrate_result['data']
+        data = bundle.get('flowrate_chart')
+        if data:
             equipment_ids = data.get('equipment_ids', [])[:10]  # Top 10
             flowrates = data.get('flowrates', [])[:10]
             self.flowrate_chart.plot_line(equipment_ids, flowrates)
@@ -222,7 +222,7 @@ class UploadTab(QWidget):
             self,
             "Select CSV File",
             "",
-            "CSV Files (*.csv);;All Files (*)"
+            "Data Files (*.csv *.csv.gz *.csv.bz2 *.csv.xz *.zip *.parquet *.arrow *.feather *.arrows *.xlsx);;All Files (*)"
         )
         
         if file_path:
@@ -257,6 +257,8 @@ class UploadTab(QWidget):
             data = result['data']
             created = data.get('created_count', 0)
             updated = data.get('updated_count', 0)
+            unchanged = data.get('unchanged_count', 0)
+            rejected = data.get('rejected_count', 0)
             total = data.get('total_records', 0)
             
             QMessageBox.information(
@@ -265,7 +267,9 @@ class UploadTab(QWidget):
                 f"CSV file processed successfully!\n\n"
                 f"Created: {created} records\n"
                 f"Updated: {updated} records\n"
+                f"Unchanged: {unchanged} records\n"
                 f"Total: {total} records"
+                + (f"\nRejected: {rejected} rows, see the upload's error report" if rejected else "")
             )
             
             # Reset
@@ -100,6 +100,7 @@ export const api = {
   getDashboardSummary: () => apiClient.get('/dashboard/summary/'),
   getFlowrateChartData: (params = {}) => apiClient.get('/dashboard/flowrate-chart/', { params }),
   getTypeDistributionData: (params = {}) => apiClient.get('/dashboard/type-distribution/', { params }),
+  getDashboardBundle: (params = {}) => apiClient.get('/dashboard/bundle/', { params }),
 
   // Report endpoints
   generateReport: (params = {}) => {
@@ -19,25 +19,24 @@ export default function DashboardPage({ onLogout }) {
   const fetchDashboardData = async () => {
     try {
       setLoading(true);
-      const [summaryRes, flowrateRes, typeRes] = await Promise.all([
-        api.getDashboardSummary(),
-        api.getFlowrateChartData(),
-        api.getTypeDistributionData(),
-      ]);
+      // Summary cards and both charts in one request
+      const { data } = await api.getDashboardBundle();
+      const flowrateRes = data.flowrate_chart;
+      const typeRes = data.type_distribution;
 
-      setSummary(summaryRes.data);
+      setSummary(data.summary);
       
       // Format flowrate data for chart
-      const flowrateChartData = flowrateRes.data.equipment_ids?.map((id, index) => ({
+      const flowrateChartData = flowrateRes.equipment_ids?.map((id, index) => ({
         name: id,
-        flowrate: flowrateRes.data.flowrates?.[index] || 0,
+        flowrate: flowrateRes.flowrates?.[index] || 0,
       })) || [];
       setFlowrateData(flowrateChartData.slice(0, 10)); // Show top 10
 
       // Format type distribution data
-      const typeChartData = typeRes.data.types?.map((type, index) => ({
+      const typeChartData = typeRes.types?.map((type, index) => ({
         type: type,
-        count: typeRes.data.counts?.[index] || 0,
+        count: typeRes.counts?.[index] || 0,
       })) || [];
       setTypeDistribution(typeChartData);
     } catch (error) {
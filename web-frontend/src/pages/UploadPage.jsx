@@ -4,6 +4,10 @@ import Layout from '../components/Layout';
 import { Upload, File, CheckCircle2, X } from 'lucide-react';
 import { api } from '../api/client';
 
+const CSV_UPLOAD_SUFFIXES = ['.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.zip', '.parquet', '.arrow', '.feather', '.arrows', '.xlsx'];
+
+const isCsvUpload = (name) => CSV_UPLOAD_SUFFIXES.some((suffix) => name.toLowerCase().endsWith(suffix));
+
 export default function UploadPage({ onLogout }) {
   const [isDragging, setIsDragging] = useState(false);
   const [file, setFile] = useState(null);
@@ -28,7 +32,7 @@ export default function UploadPage({ onLogout }) {
     setIsDragging(false);
 
     const droppedFile = e.dataTransfer.files[0];
-    if (droppedFile && droppedFile.name.endsWith('.csv')) {
+    if (droppedFile && isCsvUpload(droppedFile.name)) {
       setFile(droppedFile);
       setError(null);
     } else {
@@ -40,7 +44,7 @@ export default function UploadPage({ onLogout }) {
     const selectedFile = e.target.files?.[0];
     console.log('File selected:', selectedFile);
     if (selectedFile) {
-      if (selectedFile.name.endsWith('.csv')) {
+      if (isCsvUpload(selectedFile.name)) {
         setFile(selectedFile);
         setError(null);
         console.log('CSV file accepted:', selectedFile.name);
@@ -195,7 +199,7 @@ export default function UploadPage({ onLogout }) {
                     <input
                       type="file"
                       id="file-upload"
-                      accept=".csv"
+                      accept=".csv,.gz,.bz2,.xz,.zip,.parquet,.arrow,.feather,.arrows,.xlsx"
                       onChange={handleFileSelect}
                       className="hidden"
                     />
@@ -208,7 +212,7 @@ export default function UploadPage({ onLogout }) {
                   </div>
 
                   <p className="text-slate-400 dark:text-slate-500 text-sm">
-                    Supported format: CSV (Max 10MB)
+                    Supported formats: CSV (optionally .gz, .bz2, .xz, .zip), Parquet, Arrow IPC, Excel .xlsx (Max 5GB)
                   </p>
                 </>
               ) : (
@@ -286,6 +290,10 @@ export default function UploadPage({ onLogout }) {
                     <p className="text-sm text-slate-600 dark:text-slate-400">
                       <strong>Created:</strong> {uploadResult.created_count} records<br />
                       <strong>Updated:</strong> {uploadResult.updated_count} records<br />
+                      <strong>Unchanged:</strong> {uploadResult.unchanged_count ?? 0} records<br />
+                      {uploadResult.rejected_count > 0 && (
+                        <><strong>Rejected:</strong> {uploadResult.rejected_count} rows (see the error report)<br /></>
+                      )}
                       <strong>Total:</strong> {uploadResult.total_records} records
                     </p>
                   </div>